@@ -0,0 +1,218 @@
+import io
+import os
+import sys
+import json
+import hashlib
+import time
+import platform
+import subprocess
+import tempfile
+import tracemalloc
+import contextlib
+from classes.activity import Activity, ActivityType, ArgConstant, ArgTools
+from classes.ttbingenerator import TtbinFileGenerator
+from classes.ttbinreader import TtbinFileReader
+from classes.tcxwriter import TcxFileWriter
+from classes.fitwriter import FitFileWriter
+from classes.tcxeditor import TcxFileEditor
+from classes.tcxstreameditor import TcxStreamEditor
+from classes.snapshot import SnapshotCache
+from classes.version import ConverterVersion
+
+# benchmark for synthetic activities, times each stage separately:
+#   parse     - decoding TTBIN records into Activity
+#   postload  - Activity.PostLoad
+#   snapshot  - loading the activity after PostLoad from its snapshot instead of parse and postload
+#   serialize - writing TCX
+#   serializefit - writing FIT
+#   edit      - changing distance of the TCX file while streaming it, for activities with distance
+#   editdom   - the same with the whole TCX document loaded into minidom
+#   speedplan - applying a speed plan of many intervals to the loaded TCX document
+#   decode    - with --baseline only: TtbinFileReader.LoadActivity without PostLoad of this and of another version
+#               like the baseline commit, both run by the same script in a child process, records/s and speedup
+# usage:
+#   benchmark.py [--seconds 3600] [--repeat 3] [--intervals 1000] [--out results.json] [--baseline (src folder)]
+
+
+def main():
+    seconds = int(ArgTools.GetValue(sys.argv, ArgConstant.Seconds, "3600"))
+    repeat = int(ArgTools.GetValue(sys.argv, ArgConstant.Repeat, "3"))
+    intervals = int(ArgTools.GetValue(sys.argv, ArgConstant.Intervals, "1000"))
+    fileResults = ArgTools.GetValue(sys.argv, ArgConstant.Out)
+    dirBaseline = ArgTools.GetValue(sys.argv, ArgConstant.Baseline)
+    if dirBaseline is not None and not os.path.isfile(os.path.join(dirBaseline, "classes", "ttbinreader.py")):
+        print("Wrong baseline %s, it should be the src folder of a version" % dirBaseline)
+        exit()
+
+    results = {
+        "converterVersion": ConverterVersion,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": Activity.vectorized,
+        "seconds": seconds,
+        "repeat": repeat,
+        "intervals": intervals,
+        "baseline": os.path.abspath(dirBaseline) if dirBaseline is not None else None,
+        "activities": list(),
+    }
+    with tempfile.TemporaryDirectory() as dir:
+        for activityType in (ActivityType.Running, ActivityType.Treadmill, ActivityType.Gym):
+            results["activities"].append(benchmarkActivity(dir, activityType, seconds, repeat, intervals, dirBaseline))
+
+    text = json.dumps(results, indent=1)
+    if fileResults is not None:
+        with open(fileResults, "w", encoding="utf-8") as outfile:
+            outfile.write(text)
+    print(text)
+    return 0
+
+
+def benchmarkActivity(dir: str, activityType: ActivityType, seconds: int, repeat: int, intervals: int, dirBaseline: str = None):
+    fileTtbin = os.path.join(dir, "%s.ttbin" % activityType.name.lower())
+    fileTcx = os.path.join(dir, "%s.tcx" % activityType.name.lower())
+    fileFit = os.path.join(dir, "%s.fit" % activityType.name.lower())
+    fileEdited = os.path.join(dir, "d-%s.tcx" % activityType.name.lower())
+    ttbinBytes = TtbinFileGenerator().SaveFile(fileTtbin, activityType, seconds)
+    with open(fileTtbin, "rb") as infile:
+        data = infile.read()
+
+    state = dict()
+
+    def parse():
+        state["activity"] = Activity()
+        state["records"] = TtbinFileReader().DecodeRecords(state["activity"], data)
+
+    def postLoad():
+        state["activity"].PostLoad()
+
+    snapshots = SnapshotCache(os.path.join(dir, "snapshots"))
+    hash = hashlib.sha256(data).hexdigest()
+
+    def snapshot():
+        snapshots.Load(fileTtbin, hash, [])
+
+    def serialize():
+        TcxFileWriter().SaveActivity(fileTcx, state["activity"])
+
+    def serializeFit():
+        FitFileWriter().SaveActivity(fileFit, state["activity"])
+
+    def edit():
+        TcxStreamEditor().ChangeLength(fileTcx, fileEdited, 1000.0)
+
+    def editDom():
+        editor = TcxFileEditor()
+        editor.LoadXml(fileTcx)
+        editor.ChangeLength(1000.0)
+        editor.SaveXml(fileEdited)
+
+    # alternating distance and time intervals
+    plan = ";".join(["400m12" if i % 2 == 0 else "60s9.5" for i in range(intervals)])
+
+    def loadXml():
+        state["editor"] = TcxFileEditor()
+        state["editor"].LoadXml(fileTcx)
+
+    def speedPlan():
+        state["editor"].ChangeSpeed(plan)
+
+    stages = dict()
+    stages["parse"] = measureStage(parse, None, repeat)
+    stages["parse"]["records"] = state["records"]
+    stages["parse"]["recordsPerSecond"] = round(state["records"] / stages["parse"]["seconds"])
+    stages["parse"]["bytes"] = ttbinBytes
+    stages["postload"] = measureStage(postLoad, parse, repeat)
+    snapshots.Save(hash, state["activity"], 0)
+    stages["snapshot"] = measureStage(snapshot, None, repeat)
+    stages["snapshot"]["bytes"] = os.path.getsize(snapshots.GetFileName(hash))
+    stages["serialize"] = measureStage(serialize, None, repeat)
+    stages["serialize"]["bytes"] = os.path.getsize(fileTcx)
+    stages["serializefit"] = measureStage(serializeFit, None, repeat)
+    stages["serializefit"]["bytes"] = os.path.getsize(fileFit)
+    if state["activity"].totalDistanceMeters > 0: # distance of gym activities can't be changed
+        stages["edit"] = measureStage(edit, None, repeat)
+        stages["edit"]["bytes"] = os.path.getsize(fileTcx)
+        stages["editdom"] = measureStage(editDom, None, repeat)
+        stages["editdom"]["bytes"] = os.path.getsize(fileTcx)
+        stages["speedplan"] = measureStage(speedPlan, loadXml, repeat)
+        stages["speedplan"]["intervals"] = intervals
+    if dirBaseline is not None:
+        stages["decode"] = measureDecode(dirBaseline, fileTtbin, state["records"], repeat)
+    for stage in stages.values():
+        if "bytes" in stage:
+            stage["bytesPerSecond"] = round(stage["bytes"] / stage["seconds"])
+
+    return {
+        "activityType": activityType.name,
+        "trackPoints": len(state["activity"].track),
+        "stages": stages,
+    }
+
+
+# decoding by LoadActivity of a src folder, PostLoad is replaced so only reading records is timed
+# versions before the reader got DecodeRecords have a LoadActivity with PostLoad and prints too
+decodeScript: str = """
+import io, sys, time, contextlib
+from classes.activity import Activity
+from classes.ttbinreader import TtbinFileReader
+Activity.PostLoad = lambda self: None
+best = None
+with contextlib.redirect_stdout(io.StringIO()):
+    for i in range(int(sys.argv[2])):
+        start = time.perf_counter()
+        TtbinFileReader().LoadActivity(sys.argv[1], [])
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+print(best)
+"""
+
+
+# best decode seconds of this version and of the baseline version, measured the same way in child processes
+def measureDecode(dirBaseline: str, fileTtbin: str, records: int, repeat: int):
+    dirCurrent = os.path.dirname(os.path.abspath(__file__))
+    current = runDecodeScript(dirCurrent, fileTtbin, repeat)
+    baseline = runDecodeScript(dirBaseline, fileTtbin, repeat)
+    return {
+        "records": records,
+        "seconds": round(current, 6),
+        "recordsPerSecond": round(records / current),
+        "baselineSeconds": round(baseline, 6),
+        "baselineRecordsPerSecond": round(records / baseline),
+        "speedup": round(baseline / current, 2),
+    }
+
+
+def runDecodeScript(dir: str, fileTtbin: str, repeat: int):
+    output = subprocess.run([sys.executable, "-c", decodeScript, fileTtbin, str(max(1, repeat))],
+                            cwd=dir, capture_output=True, text=True, check=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+# best wall time of several runs, then one more run for peak traced memory
+# prepare runs before each measured run, output is suppressed
+def measureStage(stage, prepare, repeat: int):
+    best = None
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(max(1, repeat)):
+            if prepare is not None:
+                prepare()
+            start = time.perf_counter()
+            stage()
+            elapsed = time.perf_counter() - start
+            if best is None or elapsed < best:
+                best = elapsed
+
+        if prepare is not None:
+            prepare()
+        tracemalloc.start()
+        try:
+            stage()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return {"seconds": round(best, 6), "peakMemoryBytes": peak}
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,72 @@
 import math
+import logging
 import datetime
+from array import array
 from enum import Enum
+from .trackedit import EditOperation, TrackEdit
+from .console import GetLogger
+try:
+    import numpy
+except ImportError: # PostLoad falls back to plain Python
+    numpy = None
+
+logger = GetLogger(__name__)
 
 
 class ArgConstant:
     HRZones: str = "-hrzones" # like 130;140;150;160;170;180;
+    Mmap: str = "-mmap" # decode TTBIN files from memory mapped file
+    Dom: str = "-dom" # build the whole TCX document with minidom before writing
+    Compact: str = "-compact" # TCX output without indentation
+    Format: str = "--format" # output file format: tcx or fit
+    Compress: str = "--compress" # output compression: gzip, zstd or none
+    Archive: str = "--archive" # zip or tar file to put output files into
+    List: str = "-list" # print a summary of each TTBIN file instead of converting it
+    Recursive: str = "--recursive" # take TTBIN files from subfolders too
+    Include: str = "--include" # glob pattern of files to take, can be repeated
+    Exclude: str = "--exclude" # glob pattern of files and folders to skip, can be repeated
+    Type: str = "--type" # activity types to take, like running;treadmill
+    From: str = "--from" # first local start date to take, like 2025-01-01
+    To: str = "--to" # last local start date to take, like 2025-01-31
+    Index: str = "--index" # SQLite file of converted activities
+    IndexTrack: str = "--index-track" # seconds between track points stored in the index, no track if not given
+    Snapshots: str = "--snapshots" # folder for decoded activities, loaded instead of decoding the same TTBIN content again
+    SnapshotsSize: str = "--snapshots-size" # MB the snapshots folder is limited to, least recently used are removed
+    Distance: str = "-distance" # TCX edit: new distance in meters
+    Speed: str = "-speed" # TCX edit: speed intervals like in setspeed.py
+    Jobs: str = "--jobs" # number of files converted in parallel
+    Timeout: str = "--timeout" # seconds allowed for converting one file in parallel mode
+    Force: str = "--force" # convert files even if their output is up to date
+    Seconds: str = "--seconds" # benchmark activity duration
+    Repeat: str = "--repeat" # benchmark runs per stage
+    Intervals: str = "--intervals" # benchmark speed plan intervals
+    Out: str = "--out" # benchmark results file
+    Baseline: str = "--baseline" # benchmark src folder of another version to compare decoding with
+    Metrics: str = "--metrics" # file for counters and timers of processing stages
+    Profile: str = "--profile" # cProfile statistics per processing stage
+
+
+class ArgTools:
+    # returns the value following an option or the default
+    def GetValue(args: list[str], option: str, default: str = None):
+        for idx, arg in enumerate(args):
+            if arg == option and len(args) > idx + 1:
+                return args[idx + 1]
+        return default
+
+    # values following every occurrence of an option
+    def GetValues(args: list[str], option: str):
+        return [args[idx + 1] for idx, arg in enumerate(args[:-1]) if arg == option]
+
+    # (EditOperation, value) for every distance and speed option in the order of arguments
+    def GetEdits(args: list[str]):
+        edits = list()
+        for idx, arg in enumerate(args[:-1]):
+            if arg == ArgConstant.Distance:
+                edits.append((EditOperation.ChangeLength, float(args[idx + 1])))
+            elif arg == ArgConstant.Speed:
+                edits.append((EditOperation.ChangeSpeed, args[idx + 1].strip().lower()))
+        return edits
 
 
 class ActivityType(Enum):
@@ -21,54 +83,155 @@ class ActivityType(Enum):
     Snowboarding = 0x10
 
 
-# one piece of data
+# column of TrackStore exposed as an attribute of TrackPoint
+class TrackColumn:
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, point, owner=None):
+        if point is None:
+            return self
+        return getattr(point.store, self.name)[point.row]
+
+    def __set__(self, point, value):
+        getattr(point.store, self.name)[point.row] = value
+
+
+# one piece of data, a view of one row in TrackStore
 class TrackPoint:
-    time: datetime
-    heartRate: int
-    distanceMeters: float
-    speed: float
-    latitudeDegrees: float
-    longitudeDegrees: float
-    altitudeMeters: int
-    steps: int
-    cadence: int
-    lapIndex: int
-
-    def __init__(self, time: datetime, lapIndex: int):
-        self.time = time
-        self.lapIndex = lapIndex
-        self.heartRate = 0
-        self.distanceMeters = 0
-        self.speed = 0 # m/s
-        self.latitudeDegrees = 0
-        self.longitudeDegrees = 0
-        self.altitudeMeters = 0
-        self.steps = 0
-        self.cadence = 0
+    heartRate = TrackColumn()
+    distanceMeters = TrackColumn()
+    speed = TrackColumn() # m/s
+    latitudeDegrees = TrackColumn()
+    longitudeDegrees = TrackColumn()
+    altitudeMeters = TrackColumn()
+    steps = TrackColumn()
+    cadence = TrackColumn()
+    lapIndex = TrackColumn()
+
+    def __init__(self, store, row: int):
+        self.store = store
+        self.row = row
+
+    @property
+    def time(self):
+        return self.store.time[self.row]
 
     def GetPointSeconds(self):
-        tm = self.time
-        sec = datetime.timedelta(days=tm.day, hours=tm.hour, minutes=tm.minute, seconds=tm.second).total_seconds()
-        return sec
+        return self.store.GetPointSeconds(self.row)
+
+
+# recorded track points, one row per second in parallel typed arrays
+class TrackStore:
+    time: array # seconds since 1970
+    heartRate: array
+    distanceMeters: array
+    speed: array # m/s
+    latitudeDegrees: array
+    longitudeDegrees: array
+    altitudeMeters: array
+    steps: array
+    cadence: array
+    lapIndex: array
+    rows: dict # key = seconds since 1970, value = row
+
+    def __init__(self):
+        self.time = array("q")
+        self.heartRate = array("B")
+        self.distanceMeters = array("d")
+        self.speed = array("d")
+        self.latitudeDegrees = array("d")
+        self.longitudeDegrees = array("d")
+        self.altitudeMeters = array("i")
+        self.steps = array("i")
+        self.cadence = array("d")
+        self.lapIndex = array("H")
+        self.rows = dict()
+
+    def __len__(self):
+        return len(self.time)
+
+    # creates if necessary and returns row for specified time
+    def GetRow(self, time: int, lapIndex: int):
+        row = self.rows.get(time)
+        if row is None:
+            row = len(self.time)
+            self.rows[time] = row
+            self.time.append(time)
+            self.lapIndex.append(lapIndex)
+            self.heartRate.append(0)
+            self.distanceMeters.append(0)
+            self.speed.append(0)
+            self.latitudeDegrees.append(0)
+            self.longitudeDegrees.append(0)
+            self.altitudeMeters.append(0)
+            self.steps.append(0)
+            self.cadence.append(0)
+        return row
+
+    def GetPoint(self, row: int):
+        return TrackPoint(self, row)
+
+    def GetPointSeconds(self, row: int):
+        return self.time[row]
+
+    # rows ordered by time
+    def SortedRows(self):
+        return sorted(range(len(self.time)), key=self.time.__getitem__)
+
+    # rows ordered by time for each lap
+    def SortedRowsByLap(self, lapCount: int):
+        rowsByLap = [list() for _ in range(lapCount)]
+        lapIndex = self.lapIndex
+        for row in self.SortedRows():
+            rowsByLap[lapIndex[row]].append(row)
+        return rowsByLap
 
 
 class Lap:
     seconds: int
     distance: float
     calories: int
-    startTime: datetime
+    startTime: int # seconds since 1970
 
     def __init__(self, seconds: int, distance: float, calories: int):
         self.seconds = seconds
         self.distance = distance
         self.calories = calories
-        self.startTime = datetime.datetime.now(datetime.timezone.utc)
+        self.startTime = int(datetime.datetime.now(datetime.timezone.utc).timestamp())
+
+
+# what the file header and the summary record tell about an activity, without its track
+class ActivitySummary:
+    file: str
+    size: int # of the file in bytes
+    startTime: int # seconds since 1970
+    localTimeOffset: int # seconds
+    activityType: ActivityType # None if the file has no summary record
+    totalDistanceMeters: float
+    totalActiveSeconds: int
+    totalElapsedSeconds: int
+    totalCalories: int
+
+    def __init__(self, file: str, size: int):
+        self.file = file
+        self.size = size
+        self.startTime = 0
+        self.localTimeOffset = 0
+        self.activityType = None
+        self.totalDistanceMeters = 0
+        self.totalActiveSeconds = 0
+        self.totalElapsedSeconds = 0
+        self.totalCalories = 0
+
+    def GetLocalStartTime(self):
+        return datetime.datetime.fromtimestamp(self.startTime + self.localTimeOffset, datetime.timezone.utc)
 
 
 # recorded activity
 class Activity(object):
     activityType: ActivityType
-    startTime: datetime
+    startTime: int # seconds since 1970
     totalActiveSeconds: int
     totalElapsedSeconds: int
     totalDistanceMeters: float
@@ -84,15 +247,18 @@ class Activity(object):
     avgHeartRate: int
     maxHeartRate: int
     heartRatesByZone: dict # key = maxHR in zone, value = number of points
+    heartRateCounts: list # number of heart rate records at each heart rate
     currentLapIndex: int
-    trackPoints: dict # key = time, value = TrackPoint
-    trackPointsWaitingAltitude: list # track points waiting altitude measurement
+    track: TrackStore
+    firstRowWaitingAltitude: int # rows from this one on are waiting altitude measurement
     laps: list
-    defaultYear: int = 1970 # sometimes get 1969 year from TTBin
+    writeTrackSpeed: bool # False after distance edits, which drop track point speed like the TCX editor does
+    defaultTime: int = 0 # sometimes get 1969 year from TTBin
+    vectorized: bool = numpy is not None # PostLoad over NumPy arrays
 
     def __init__(self):
         self.activityType = ActivityType.Running
-        self.startTime = datetime.datetime.today()
+        self.startTime = int(datetime.datetime.now(datetime.timezone.utc).timestamp())
         self.totalActiveSeconds = 0
         self.totalElapsedSeconds = 0
         self.totalDistanceMeters = 0
@@ -105,13 +271,15 @@ class Activity(object):
         self.batteryLevelMin = 0
         self.batteryLevelMax = 0
         self.batteryLevels = list()
-        self.trackPoints = dict()
-        self.trackPointsWaitingAltitude = list()
+        self.track = TrackStore()
+        self.firstRowWaitingAltitude = 0
         self.avgHeartRate = 0
         self.maxHeartRate = 0
         self.heartRatesByZone = dict()
+        self.heartRateCounts = [0] * 256
         self.laps = list()
         self.currentLapIndex = 0
+        self.writeTrackSpeed = True
 
     def LogBatteryLevel(self, level: int):
         self.batteryLevels.append(level)
@@ -124,134 +292,64 @@ class Activity(object):
         if self.batteryLevelMax < level:
             self.batteryLevelMax = level
 
+    # creates if necessary and returns track row at specified time
+    # returns -1 for default date
+    def GetTrackRowAt(self, time: int):
+        if time < self.defaultTime:
+            return -1
+        return self.track.GetRow(time, self.currentLapIndex)
+
     # creates if necessary and returns a trackpoint at specified time
     # returns null for default date
-    def GetTrackPointAt(self, time: datetime):
-        point: TrackPoint
-
-        if time.year < self.defaultYear:
+    def GetTrackPointAt(self, time: int):
+        row = self.GetTrackRowAt(time)
+        if row < 0:
             return None
-
-        if time in self.trackPoints:
-            point = self.trackPoints[time]
-        else:
-            point = TrackPoint(time, self.currentLapIndex)
-            self.trackPoints[time] = point
-            self.trackPointsWaitingAltitude.append(point)
-
-        return point
-
-    def LogHeartRate(self, time: datetime, heartRate: int):
-        point = self.GetTrackPointAt(time)
-        if point is not None:
-            point.heartRate = heartRate
-        self.AddToHRZones(heartRate)
-
-    def LogSteps(self, time: datetime, totalSteps: int, distance: float):
-        point = self.GetTrackPointAt(time)
-        if point is not None:
-            point.steps = totalSteps - self.totalSteps
+        return self.track.GetPoint(row)
+
+    def LogHeartRate(self, time: int, heartRate: int):
+        row = self.GetTrackRowAt(time)
+        if row >= 0:
+            self.track.heartRate[row] = heartRate
+        self.heartRateCounts[heartRate] = self.heartRateCounts[heartRate] + 1
+
+    def LogSteps(self, time: int, totalSteps: int, distance: float):
+        row = self.GetTrackRowAt(time)
+        if row >= 0:
+            self.track.steps[row] = totalSteps - self.totalSteps
             self.totalSteps = totalSteps
-            point.distanceMeters = distance
+            self.track.distanceMeters[row] = distance
 
     def LogElevation(self, altitude: int, ascend: int, descend: int):
         self.totalAscendMeters = ascend
         self.totalDescendMeters = descend
 
-        for point in self.trackPointsWaitingAltitude:
-            point.altitudeMeters = altitude
-        self.trackPointsWaitingAltitude.clear()
-
-    def LogGps(self, time: datetime, latitude: float, longitude: float, speed: float, steps: int, distance: float):
-        point = self.GetTrackPointAt(time)
-        if point is not None:
-            point.steps = steps
-            point.speed = speed
-            point.latitudeDegrees = latitude
-            point.longitudeDegrees = longitude
-            point.distanceMeters = distance
+        altitudeMeters = self.track.altitudeMeters
+        for row in range(self.firstRowWaitingAltitude, len(altitudeMeters)):
+            altitudeMeters[row] = altitude
+        self.firstRowWaitingAltitude = len(altitudeMeters)
+
+    def LogGps(self, time: int, latitude: float, longitude: float, speed: float, steps: int, distance: float):
+        row = self.GetTrackRowAt(time)
+        if row >= 0:
+            track = self.track
+            track.steps[row] = steps
+            track.speed[row] = speed
+            track.latitudeDegrees[row] = latitude
+            track.longitudeDegrees[row] = longitude
+            track.distanceMeters[row] = distance
             self.totalSteps = self.totalSteps + steps
 
     def PostLoad(self):
-        # calculate cadence
-        groupBySec = 10.0
-        cyclesByXXSec = dict()
-
-        for time in self.trackPoints:
-            point = self.trackPoints[time]
-            sec = point.GetPointSeconds()
-            groupTime = math.floor(sec / groupBySec)
-            cyclesByXXSec[groupTime] = cyclesByXXSec.get(groupTime, 0) + point.steps
-
-        for groupTime in cyclesByXXSec:
-            cyclesByXXSec[groupTime] = cyclesByXXSec[groupTime] * 60.0 / groupBySec / 2.0
-
-        if self.activityType == ActivityType.Treadmill:
-            # correcting distance for treadmill
-            maxDistanceFromPoints: float = 0
-            for time in self.trackPoints:
-                point: TrackPoint = self.trackPoints[time]
-                if point.distanceMeters > maxDistanceFromPoints:
-                    maxDistanceFromPoints = point.distanceMeters
-            if  maxDistanceFromPoints > 0:
-                factor: float = self.totalDistanceMeters / maxDistanceFromPoints
-                for time in self.trackPoints:
-                    point: TrackPoint = self.trackPoints[time]
-                    point.distanceMeters = point.distanceMeters * factor
-
-        prevPoint = None
-        for time in sorted(self.trackPoints):
-            point: TrackPoint = self.trackPoints[time]
-            if self.activityType == ActivityType.Treadmill:
-                point.speed = 0
-            if prevPoint is not None:
-                # correcting zero distance
-                if point.distanceMeters == 0:
-                    point.distanceMeters = prevPoint.distanceMeters
-
-                # correcting speed for treadmill
-                if self.activityType == ActivityType.Treadmill:
-                    timeDiff = (point.time - prevPoint.time).seconds * 1000.0 \
-                        + (point.time - prevPoint.time).microseconds
-                    distDiff = point.distanceMeters - prevPoint.distanceMeters
-                    if timeDiff > 0:
-                        point.speed = distDiff * 1000.0 / timeDiff
-
-            prevPoint = point
-
-        # max and avg speed, max and avg heart rate
-        self.maxSpeed = 0
-        self.maxHeartRate = 0
-        heartRatePoints = 0
-        heartRateSum = 0
-        for time in self.trackPoints:
-            point: TrackPoint = self.trackPoints[time]
-            sec = point.GetPointSeconds()
-            groupTime = math.floor(sec / groupBySec)
-            point.cadence = cyclesByXXSec[groupTime]
-            if point.speed > self.maxSpeed:
-                self.maxSpeed = point.speed
-            if point.heartRate > self.maxHeartRate:
-                self.maxHeartRate = point.heartRate
-            if point.heartRate > 0:
-                heartRatePoints = heartRatePoints + 1
-                heartRateSum = heartRateSum + point.heartRate
-        self.avgSpeed = 0
-        if self.totalActiveSeconds > 0:
-            self.avgSpeed = self.totalDistanceMeters / self.totalActiveSeconds
-        self.avgHeartRate = 0
-        if heartRatePoints > 0:
-            self.avgHeartRate = heartRateSum / heartRatePoints
+        if self.vectorized:
+            self.AnalyzeTrackVectorized()
+        else:
+            self.AnalyzeTrack()
 
         # creating default or trailing lap
         if self.currentLapIndex == len(self.laps):
             self.LogLap(self.totalActiveSeconds, self.totalDistanceMeters, self.totalCalories)
-        # finding laps start time
-        for time in self.trackPoints:
-            point: TrackPoint = self.trackPoints[time]
-            lap = self.laps[point.lapIndex]
-            if lap.startTime > point.time:
-                lap.startTime = point.time
+        self.FindLapStartTimes()
 
         # linear trend for battery levels
         if len(self.batteryLevels) > 0:
@@ -279,13 +377,20 @@ class Activity(object):
                 #self.batteryLevelMax = a * 1 + b
                 self.batteryLevelMin = (len(self.batteryLevels) + 1) * a + b
 
-        print("   Distance: %s m" % (round(self.totalDistanceMeters)))
-        print("   Max pace: %s min/km" % (self.FormatPaceMinPerKm(self.maxSpeed)))
-        print("   Avg pace: %s min/km" % (self.FormatPaceMinPerKm(self.avgSpeed)))
+        self.CountHRZones()
+        self.LogSummary()
+        return
+
+    def LogSummary(self):
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        logger.info("   Distance: %s m", round(self.totalDistanceMeters))
+        logger.info("   Max pace: %s min/km", self.FormatPaceMinPerKm(self.maxSpeed))
+        logger.info("   Avg pace: %s min/km", self.FormatPaceMinPerKm(self.avgSpeed))
 
         # heart rate zones info
-        print("   Max heart rate: %s" % (round(self.maxHeartRate)))
-        print("   Avg heart rate: %s" % (round(self.avgHeartRate)))
+        logger.info("   Max heart rate: %s", round(self.maxHeartRate))
+        logger.info("   Avg heart rate: %s", round(self.avgHeartRate))
         totalHRpoints: int = 0
         for maxZoneHeartRate in self.heartRatesByZone:
             totalHRpoints = totalHRpoints + self.heartRatesByZone[maxZoneHeartRate]
@@ -302,15 +407,236 @@ class Activity(object):
                 else:
                     heartRateRange = "%s-%s" % (list(self.heartRatesByZone)[idx - 1] + 1, maxZoneHeartRate)
                 if len(bar) > 0:
-                    print("   Zone %s (%s): %s %s%%" % (zone, heartRateRange, bar, percent))
+                    logger.info("   Zone %s (%s): %s %s%%", zone, heartRateRange, bar, percent)
                 else:
-                    print("   Zone %s (%s): %s%%" % (zone, heartRateRange, percent))
+                    logger.info("   Zone %s (%s): %s%%", zone, heartRateRange, percent)
 
-        print("   Battery level: %s%% -> %s%%" % (round(self.batteryLevelMax), round(self.batteryLevelMin)))
-        print("   Steps: %s" % (round(self.totalSteps)))
-        print("   Calories: %s" % (round(self.totalCalories)))
+        logger.info("   Battery level: %s%% -> %s%%", round(self.batteryLevelMax), round(self.batteryLevelMin))
+        logger.info("   Steps: %s", round(self.totalSteps))
+        logger.info("   Calories: %s", round(self.totalCalories))
         return
 
+    # cadence, treadmill distance and speed, zero distance fill, max and avg values
+    def AnalyzeTrack(self):
+        track = self.track
+        rowCount = len(track)
+        times = track.time
+        distances = track.distanceMeters
+        speeds = track.speed
+        heartRates = track.heartRate
+
+        # calculate cadence
+        groupBySec = 10.0
+        cyclesByXXSec = dict()
+        groupTimes = [math.floor(time / groupBySec) for time in times]
+
+        for row, groupTime in enumerate(groupTimes):
+            cyclesByXXSec[groupTime] = cyclesByXXSec.get(groupTime, 0) + track.steps[row]
+
+        for groupTime in cyclesByXXSec:
+            cyclesByXXSec[groupTime] = cyclesByXXSec[groupTime] * 60.0 / groupBySec / 2.0
+
+        if self.activityType == ActivityType.Treadmill:
+            # correcting distance for treadmill
+            maxDistanceFromPoints: float = max(distances, default=0)
+            if  maxDistanceFromPoints > 0:
+                factor: float = self.totalDistanceMeters / maxDistanceFromPoints
+                for row in range(rowCount):
+                    distances[row] = distances[row] * factor
+
+        prevRow = -1
+        for row in track.SortedRows():
+            if self.activityType == ActivityType.Treadmill:
+                speeds[row] = 0
+            if prevRow >= 0:
+                # correcting zero distance
+                if distances[row] == 0:
+                    distances[row] = distances[prevRow]
+
+                # correcting speed for treadmill
+                if self.activityType == ActivityType.Treadmill:
+                    timeDiff = (times[row] - times[prevRow]) * 1000.0
+                    distDiff = distances[row] - distances[prevRow]
+                    if timeDiff > 0:
+                        speeds[row] = distDiff * 1000.0 / timeDiff
+
+            prevRow = row
+
+        # max and avg speed, max and avg heart rate
+        for row, groupTime in enumerate(groupTimes):
+            track.cadence[row] = cyclesByXXSec[groupTime]
+        self.maxSpeed = max(0, max(speeds, default=0))
+        self.maxHeartRate = max(heartRates, default=0)
+        heartRatePoints = rowCount - heartRates.count(0)
+        heartRateSum = sum(heartRates)
+        self.avgSpeed = 0
+        if self.totalActiveSeconds > 0:
+            self.avgSpeed = self.totalDistanceMeters / self.totalActiveSeconds
+        self.avgHeartRate = 0
+        if heartRatePoints > 0:
+            self.avgHeartRate = heartRateSum / heartRatePoints
+
+    # same as AnalyzeTrack, in batches over NumPy arrays
+    def AnalyzeTrackVectorized(self):
+        track = self.track
+        rowCount = len(track)
+        if rowCount == 0:
+            self.maxSpeed = 0
+            self.maxHeartRate = 0
+            self.avgSpeed = 0
+            if self.totalActiveSeconds > 0:
+                self.avgSpeed = self.totalDistanceMeters / self.totalActiveSeconds
+            self.avgHeartRate = 0
+            return
+
+        times = numpy.frombuffer(track.time, dtype=numpy.int64)
+        steps = numpy.frombuffer(track.steps, dtype=numpy.int32)
+        distances = numpy.frombuffer(track.distanceMeters, dtype=numpy.float64).copy()
+        speeds = numpy.frombuffer(track.speed, dtype=numpy.float64).copy()
+        heartRates = numpy.frombuffer(track.heartRate, dtype=numpy.uint8)
+
+        # calculate cadence, sum of steps for each 10 seconds
+        groupBySec = 10
+        groupTimes, groupIndexes = numpy.unique(times // groupBySec, return_inverse=True)
+        cyclesByXXSec = numpy.bincount(groupIndexes, weights=steps, minlength=len(groupTimes))
+        cadences = cyclesByXXSec[groupIndexes] * 60.0 / groupBySec / 2.0
+
+        if self.activityType == ActivityType.Treadmill:
+            # correcting distance for treadmill
+            maxDistanceFromPoints: float = float(distances.max())
+            if maxDistanceFromPoints > 0:
+                factor: float = self.totalDistanceMeters / maxDistanceFromPoints
+                distances = distances * factor
+
+        # correcting zero distance with the previous one in time order
+        order = numpy.argsort(times, kind="stable")
+        sortedDistances = distances[order]
+        filled = numpy.where(sortedDistances != 0, numpy.arange(rowCount), 0)
+        sortedDistances = sortedDistances[numpy.maximum.accumulate(filled)]
+        distances[order] = sortedDistances
+
+        # correcting speed for treadmill
+        if self.activityType == ActivityType.Treadmill:
+            sortedSpeeds = numpy.zeros(rowCount)
+            timeDiffs = numpy.diff(times[order]) * 1000.0
+            distDiffs = numpy.diff(sortedDistances)
+            valid = timeDiffs > 0
+            sortedSpeeds[1:][valid] = distDiffs[valid] * 1000.0 / timeDiffs[valid]
+            speeds[order] = sortedSpeeds
+
+        track.distanceMeters = array("d", distances.tobytes())
+        track.speed = array("d", speeds.tobytes())
+        track.cadence = array("d", cadences.tobytes())
+
+        # max and avg speed, max and avg heart rate
+        self.maxSpeed = max(0, float(speeds.max()))
+        self.maxHeartRate = int(heartRates.max())
+        heartRatePoints = int(numpy.count_nonzero(heartRates))
+        heartRateSum = int(heartRates.sum(dtype=numpy.int64))
+        self.avgSpeed = 0
+        if self.totalActiveSeconds > 0:
+            self.avgSpeed = self.totalDistanceMeters / self.totalActiveSeconds
+        self.avgHeartRate = 0
+        if heartRatePoints > 0:
+            self.avgHeartRate = heartRateSum / heartRatePoints
+
+    # seconds of the track at each heart rate, key = heart rate, value = seconds, rows without heart rate are left out
+    def GetHeartRateSeconds(self):
+        counts = [0] * 256
+        for heartRate in self.track.heartRate:
+            counts[heartRate] = counts[heartRate] + 1
+        return dict([(heartRate, count) for heartRate, count in enumerate(counts) if count > 0 and heartRate > 0])
+
+    def FindLapStartTimes(self):
+        track = self.track
+        if self.vectorized and len(track) > 0:
+            times = numpy.frombuffer(track.time, dtype=numpy.int64)
+            lapIndexes = numpy.frombuffer(track.lapIndex, dtype=numpy.uint16)
+            lapStartTimes = numpy.full(len(self.laps), numpy.iinfo(numpy.int64).max)
+            numpy.minimum.at(lapStartTimes, lapIndexes, times)
+            for lap, startTime in zip(self.laps, lapStartTimes.tolist()):
+                if lap.startTime > startTime:
+                    lap.startTime = startTime
+            return
+
+        lapStartTimes = dict() # key = lap index, value = seconds since 1970
+        for row in range(len(track)):
+            lapIndex = track.lapIndex[row]
+            if lapIndex not in lapStartTimes or lapStartTimes[lapIndex] > track.time[row]:
+                lapStartTimes[lapIndex] = track.time[row]
+        for lapIndex, startTime in lapStartTimes.items():
+            lap = self.laps[lapIndex]
+            if lap.startTime > startTime:
+                lap.startTime = startTime
+
+    # applies (EditOperation, value) edits in order, with the same result as TcxFileEditor on the written TCX
+    # stops at the first failing one
+    def ApplyEdits(self, edits: list):
+        for operation, value in edits:
+            if operation == EditOperation.ChangeLength:
+                done = self.ChangeLength(value)
+            else:
+                done = self.ChangeSpeed(value)
+            if not done:
+                return False
+        return True
+
+    # track rows in the order they are written and their distances as written
+    def GetWrittenRows(self):
+        rowsByLap = self.track.SortedRowsByLap(len(self.laps))
+        rows = [row for lapRows in rowsByLap for row in lapRows]
+        distances = [round(self.track.distanceMeters[row], 2) for row in rows]
+        return rowsByLap, rows, distances
+
+    def ChangeLength(self, newLen: float):
+        if newLen <= 0.0:
+            logger.error("Error: new distance should be greater than zero")
+            return False
+
+        rowsByLap, rows, distances = self.GetWrittenRows()
+        oldLen = TrackEdit.GetFullDistance(distances)
+
+        logger.info("Old distance: %s m", oldLen)
+        logger.info("New distance: %s m", newLen)
+        if oldLen <= 0.0:
+            logger.error("Error: activity has no distance to change")
+            return False
+
+        factor: float = newLen / oldLen
+        distanceMeters = self.track.distanceMeters
+        for row, distance in zip(rows, distances):
+            distanceMeters[row] = round(distance * factor, 2)
+        for lap in self.laps:
+            lap.distance = round(round(lap.distance, 2) * factor, 2)
+        self.totalDistanceMeters = round(round(self.totalDistanceMeters, 2) * factor, 2)
+        self.writeTrackSpeed = False
+        return True
+
+    def ChangeSpeed(self, intervals: str):
+        laps = [(self.ToDateTime(lap.startTime), lap.seconds) for lap in self.laps]
+        startTime = min([lapStartTime for lapStartTime, lapSeconds in laps], default=None)
+        intervalList = TrackEdit.ParseIntervals(intervals, startTime, laps)
+        if len(intervalList) == 0:
+            logger.warning("Wrong interval definition")
+            return False
+
+        rowsByLap, rows, distances = self.GetWrittenRows()
+        times = [self.ToDateTime(self.track.time[row]) for row in rows]
+        distances = TrackEdit.GetSpeedPlanDistances(times, distances, intervalList, startTime)
+        if distances is None:
+            return False
+        distanceMeters = self.track.distanceMeters
+        for row, distance in zip(rows, distances):
+            distanceMeters[row] = distance
+        for lap, lapRows in zip(self.laps, rowsByLap):
+            if len(lapRows) > 0:
+                lap.distance = TrackEdit.GetLapDistance([distanceMeters[row] for row in lapRows])
+        self.writeTrackSpeed = False
+        return True
+
+    def ToDateTime(self, seconds: int):
+        return datetime.datetime.fromtimestamp(seconds, datetime.timezone.utc)
+
     def FormatPaceMinPerKm(self, speedMPerMin: float):
         if speedMPerMin == 0:
             return "0:00"
@@ -344,7 +670,7 @@ class Activity(object):
 
     def ParseHRZones(self, zones: str):
         if len(zones) == 0:
-            print("Wrong heart rate zones parameter %s" % zones)
+            logger.warning("Wrong heart rate zones parameter %s", zones)
             return
 
         zoneList = zones.split(";")
@@ -354,9 +680,15 @@ class Activity(object):
         self.heartRatesByZone[999] = 0
         return
 
-    def AddToHRZones(self, heartRate: int):
+    # heart rate records of every zone from their counts at each heart rate
+    def CountHRZones(self):
+        for heartRate, count in enumerate(self.heartRateCounts):
+            if count > 0:
+                self.AddToHRZones(heartRate, count)
+
+    def AddToHRZones(self, heartRate: int, count: int = 1):
         for maxZoneHeartRate in self.heartRatesByZone:
             if maxZoneHeartRate >= heartRate:
-                self.heartRatesByZone[maxZoneHeartRate] = self.heartRatesByZone[maxZoneHeartRate] + 1
+                self.heartRatesByZone[maxZoneHeartRate] = self.heartRatesByZone[maxZoneHeartRate] + count
                 return
         return
@@ -0,0 +1,272 @@
+import os
+import sqlite3
+import datetime
+import urllib.request
+from .activity import Activity
+
+# changes whenever tables change, an index of another version is built again
+IndexVersion: int = 1
+# kept in meta, tells an index of this tool from other SQLite databases
+IndexApplication: str = "ttbin2tcx"
+
+schema: list = [
+    """CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)""",
+    """CREATE TABLE activities (
+        id INTEGER PRIMARY KEY,
+        hash TEXT NOT NULL UNIQUE,
+        file TEXT NOT NULL,
+        output TEXT,
+        activity_type TEXT NOT NULL,
+        start_time INTEGER NOT NULL,
+        local_time_offset INTEGER NOT NULL,
+        distance REAL NOT NULL,
+        active_seconds INTEGER NOT NULL,
+        elapsed_seconds INTEGER NOT NULL,
+        calories INTEGER NOT NULL,
+        steps INTEGER NOT NULL,
+        ascent INTEGER NOT NULL,
+        descent INTEGER NOT NULL,
+        avg_speed REAL NOT NULL,
+        max_speed REAL NOT NULL,
+        avg_heart_rate REAL NOT NULL,
+        max_heart_rate INTEGER NOT NULL,
+        battery_start REAL NOT NULL,
+        battery_end REAL NOT NULL)""",
+    """CREATE INDEX activities_start_time ON activities (start_time)""",
+    """CREATE TABLE laps (
+        activity INTEGER NOT NULL REFERENCES activities (id) ON DELETE CASCADE,
+        lap INTEGER NOT NULL,
+        start_time INTEGER NOT NULL,
+        seconds INTEGER NOT NULL,
+        distance REAL NOT NULL,
+        calories INTEGER NOT NULL,
+        PRIMARY KEY (activity, lap)) WITHOUT ROWID""",
+    """CREATE TABLE heart_rates (
+        activity INTEGER NOT NULL REFERENCES activities (id) ON DELETE CASCADE,
+        heart_rate INTEGER NOT NULL,
+        seconds INTEGER NOT NULL,
+        PRIMARY KEY (activity, heart_rate)) WITHOUT ROWID""",
+    """CREATE TABLE track (
+        activity INTEGER NOT NULL REFERENCES activities (id) ON DELETE CASCADE,
+        time INTEGER NOT NULL,
+        latitude REAL NOT NULL,
+        longitude REAL NOT NULL,
+        altitude INTEGER NOT NULL,
+        heart_rate INTEGER NOT NULL,
+        distance REAL NOT NULL,
+        speed REAL NOT NULL,
+        PRIMARY KEY (activity, time)) WITHOUT ROWID""",
+]
+
+activityColumns: tuple = ("hash", "file", "output", "activity_type", "start_time", "local_time_offset",
+                          "distance", "active_seconds", "elapsed_seconds", "calories", "steps", "ascent", "descent",
+                          "avg_speed", "max_speed", "avg_heart_rate", "max_heart_rate", "battery_start", "battery_end")
+
+# local start time of an activity as arguments of SQL date functions
+localTime: str = "start_time + local_time_offset, 'unixepoch'"
+
+
+# what is stored about one converted activity, built where the activity is loaded and passed to the index as it is
+class IndexRecord:
+    values: dict # key = column of activities
+    laps: list # (start time, seconds, distance, calories)
+    heartRates: dict # key = heart rate, value = seconds
+    track: list # (time, latitude, longitude, altitude, heart rate, distance, speed), empty if not stored
+
+    def __init__(self, hash: str, file: str, activity: Activity, localTimeOffset: int, trackStep: int = 0):
+        self.values = {
+            "hash": hash,
+            "file": file,
+            "output": None,
+            "activity_type": activity.activityType.name.lower(),
+            "start_time": activity.startTime,
+            "local_time_offset": localTimeOffset,
+            "distance": activity.totalDistanceMeters,
+            "active_seconds": activity.totalActiveSeconds,
+            "elapsed_seconds": activity.totalElapsedSeconds,
+            "calories": activity.totalCalories,
+            "steps": activity.totalSteps,
+            "ascent": activity.totalAscendMeters,
+            "descent": activity.totalDescendMeters,
+            "avg_speed": activity.avgSpeed,
+            "max_speed": activity.maxSpeed,
+            "avg_heart_rate": activity.avgHeartRate,
+            "max_heart_rate": activity.maxHeartRate,
+            "battery_start": activity.batteryLevelMax,
+            "battery_end": activity.batteryLevelMin,
+        }
+        self.laps = [(lap.startTime, lap.seconds, lap.distance, lap.calories) for lap in activity.laps]
+        self.heartRates = activity.GetHeartRateSeconds()
+        self.track = self.GetTrack(activity, trackStep) if trackStep > 0 else list()
+
+    # first point of every trackStep seconds
+    def GetTrack(self, activity: Activity, trackStep: int):
+        track = activity.track
+        points = list()
+        lastStep = None
+        for row in track.SortedRows():
+            step = track.time[row] // trackStep
+            if step == lastStep:
+                continue
+            lastStep = step
+            points.append((track.time[row], track.latitudeDegrees[row], track.longitudeDegrees[row], track.altitudeMeters[row],
+                           track.heartRate[row], track.distanceMeters[row], track.speed[row]))
+        return points
+
+
+# SQLite database of converted activities keyed by the content hash of their TTBIN file
+# an activity converted again replaces its previous rows, so the index follows the latest conversion
+# tables are only created in an empty database or replaced in an index of this tool, other databases raise ValueError
+class ActivityIndex:
+    fileIndex: str
+    readOnly: bool
+    connection: sqlite3.Connection
+
+    def __init__(self, fileIndex: str, readOnly: bool = False):
+        self.fileIndex = fileIndex
+        self.readOnly = readOnly
+        try:
+            if readOnly:
+                # queries never change the file, not even by creating it or its tables
+                self.connection = sqlite3.connect("file:%s?mode=ro" % urllib.request.pathname2url(os.path.abspath(fileIndex)), uri=True)
+            else:
+                self.connection = sqlite3.connect(fileIndex)
+        except sqlite3.DatabaseError as e:
+            raise ValueError("%s can't be opened as an activity index: %s" % (fileIndex, e))
+        try:
+            self.CheckVersion()
+        except sqlite3.DatabaseError as e:
+            self.connection.close()
+            raise ValueError("%s can't be opened as an activity index: %s" % (fileIndex, e))
+        except ValueError:
+            self.connection.close()
+            raise
+        # set once the file is known to be an index, as journal mode is kept in the file
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        if not readOnly:
+            self.connection.execute("PRAGMA journal_mode = WAL")
+            self.connection.execute("PRAGMA synchronous = NORMAL")
+
+    # creates tables in an empty database, rebuilds an index of another version unless it is opened read only
+    def CheckVersion(self):
+        if self.IsEmpty():
+            if self.readOnly:
+                raise ValueError("%s is not an activity index" % self.fileIndex)
+            self.Create()
+            return
+        if self.GetMeta("application") != IndexApplication:
+            raise ValueError("%s is not an activity index" % self.fileIndex)
+        version = self.GetMeta("version")
+        if version != str(IndexVersion):
+            if self.readOnly:
+                raise ValueError("%s is an index of version %s, convert.py --index builds version %s" % (self.fileIndex, version, IndexVersion))
+            self.Create()
+
+    def IsEmpty(self):
+        return self.connection.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()[0] == 0
+
+    # None if there is no meta table or key
+    def GetMeta(self, key: str):
+        try:
+            row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        except sqlite3.OperationalError:
+            return None
+        return row[0] if row is not None else None
+
+    # tables of another version are dropped, activities get into the index again when they are converted
+    # only called for an empty database or an index of this tool
+    def Create(self):
+        with self.connection:
+            tables = [row[0] for row in self.connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+            for table in tables:
+                self.connection.execute("DROP TABLE %s" % table)
+            for statement in schema:
+                self.connection.execute(statement)
+            self.connection.executemany("INSERT INTO meta (key, value) VALUES (?, ?)",
+                                        [("application", IndexApplication), ("version", str(IndexVersion))])
+
+    def Contains(self, hash: str):
+        return self.connection.execute("SELECT 1 FROM activities WHERE hash = ?", (hash,)).fetchone() is not None
+
+    # adds or replaces an activity, changes are visible to others after Commit
+    def Add(self, record: IndexRecord, output: str = None):
+        values = dict(record.values)
+        values["output"] = output
+        self.connection.execute("DELETE FROM activities WHERE hash = ?", (values["hash"],))
+        cursor = self.connection.execute("INSERT INTO activities (%s) VALUES (%s)" % (", ".join(activityColumns), ", ".join(["?"] * len(activityColumns))),
+                                         [values[column] for column in activityColumns])
+        id = cursor.lastrowid
+        self.connection.executemany("INSERT INTO laps VALUES (?, ?, ?, ?, ?, ?)",
+                                    [(id, lap) + lapValues for lap, lapValues in enumerate(record.laps)])
+        self.connection.executemany("INSERT INTO heart_rates VALUES (?, ?, ?)",
+                                    [(id, heartRate, seconds) for heartRate, seconds in record.heartRates.items()])
+        self.connection.executemany("INSERT INTO track VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                    [(id,) + point for point in record.track])
+
+    def Commit(self):
+        self.connection.commit()
+
+    def Close(self):
+        if not self.readOnly:
+            self.connection.commit()
+        self.connection.close()
+
+    # SQL condition and its parameters selecting activities by types and local start dates
+    def GetFilter(activityTypes: set = None, dateFrom: datetime.date = None, dateTo: datetime.date = None):
+        conditions = list()
+        parameters = list()
+        if activityTypes is not None and len(activityTypes) > 0:
+            conditions.append("activity_type IN (%s)" % ", ".join(["?"] * len(activityTypes)))
+            parameters.extend(sorted([activityType.name.lower() for activityType in activityTypes]))
+        if dateFrom is not None:
+            conditions.append("date(%s) >= ?" % localTime)
+            parameters.append(dateFrom.isoformat())
+        if dateTo is not None:
+            conditions.append("date(%s) <= ?" % localTime)
+            parameters.append(dateTo.isoformat())
+        return (" WHERE " + " AND ".join(conditions) if len(conditions) > 0 else ""), parameters
+
+    # (column names, rows) of a query
+    def Query(self, sql: str, parameters: list = ()):
+        cursor = self.connection.execute(sql, parameters)
+        return [column[0] for column in cursor.description], cursor.fetchall()
+
+    # activities, distance, active time and calories per local week (monday first) or month or year
+    # period is a strftime format like "%Y-%W", "%Y-%m" or "%Y"
+    def GetTotals(self, period: str, activityTypes: set = None, dateFrom: datetime.date = None, dateTo: datetime.date = None):
+        where, parameters = ActivityIndex.GetFilter(activityTypes, dateFrom, dateTo)
+        return self.Query("SELECT strftime('%s', %s) AS period, COUNT(*) AS activities, ROUND(SUM(distance) / 1000, 2) AS km, "
+                          "SUM(active_seconds) AS seconds, SUM(calories) AS calories, SUM(steps) AS steps, "
+                          "ROUND(SUM(battery_start - battery_end), 1) AS battery "
+                          "FROM activities%s GROUP BY period ORDER BY period" % (period, localTime, where), parameters)
+
+    # seconds in each heart rate zone per local month, zones are max heart rates like -hrzones takes them
+    # zones are summed per activity first, so date functions run once per activity, not once per heart rate
+    def GetZoneSeconds(self, zones: list, activityTypes: set = None, dateFrom: datetime.date = None, dateTo: datetime.date = None):
+        where, parameters = ActivityIndex.GetFilter(activityTypes, dateFrom, dateTo)
+        bounds = [0] + sorted(zones) + [999]
+        names = ["...-%s" % bounds[1]] + ["%s-%s" % (low + 1, high) for low, high in zip(bounds[1:-2], bounds[2:-1])] \
+            + ["%s-..." % (bounds[-2] + 1)]
+        zoneColumns = ["SUM(CASE WHEN heart_rate > %d AND heart_rate <= %d THEN seconds ELSE 0 END) AS zone%d" % (low, high, idx)
+                       for idx, (low, high) in enumerate(zip(bounds[:-1], bounds[1:]))]
+        monthColumns = ["SUM(zone%d) AS \"%s\"" % (idx, name) for idx, name in enumerate(names)]
+        selected = " WHERE activity IN (SELECT id FROM activities%s)" % where if len(where) > 0 else ""
+        return self.Query("SELECT strftime('%%Y-%%m', %s) AS month, %s "
+                          "FROM activities JOIN (SELECT activity, %s FROM heart_rates%s GROUP BY activity) zones "
+                          "ON zones.activity = activities.id GROUP BY month ORDER BY month"
+                          % (localTime, ", ".join(monthColumns), ", ".join(zoneColumns), selected), parameters)
+
+    # the fastest activity of each local year
+    def GetMaxSpeeds(self, activityTypes: set = None, dateFrom: datetime.date = None, dateTo: datetime.date = None):
+        where, parameters = ActivityIndex.GetFilter(activityTypes, dateFrom, dateTo)
+        return self.Query("SELECT strftime('%%Y', %s) AS year, ROUND(MAX(max_speed) * 3.6, 2) AS kmh, "
+                          "activity_type, date(%s) AS date, file "
+                          "FROM activities%s GROUP BY year ORDER BY year" % (localTime, localTime, where), parameters)
+
+    # activities ordered by local start time
+    def GetActivities(self, activityTypes: set = None, dateFrom: datetime.date = None, dateTo: datetime.date = None):
+        where, parameters = ActivityIndex.GetFilter(activityTypes, dateFrom, dateTo)
+        return self.Query("SELECT datetime(%s) AS start, activity_type, ROUND(distance / 1000, 2) AS km, "
+                          "active_seconds AS seconds, calories, laps.count AS laps, file "
+                          "FROM activities LEFT JOIN (SELECT activity, COUNT(*) AS count FROM laps GROUP BY activity) laps "
+                          "ON laps.activity = activities.id%s ORDER BY start_time" % (localTime, where), parameters)
@@ -0,0 +1,146 @@
+import io
+import os
+import time
+import tarfile
+import zipfile
+import posixpath
+from .console import GetLogger
+
+logger = GetLogger(__name__)
+
+archiveExtensions: tuple = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+
+# TTBIN files packed into a zip or tar archive, members are read into memory without extracting them
+# tar archives are read as a stream: members are read in archive order, going back opens the archive again
+class ArchiveReader:
+    fileArchive: str
+    isZip: bool
+    zip: zipfile.ZipFile
+    tar: tarfile.TarFile # opened as a stream
+    members: object # iterator over tar members
+    names: list # ttbin members in archive order
+    sizes: dict # key = member name, value = size
+    positions: dict # key = member name, value = index in names
+    position: int # index of the next tar member to be read
+    pid: int # process which opened the archive
+    opened: dict = dict() # readers of this process, key = archive file
+
+    def __init__(self, fileArchive: str):
+        self.fileArchive = fileArchive
+        self.pid = os.getpid()
+        self.isZip = zipfile.is_zipfile(fileArchive)
+        self.zip = None
+        self.tar = None
+        self.names = list()
+        self.sizes = dict()
+        if self.isZip:
+            self.zip = zipfile.ZipFile(fileArchive, "r")
+            for info in self.zip.infolist():
+                if not info.is_dir() and ArchiveReader.IsTtbin(info.filename):
+                    self.names.append(info.filename)
+                    self.sizes[info.filename] = info.file_size
+        else:
+            with tarfile.open(fileArchive, "r:*") as tar:
+                for member in tar:
+                    if member.isfile() and ArchiveReader.IsTtbin(member.name):
+                        self.names.append(member.name)
+                        self.sizes[member.name] = member.size
+        self.positions = dict([(name, idx) for idx, name in enumerate(self.names)])
+        self.position = len(self.names)
+
+    def IsArchive(path: str):
+        return os.path.isfile(path) and path.lower().endswith(archiveExtensions)
+
+    def IsTtbin(name: str):
+        return os.path.splitext(name)[1].lower() == ".ttbin"
+
+    # reader of the archive opened in this process, workers of a batch keep theirs between members
+    # a forked worker inherits the readers of its parent, sharing their file offset, so it opens its own
+    def Open(fileArchive: str):
+        reader = ArchiveReader.opened.get(fileArchive)
+        if reader is None or reader.pid != os.getpid():
+            reader = ArchiveReader(fileArchive)
+            ArchiveReader.opened[fileArchive] = reader
+        return reader
+
+    def Read(self, name: str):
+        if self.isZip:
+            return self.zip.read(name)
+
+        if self.positions[name] < self.position:
+            if self.tar is not None:
+                self.tar.close()
+            self.tar = tarfile.open(self.fileArchive, "r|*")
+            self.members = iter(self.tar)
+            self.position = 0
+        for member in self.members:
+            if member.isfile() and ArchiveReader.IsTtbin(member.name):
+                self.position = self.positions[member.name] + 1
+                if member.name == name:
+                    return self.tar.extractfile(member).read()
+        raise KeyError("%s is not found in %s" % (name, self.fileArchive))
+
+    def Close(self):
+        if self.zip is not None:
+            self.zip.close()
+        if self.tar is not None:
+            self.tar.close()
+        ArchiveReader.opened.pop(self.fileArchive, None)
+
+
+# output files packed into a zip or tar archive, the type is given by the file extension
+class ArchiveWriter:
+    fileArchive: str
+    zip: zipfile.ZipFile
+    tar: tarfile.TarFile
+    names: set
+    level: int = 3 # compression for throughput, like gzip output
+
+    def __init__(self, fileArchive: str):
+        self.fileArchive = fileArchive
+        self.zip = None
+        self.tar = None
+        self.names = set()
+        name = fileArchive.lower()
+        if name.endswith(".zip"):
+            self.zip = zipfile.ZipFile(fileArchive, "w", zipfile.ZIP_DEFLATED, compresslevel=self.level)
+        elif name.endswith((".tar.gz", ".tgz")):
+            self.tar = tarfile.open(fileArchive, "w:gz", compresslevel=self.level)
+        elif name.endswith(".tar.bz2"):
+            self.tar = tarfile.open(fileArchive, "w:bz2", compresslevel=self.level)
+        elif name.endswith(".tar.xz"):
+            self.tar = tarfile.open(fileArchive, "w:xz")
+        elif name.endswith(".tar"):
+            self.tar = tarfile.open(fileArchive, "w")
+        else:
+            raise ValueError("unknown archive type of %s" % fileArchive)
+
+    def IsArchive(path: str):
+        return path.lower().endswith(archiveExtensions)
+
+    # a name already added is skipped, as there can't be two files with the same name
+    def Add(self, name: str, data: bytes):
+        if name in self.names:
+            logger.warning("Skipped %s, it is already in %s", name, self.fileArchive)
+            return
+        self.names.add(name)
+        if self.zip is not None:
+            info = zipfile.ZipInfo(name, time.localtime()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            self.zip.writestr(info, data, compresslevel=self.level)
+        else:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = int(time.time())
+            self.tar.addfile(info, io.BytesIO(data))
+
+    def Close(self):
+        if self.zip is not None:
+            self.zip.close()
+        if self.tar is not None:
+            self.tar.close()
+
+
+# name of an output member placed next to its source member
+def GetMemberName(sourceName: str, fileName: str):
+    return posixpath.normpath(posixpath.join(posixpath.dirname(sourceName), fileName))
@@ -0,0 +1,203 @@
+import io
+import time
+import pickle
+import traceback
+import contextlib
+import multiprocessing
+import multiprocessing.connection
+from .metrics import metrics
+from .console import EnableConsole
+
+
+# outcome of processing one batch item
+class BatchResult:
+    item: object # str or what the items of the batch are
+    ok: bool
+    output: str # captured console output
+    error: str
+    seconds: float
+    value: object # returned by the function
+    metrics: dict # snapshot of metrics collected for the item, None if not collected
+
+    def __init__(self, item: str, ok: bool, output: str, error: str, seconds: float, value: object = None, metrics: dict = None):
+        self.item = item
+        self.ok = ok
+        self.output = output
+        self.error = error
+        self.seconds = seconds
+        self.value = value
+        self.metrics = metrics
+
+
+# calls func(item, *args) capturing console output, exceptions are returned as a failed result
+# log messages are console output too, also in worker processes started without the parent's logging setup
+def RunCaptured(func, item: str, args: tuple, collectMetrics: bool = False, profiling: bool = False):
+    EnableConsole()
+    output = io.StringIO()
+    start = time.perf_counter()
+    ok = True
+    error = ""
+    value = None
+    snapshot = None
+    if collectMetrics:
+        metrics.Reset()
+        metrics.Enable(profiling)
+    with contextlib.redirect_stdout(output):
+        try:
+            value = func(item, *args)
+        except Exception as e:
+            ok = False
+            error = "%s: %s" % (type(e).__name__, e)
+            output.write(traceback.format_exc())
+    if collectMetrics:
+        snapshot = metrics.ToDict()
+        metrics.Disable()
+        metrics.Reset()
+    return BatchResult(item, ok, output.getvalue(), error, time.perf_counter() - start, value, snapshot)
+
+
+# runs func over items in worker processes
+# one failing or hanging item doesn't stop the others, results are reported as they come
+class BatchRunner:
+    jobs: int
+    timeout: float # seconds per item, None = no limit
+    collectMetrics: bool # results get metrics of their item
+    profiling: bool # metrics include cProfile statistics per stage
+
+    def __init__(self, jobs: int, timeout: float = None, collectMetrics: bool = False, profiling: bool = False):
+        self.jobs = max(1, jobs)
+        self.timeout = timeout
+        self.collectMetrics = collectMetrics or profiling
+        self.profiling = profiling
+
+    # onResult is called in this process for every item, returns results in items order
+    def Run(self, func, items: list, args: tuple = (), onResult=None):
+        if self.jobs == 1 and self.timeout is None:
+            results = list()
+            for item in items:
+                result = RunCaptured(func, item, args, self.collectMetrics, self.profiling)
+                if onResult is not None:
+                    onResult(result)
+                results.append(result)
+            return results
+
+        results = [None] * len(items)
+        waiting = list(range(len(items)))
+        waiting.reverse()
+        workers = list()
+        try:
+            while len(waiting) > 0 or any([worker.index is not None for worker in workers]):
+                while len(waiting) > 0:
+                    idle = [worker for worker in workers if worker.index is None]
+                    if len(idle) > 0:
+                        worker = idle[0]
+                    elif len(workers) < self.jobs:
+                        worker = BatchWorker()
+                        workers.append(worker)
+                    else:
+                        break
+                    index = waiting.pop()
+                    error = self.Submit(worker, func, items, args, index)
+                    if error is not None:
+                        result = BatchResult(items[index], False, "", error, 0.0)
+                        results[index] = result
+                        if onResult is not None:
+                            onResult(result)
+
+                busy = [worker for worker in workers if worker.index is not None]
+                if len(busy) == 0:
+                    continue # all items left failed to be sent
+                deadlines = [worker.deadline for worker in busy if worker.deadline is not None]
+                wait = max(0.0, min(deadlines) - time.monotonic()) if len(deadlines) > 0 else None
+                ready = multiprocessing.connection.wait([worker.connection for worker in busy], timeout=wait)
+                now = time.monotonic()
+                for worker in busy:
+                    index = worker.index
+                    if worker.connection in ready:
+                        try:
+                            result = worker.connection.recv()
+                            worker.index = None
+                        except (EOFError, OSError):
+                            worker.Restart()
+                            result = BatchResult(items[index], False, "", "worker exited with code %s" % worker.exitCode, 0.0)
+                    elif worker.deadline is not None and worker.deadline <= now:
+                        # only the stuck worker is stopped, the others keep running their items
+                        result = BatchResult(items[index], False, "", "timed out after %s s" % self.timeout, self.timeout)
+                        worker.Restart()
+                    else:
+                        continue
+                    results[index] = result
+                    if onResult is not None:
+                        onResult(result)
+        finally:
+            for worker in workers:
+                worker.Stop()
+        return results
+
+    # returns the error if the task can't be pickled, the worker stays idle then
+    def Submit(self, worker, func, items: list, args: tuple, index: int):
+        try:
+            worker.connection.send((func, items[index], args, self.collectMetrics, self.profiling))
+        except (pickle.PicklingError, TypeError, AttributeError) as e:
+            return "%s: %s" % (type(e).__name__, e)
+        worker.index = index
+        worker.deadline = time.monotonic() + self.timeout if self.timeout is not None else None
+        return None
+
+
+# process running items one by one, started again when its item hangs or it exits
+class BatchWorker:
+    process: multiprocessing.Process
+    connection: multiprocessing.connection.Connection
+    index: int # item running, None when idle
+    deadline: float # time.monotonic of the item's timeout, None = no limit
+    exitCode: int # of the last stopped process
+
+    def __init__(self):
+        self.index = None
+        self.deadline = None
+        self.exitCode = None
+        self.Start()
+
+    def Start(self):
+        self.connection, workerConnection = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=RunWorker, args=(workerConnection,), daemon=True)
+        self.process.start()
+        workerConnection.close()
+
+    def Restart(self):
+        self.Stop()
+        self.index = None
+        self.deadline = None
+        self.Start()
+
+    # an idle worker is asked to exit, a busy one is terminated
+    def Stop(self):
+        if self.index is None and self.process.is_alive():
+            try:
+                self.connection.send(None)
+            except OSError:
+                pass
+            self.process.join(1.0)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join()
+        self.exitCode = self.process.exitcode
+        self.connection.close()
+
+
+# loop of a worker process, a task is (func, item, args, collectMetrics, profiling), None stops it
+def RunWorker(connection):
+    while True:
+        try:
+            task = connection.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        func, item, args, collectMetrics, profiling = task
+        result = RunCaptured(func, item, args, collectMetrics, profiling)
+        try:
+            connection.send(result)
+        except Exception as e:
+            connection.send(BatchResult(item, False, result.output, "result can't be returned: %s: %s" % (type(e).__name__, e), result.seconds))
@@ -0,0 +1,78 @@
+import io
+import os
+import gzip
+try:
+    import zstandard
+except ImportError: # zstd needs the zstandard package, gzip works without it
+    zstandard = None
+
+
+# compressed output files are written through a streaming compressor,
+# compressed input files are recognized by their first bytes and read the same way
+class Compression:
+    Gzip: str = "gzip"
+    Zstd: str = "zstd"
+    Off: str = "none"
+    extensions: dict = {Gzip: ".gz", Zstd: ".zst"}
+    magics: dict = {Gzip: b"\x1f\x8b", Zstd: b"\x28\xb5\x2f\xfd"}
+    # levels for throughput: gzip 3 is as fast as 1 and smaller, zstd 1 is faster and smaller than its default 3
+    levels: dict = {Gzip: 3, Zstd: 1}
+
+    def IsSupported(compression: str):
+        if compression == Compression.Zstd:
+            return zstandard is not None
+        return compression in (Compression.Gzip, Compression.Off)
+
+    # compression of the file by its first bytes, None for plain files
+    def Detect(fileIn: str):
+        with open(fileIn, "rb") as infile:
+            magic = infile.read(4)
+        for compression, prefix in Compression.magics.items():
+            if magic.startswith(prefix):
+                return compression
+        return None
+
+    # file name without the extension of a compression
+    def StripExtension(fileName: str):
+        name, ext = os.path.splitext(fileName)
+        if ext.lower() in Compression.extensions.values():
+            return name
+        return fileName
+
+    # file name with the extension of the compression instead of the current one
+    def GetFileName(fileName: str, compression: str):
+        return Compression.StripExtension(fileName) + Compression.extensions.get(compression, "")
+
+    # compression of an edited file: the given option or the one of the source file
+    def GetOutputCompression(fileIn: str, option: str = None):
+        if option is not None:
+            return option
+        return Compression.Detect(fileIn)
+
+    # binary stream of the decompressed file content
+    def OpenRead(fileIn: str):
+        compression = Compression.Detect(fileIn)
+        if compression == Compression.Gzip:
+            return gzip.open(fileIn, "rb")
+        if compression == Compression.Zstd:
+            if zstandard is None:
+                raise ValueError("zstd compressed %s needs the zstandard package" % fileIn)
+            return zstandard.open(fileIn, "rb")
+        return open(fileIn, "rb")
+
+    # binary stream compressing what is written into the file, plain file if compression is None or "none"
+    # gzip header has no time, so the same content gives the same file
+    def OpenWrite(fileOut: str, compression: str = None):
+        if compression == Compression.Gzip:
+            return gzip.GzipFile(fileOut, "wb", compresslevel=Compression.levels[Compression.Gzip], mtime=0)
+        if compression == Compression.Zstd:
+            if zstandard is None:
+                raise ValueError("zstd compression needs the zstandard package")
+            return zstandard.open(fileOut, "wb", cctx=zstandard.ZstdCompressor(level=Compression.levels[Compression.Zstd]))
+        return open(fileOut, "wb")
+
+    # utf-8 text stream with unix line ends over OpenWrite
+    def OpenTextWrite(fileOut: str, compression: str = None):
+        if compression in Compression.extensions:
+            return io.TextIOWrapper(Compression.OpenWrite(fileOut, compression), encoding="utf-8", newline="\n")
+        return open(fileOut, "w", encoding="utf-8", newline="\n")
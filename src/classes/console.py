@@ -0,0 +1,36 @@
+import sys
+import logging
+
+# classes log their messages to loggers named by their modules, under the logger of this package
+# command line tools print them as they are, code using the classes gets them only if it configures logging
+packageLogger = logging.getLogger(__package__)
+packageLogger.addHandler(logging.NullHandler())
+
+
+def GetLogger(name: str):
+    return logging.getLogger(name)
+
+
+# writes to the current sys.stdout, so console output redirected while processing a batch item includes log messages
+class ConsoleHandler(logging.StreamHandler):
+    def __init__(self):
+        super().__init__(sys.stdout)
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+# messages of the classes go to the console like print wrote them, called by command line tools and batch workers
+def EnableConsole():
+    if any([isinstance(handler, ConsoleHandler) for handler in packageLogger.handlers]):
+        return
+    handler = ConsoleHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    packageLogger.addHandler(handler)
+    packageLogger.setLevel(logging.INFO)
+    packageLogger.propagate = False
@@ -0,0 +1,85 @@
+import os
+import json
+import hashlib
+from .version import ConverterVersion
+
+
+# manifest of converted files kept in the output folder
+# a file is up to date when its output exists and it was converted by the same
+# converter version with the same options from the same content
+class ConversionCache:
+    fileName: str = ".ttbin2tcx-cache.json"
+    dir: str
+    entries: dict # key = source file name, value = dict with size, mtime, hash, options, version, output
+    changed: bool
+
+    def __init__(self, dir: str):
+        self.dir = dir
+        self.entries = dict()
+        self.changed = False
+        self.Load()
+
+    def Load(self):
+        fileCache = os.path.join(self.dir, self.fileName)
+        if not os.path.isfile(fileCache):
+            return
+        try:
+            with open(fileCache, "r", encoding="utf-8") as infile:
+                data = json.load(infile)
+            if data.get("version") == ConverterVersion:
+                self.entries = data.get("files", dict())
+        except (OSError, ValueError, AttributeError):
+            self.entries = dict() # broken manifest means converting again
+
+    def Save(self):
+        if not self.changed:
+            return
+        fileCache = os.path.join(self.dir, self.fileName)
+        fileTemp = fileCache + ".tmp"
+        with open(fileTemp, "w", encoding="utf-8") as outfile:
+            json.dump({"version": ConverterVersion, "files": self.entries}, outfile, indent=1)
+        os.replace(fileTemp, fileCache)
+        self.changed = False
+
+    # size and mtime are checked first, content hash only when they differ
+    def IsUpToDate(self, fileSource: str, options: str):
+        entry = self.entries.get(os.path.basename(fileSource))
+        if entry is None or entry["options"] != options or entry["version"] != ConverterVersion:
+            return False
+        if not os.path.isfile(os.path.join(self.dir, entry["output"])):
+            return False
+
+        stat = os.stat(fileSource)
+        if stat.st_size == entry["size"] and stat.st_mtime_ns == entry["mtime"]:
+            return True
+        if stat.st_size != entry["size"] or ConversionCache.FileHash(fileSource) != entry["hash"]:
+            return False
+
+        # touched but not changed
+        entry["mtime"] = stat.st_mtime_ns
+        self.changed = True
+        return True
+
+    # hash of the content can be given when it is known already
+    def Update(self, fileSource: str, fileOutput: str, options: str, hash: str = None):
+        stat = os.stat(fileSource)
+        self.entries[os.path.basename(fileSource)] = {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns,
+            "hash": hash if hash is not None else ConversionCache.FileHash(fileSource),
+            "options": options,
+            "version": ConverterVersion,
+            "output": os.path.relpath(fileOutput, self.dir),
+        }
+        self.changed = True
+
+    # content hash of an up to date file
+    def GetHash(self, fileSource: str):
+        return self.entries[os.path.basename(fileSource)]["hash"]
+
+    def FileHash(fileSource: str):
+        digest = hashlib.sha256()
+        with open(fileSource, "rb") as infile:
+            for chunk in iter(lambda: infile.read(1048576), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
@@ -0,0 +1,72 @@
+import io
+import datetime
+from typing import BinaryIO
+from .activity import Activity, ArgConstant, ArgTools
+from .ttbinreader import TtbinFileReader, TtbinFileRecordTag
+from .tcxwriter import TcxFileWriter
+from .fitwriter import FitFileWriter
+from .trackedit import TrackEdit
+from .console import GetLogger
+
+logger = GetLogger(__name__)
+
+# output file formats
+outputFormats: tuple = ("tcx", "fit")
+
+
+# converts TTBIN content in memory: bytes, a buffer or a binary stream in, TCX or FIT bytes or a binary stream out
+# no file is read or written and messages go to logging only, so conversions can run in worker threads or processes
+# args are options of convert.py changing the output: -hrzones, --format, -compact, -dom, -distance and -speed
+# an instance keeps no state of a conversion, threads can share it as long as metrics stay disabled:
+# stages and counters are recorded into the process wide metrics, which isn't safe to update from several threads
+# with metrics enabled, like by --metrics of a command line tool, convert in one thread or in worker processes
+class TtbinConverter:
+    args: list[str]
+    fileFormat: str # one of outputFormats
+    edits: list # (EditOperation, value)
+
+    def __init__(self, args: list[str] = None):
+        self.args = list(args) if args is not None else list()
+        self.fileFormat = ArgTools.GetValue(self.args, ArgConstant.Format, "tcx").lower()
+        if self.fileFormat not in outputFormats:
+            raise ValueError("wrong format %s" % self.fileFormat)
+        self.edits = ArgTools.GetEdits(self.args)
+
+    # returns the output content
+    def Convert(self, source, name: str = "ttbin"):
+        outfile = io.BytesIO()
+        self.ConvertTo(source, outfile, name)
+        return outfile.getvalue()
+
+    # writes the output to a binary stream and leaves it open, returns the file name convert.py gives the output
+    # name of the source is used in messages only
+    def ConvertTo(self, source, outfile: BinaryIO, name: str = "ttbin"):
+        activity, localTimeOffset = self.LoadActivity(source, name)
+        self.ApplyEdits(activity)
+        self.GetWriter().WriteFile(outfile, activity)
+        return self.GetFileName(activity, localTimeOffset)
+
+    # (activity, local time offset in seconds) of bytes, a buffer like memoryview or mmap, or a binary stream
+    def LoadActivity(self, source, name: str = "ttbin"):
+        data = source.read() if hasattr(source, "read") else source
+        if len(data) == 0 or data[0] != TtbinFileRecordTag.FileHeader.value:
+            raise ValueError("%s is not a TTBIN file" % name)
+        reader = TtbinFileReader()
+        activity = reader.LoadActivityData(name, data, self.args)
+        return activity, reader.localTimeOffset
+
+    def ApplyEdits(self, activity: Activity):
+        if not activity.ApplyEdits(self.edits):
+            raise ValueError("edits can't be applied")
+
+    # TcxFileWriter or FitFileWriter for the options, compression only applies to their SaveActivity
+    def GetWriter(self, compression: str = None):
+        if self.fileFormat == "fit":
+            return FitFileWriter(compression=compression)
+        return TcxFileWriter(useDom=ArgConstant.Dom in self.args, pretty=ArgConstant.Compact not in self.args, compression=compression)
+
+    # like d-running-20250131191034.tcx: prefixes of edits, activity type and local start time
+    def GetFileName(self, activity: Activity, localTimeOffset: int):
+        dt = datetime.datetime.fromtimestamp(activity.startTime + localTimeOffset, datetime.timezone.utc)
+        return "%s%s-%s.%s" % (TrackEdit.GetEditsPrefix(self.edits), activity.activityType.name.lower(),
+                               dt.strftime("%Y%m%d%H%M%S"), self.fileFormat)
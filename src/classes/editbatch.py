@@ -0,0 +1,95 @@
+import os
+import csv
+import time
+from .batchrunner import BatchRunner, BatchResult
+from .activity import ArgConstant, ArgTools
+from .metrics import Metrics
+from .compression import Compression
+from .console import GetLogger
+
+logger = GetLogger(__name__)
+
+
+# calls process(fileTcx, value, *args) of an editor tool, edits it didn't make fail the file
+# item is (tcx file, value), so a task carries only the value of its own file
+def EditFile(item: tuple, process, args: tuple):
+    fileTcx, value = item
+    if not process(fileTcx, value, *args):
+        raise ValueError("file is not changed")
+    return fileTcx
+
+
+# batch mode of the TCX editor tools
+# files and their values come from a CSV manifest with rows of (tcx file, value),
+# or all tcx files of a folder get the same value
+class TcxEditBatch:
+    prefix: str # of output files, files with it are not edited again in a folder
+    values: dict # key = tcx file, value = parsed value for the tool
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self.values = dict()
+
+    def IsManifest(source: str):
+        return os.path.isfile(source) and os.path.splitext(source)[1].lower() == ".csv"
+
+    # relative paths in the manifest are relative to its folder, a first row starting with "file" is a header
+    # rows without a value or with a value parseValue raises ValueError for are skipped
+    def ReadManifest(self, fileCsv: str, parseValue):
+        dir = os.path.dirname(fileCsv)
+        with open(fileCsv, "r", encoding="utf-8", newline="") as infile:
+            for idx, row in enumerate(csv.reader(infile)):
+                if len(row) == 0 or row[0].strip() == "" or row[0].startswith("#"):
+                    continue
+                if idx == 0 and row[0].strip().lower() == "file":
+                    continue
+                if len(row) < 2:
+                    logger.warning("Skipped manifest row %s: %s", idx + 1, ",".join(row))
+                    continue
+                try:
+                    value = parseValue(row[1])
+                except ValueError as e:
+                    logger.warning("Skipped manifest row %s: %s: %s", idx + 1, ",".join(row), e)
+                    continue
+                self.values[os.path.join(dir, row[0].strip())] = value
+
+    # compressed tcx files are edited too
+    def ReadFolder(self, dir: str, value):
+        for f in sorted(os.listdir(dir)):
+            fileTcx = os.path.join(dir, f)
+            if os.path.splitext(Compression.StripExtension(f))[1].lower() == ".tcx" and not f.startswith(self.prefix) and os.path.isfile(fileTcx):
+                self.values[fileTcx] = value
+
+    # runs process over all files with --jobs processes, logs progress and a summary
+    # returns number of failed files
+    def Run(self, process, args: list[str], processArgs: tuple = ()):
+        files = list(self.values.items())
+        jobs = int(ArgTools.GetValue(args, ArgConstant.Jobs, "1"))
+        timeout = ArgTools.GetValue(args, ArgConstant.Timeout)
+        fileMetrics = ArgTools.GetValue(args, ArgConstant.Metrics)
+        runner = BatchRunner(jobs, float(timeout) if timeout is not None else None,
+                             collectMetrics=fileMetrics is not None, profiling=ArgConstant.Profile in args)
+        allMetrics = Metrics()
+        allMetrics.enabled = runner.collectMetrics
+        state = {"done": 0, "failed": 0}
+
+        def onResult(result: BatchResult):
+            state["done"] = state["done"] + 1
+            if len(result.output) > 0:
+                logger.info(result.output.rstrip("\n"))
+            if result.ok:
+                logger.info("[%s/%s] Done %s in %.1f s", state["done"], len(files), result.item[0], result.seconds)
+            else:
+                state["failed"] = state["failed"] + 1
+                logger.warning("[%s/%s] Failed %s: %s", state["done"], len(files), result.item[0], result.error)
+            if result.metrics is not None:
+                allMetrics.Merge(result.metrics)
+                allMetrics.Count("filesEdited" if result.ok else "filesFailed")
+
+        start = time.perf_counter()
+        runner.Run(EditFile, files, (process, processArgs), onResult=onResult)
+        seconds = time.perf_counter() - start
+        logger.info("Edited %s files, %s failed in %.1f s", len(files) - state["failed"], state["failed"], seconds)
+        if runner.collectMetrics:
+            allMetrics.SaveReport(fileMetrics)
+        return state["failed"]
@@ -0,0 +1,118 @@
+import os
+import fnmatch
+import datetime
+from .activity import ActivityType, ActivitySummary
+from .console import GetLogger
+
+logger = GetLogger(__name__)
+
+
+# files of a folder and, if recursive, of its subfolders, listed by os.scandir
+# entries come with their type from the folder listing, so files are found without a stat per file
+class FileFinder:
+    extension: str # like ".ttbin"
+    recursive: bool
+    includes: list # glob patterns, a file is taken if it matches one of them, all files if empty
+    excludes: list # glob patterns, a file or a subfolder matching one of them is skipped
+
+    def __init__(self, extension: str, recursive: bool = False, includes: list = None, excludes: list = None):
+        self.extension = extension.lower()
+        self.recursive = recursive
+        self.includes = includes if includes is not None else list()
+        self.excludes = excludes if excludes is not None else list()
+
+    # patterns are matched against the path relative to the folder, with "/" separators, and against the name
+    def Matches(self, relativePath: str, patterns: list):
+        name = relativePath.rsplit("/", 1)[-1]
+        for pattern in patterns:
+            if fnmatch.fnmatch(relativePath, pattern) or fnmatch.fnmatch(name, pattern):
+                return True
+        return False
+
+    def IsSelected(self, relativePath: str):
+        if os.path.splitext(relativePath)[1].lower() != self.extension:
+            return False
+        if len(self.includes) > 0 and not self.Matches(relativePath, self.includes):
+            return False
+        return not self.Matches(relativePath, self.excludes)
+
+    # files in listing order of each folder, subfolders after the files of their folder
+    # links to folders are not followed, so a link back to a parent can't make a loop
+    def Find(self, dir: str):
+        files = list()
+        folders = [(dir, "")]
+        while len(folders) > 0:
+            folder, relativeFolder = folders.pop(0)
+            subfolders = list()
+            try:
+                with os.scandir(folder) as entries:
+                    for entry in entries:
+                        relativePath = relativeFolder + entry.name
+                        if entry.is_file():
+                            if self.IsSelected(relativePath):
+                                files.append(entry.path)
+                        elif self.recursive and entry.is_dir(follow_symlinks=False) \
+                                and not self.Matches(relativePath, self.excludes):
+                            subfolders.append((entry.path, relativePath + "/"))
+            except OSError as e:
+                logger.warning("Skipped %s: %s", folder, e)
+            folders[0:0] = subfolders
+        return files
+
+    # member names of an archive, in all of its folders, a member is skipped if one of its folders is excluded
+    def FindMembers(self, names: list):
+        members = list()
+        for name in names:
+            folders = name.split("/")[:-1]
+            if any([self.Matches("/".join(folders[:idx + 1]), self.excludes) for idx in range(len(folders))]):
+                continue
+            if self.IsSelected(name):
+                members.append(name)
+        return members
+
+
+# selects activities by type and local start date, decided from the header and summary records of a TTBIN file
+class ActivityFilter:
+    activityTypes: set # ActivityType values, all types if empty
+    dateFrom: datetime.date # first local start date, None for no limit
+    dateTo: datetime.date # last local start date, None for no limit
+
+    def __init__(self, activityTypes: set = None, dateFrom: datetime.date = None, dateTo: datetime.date = None):
+        self.activityTypes = activityTypes if activityTypes is not None else set()
+        self.dateFrom = dateFrom
+        self.dateTo = dateTo
+
+    def IsEmpty(self):
+        return len(self.activityTypes) == 0 and self.dateFrom is None and self.dateTo is None
+
+    # the type is in the summary record at the end of the file, the start date is in the header
+    def NeedsSummary(self):
+        return len(self.activityTypes) > 0
+
+    # a file without a summary record has no type and doesn't match a type filter
+    def Matches(self, summary: ActivitySummary):
+        if len(self.activityTypes) > 0 and summary.activityType not in self.activityTypes:
+            return False
+        date = summary.GetLocalStartTime().date()
+        if self.dateFrom is not None and date < self.dateFrom:
+            return False
+        if self.dateTo is not None and date > self.dateTo:
+            return False
+        return True
+
+    # activity types by their lowercase names, like in output file names: "running;treadmill"
+    def ParseTypes(value: str):
+        names = dict([(activityType.name.lower(), activityType) for activityType in ActivityType])
+        activityTypes = set()
+        for name in value.split(";"):
+            name = name.strip().lower()
+            if len(name) == 0:
+                continue
+            if name not in names:
+                raise ValueError("unknown activity type %s" % name)
+            activityTypes.add(names[name])
+        return activityTypes
+
+    # date like 2025-01-31
+    def ParseDate(value: str):
+        return datetime.datetime.strptime(value.strip(), "%Y-%m-%d").date()
@@ -0,0 +1,132 @@
+import struct
+from enum import Enum
+from .activity import ActivityType
+
+
+class FitMessage(Enum):
+    FileId = 0
+    Session = 18
+    Lap = 19
+    Record = 20
+    Activity = 34
+
+
+class FitBaseType(Enum):
+    Enum = 0x00
+    UInt8 = 0x02
+    UInt16 = 0x84
+    SInt32 = 0x85
+    UInt32 = 0x86
+
+
+# struct format and invalid value of base types
+baseTypeFormats: dict = {
+    FitBaseType.Enum: ("B", 0xFF),
+    FitBaseType.UInt8: ("B", 0xFF),
+    FitBaseType.UInt16: ("H", 0xFFFF),
+    FitBaseType.SInt32: ("i", 0x7FFFFFFF),
+    FitBaseType.UInt32: ("I", 0xFFFFFFFF),
+}
+
+
+class FitConstant:
+    HeaderSize: int = 14
+    ProtocolVersion: int = 0x20 # 2.0
+    ProfileVersion: int = 2132 # 21.32
+    DataType: bytes = b".FIT"
+    Epoch: int = 631065600 # 1989-12-31T00:00:00Z in seconds since 1970
+    FileTypeActivity: int = 4
+    ManufacturerTomTom: int = 71
+    ActivityTypeManual: int = 0
+    EventSession: int = 8
+    EventLap: int = 9
+    EventActivity: int = 26
+    EventTypeStop: int = 1
+
+
+# definition of a message written with a fixed set of fields
+# its data messages are packed by one precompiled struct, header byte first
+class FitMessageDef:
+    localType: int
+    message: FitMessage
+    fields: list # list of (field number, FitBaseType)
+    record: struct.Struct
+
+    def __init__(self, localType: int, message: FitMessage, fields: list):
+        self.localType = localType
+        self.message = message
+        self.fields = fields
+        self.record = struct.Struct("<B" + "".join([baseTypeFormats[baseType][0] for number, baseType in fields]))
+
+    @property
+    def size(self):
+        return self.record.size
+
+    # definition message: header, reserved, little endian, global message number, fields
+    def GetDefinition(self):
+        parts = [struct.pack("<BBBHB", 0x40 | self.localType, 0, 0, self.message.value, len(self.fields))]
+        for number, baseType in self.fields:
+            parts.append(struct.pack("<BBB", number, struct.calcsize("<" + baseTypeFormats[baseType][0]), baseType.value))
+        return b"".join(parts)
+
+    def Pack(self, *values):
+        return self.record.pack(self.localType, *values)
+
+
+class FitTools:
+    crcTable: list = None # CRC-16 of every byte value
+
+    def GetCrcTable():
+        if FitTools.crcTable is None:
+            nibbles = [0x0000, 0xCC01, 0xD801, 0x1400, 0xF001, 0x3C00, 0x2800, 0xE401,
+                       0xA001, 0x6C00, 0x7800, 0xB401, 0x5000, 0x9C01, 0x8801, 0x4400]
+            table = list()
+            for byte in range(256):
+                crc = 0
+                for nibble in (byte & 0x0F, byte >> 4):
+                    tmp = nibbles[crc & 0x0F]
+                    crc = (crc >> 4) & 0x0FFF
+                    crc = crc ^ tmp ^ nibbles[nibble]
+                table.append(crc)
+            FitTools.crcTable = table
+        return FitTools.crcTable
+
+    # continues crc over data
+    def Crc(crc: int, data: bytes):
+        table = FitTools.GetCrcTable()
+        for byte in data:
+            crc = (crc >> 8) ^ table[(crc ^ byte) & 0xFF]
+        return crc
+
+    # FIT time from UTC seconds since 1970
+    def ToFitTime(seconds: int):
+        return max(0, seconds - FitConstant.Epoch)
+
+    # scaled unsigned value, limited to the valid range of its type
+    def ToUInt(value: float, scale: float, baseType: FitBaseType):
+        return min(max(0, round(value * scale)), baseTypeFormats[baseType][1] - 1)
+
+    # (sport, sub sport)
+    def GetSport(activityType: ActivityType):
+        if activityType == ActivityType.Running:
+            return (1, 0)
+        elif activityType == ActivityType.Treadmill:
+            return (1, 1)
+        elif activityType == ActivityType.TrailRunning:
+            return (1, 3)
+        elif activityType == ActivityType.Cycling:
+            return (2, 0)
+        elif activityType == ActivityType.IndoorCycling:
+            return (2, 6)
+        elif activityType == ActivityType.Swimming:
+            return (5, 0)
+        elif activityType == ActivityType.Gym:
+            return (10, 20)
+        elif activityType == ActivityType.Skiing:
+            return (13, 0)
+        elif activityType == ActivityType.Snowboarding:
+            return (14, 0)
+        elif activityType == ActivityType.Hiking:
+            return (17, 0)
+        else:
+            return (0, 0)
@@ -0,0 +1,216 @@
+import os
+import struct
+from typing import BinaryIO
+from .activity import Activity, Lap
+from .fitdef import FitMessage, FitBaseType, FitConstant, FitMessageDef, FitTools
+from .compression import Compression
+from .metrics import metrics
+from .console import GetLogger
+
+logger = GetLogger(__name__)
+
+# messages written to FIT files, their definitions are written once after the file header
+fileIdDef = FitMessageDef(0, FitMessage.FileId, [
+    (0, FitBaseType.Enum), # type
+    (1, FitBaseType.UInt16), # manufacturer
+    (4, FitBaseType.UInt32), # time_created
+])
+recordDef = FitMessageDef(1, FitMessage.Record, [
+    (253, FitBaseType.UInt32), # timestamp
+    (0, FitBaseType.SInt32), # position_lat, semicircles
+    (1, FitBaseType.SInt32), # position_long, semicircles
+    (2, FitBaseType.UInt16), # altitude, (m + 500) * 5
+    (3, FitBaseType.UInt8), # heart_rate
+    (4, FitBaseType.UInt8), # cadence
+    (5, FitBaseType.UInt32), # distance, cm
+    (6, FitBaseType.UInt16), # speed, mm/s
+])
+lapDef = FitMessageDef(2, FitMessage.Lap, [
+    (253, FitBaseType.UInt32), # timestamp, end of lap
+    (2, FitBaseType.UInt32), # start_time
+    (7, FitBaseType.UInt32), # total_elapsed_time, ms
+    (8, FitBaseType.UInt32), # total_timer_time, ms
+    (9, FitBaseType.UInt32), # total_distance, cm
+    (11, FitBaseType.UInt16), # total_calories
+    (13, FitBaseType.UInt16), # avg_speed, mm/s
+    (14, FitBaseType.UInt16), # max_speed, mm/s
+    (15, FitBaseType.UInt8), # avg_heart_rate
+    (16, FitBaseType.UInt8), # max_heart_rate
+    (0, FitBaseType.Enum), # event
+    (1, FitBaseType.Enum), # event_type
+    (254, FitBaseType.UInt16), # message_index
+])
+sessionDef = FitMessageDef(3, FitMessage.Session, [
+    (253, FitBaseType.UInt32), # timestamp, end of session
+    (2, FitBaseType.UInt32), # start_time
+    (7, FitBaseType.UInt32), # total_elapsed_time, ms
+    (8, FitBaseType.UInt32), # total_timer_time, ms
+    (9, FitBaseType.UInt32), # total_distance, cm
+    (11, FitBaseType.UInt16), # total_calories
+    (14, FitBaseType.UInt16), # avg_speed, mm/s
+    (15, FitBaseType.UInt16), # max_speed, mm/s
+    (16, FitBaseType.UInt8), # avg_heart_rate
+    (17, FitBaseType.UInt8), # max_heart_rate
+    (22, FitBaseType.UInt16), # total_ascent
+    (23, FitBaseType.UInt16), # total_descent
+    (5, FitBaseType.Enum), # sport
+    (6, FitBaseType.Enum), # sub_sport
+    (0, FitBaseType.Enum), # event
+    (1, FitBaseType.Enum), # event_type
+    (25, FitBaseType.UInt16), # first_lap_index
+    (26, FitBaseType.UInt16), # num_laps
+])
+activityDef = FitMessageDef(4, FitMessage.Activity, [
+    (253, FitBaseType.UInt32), # timestamp
+    (0, FitBaseType.UInt32), # total_timer_time, ms
+    (1, FitBaseType.UInt16), # num_sessions
+    (2, FitBaseType.Enum), # type
+    (3, FitBaseType.Enum), # event
+    (4, FitBaseType.Enum), # event_type
+])
+messageDefs: list = [fileIdDef, recordDef, lapDef, sessionDef, activityDef]
+
+
+# writes activities as FIT files: file_id, records of each lap followed by the lap, session and activity
+class FitFileWriter:
+    definitions: bytes = b"".join([messageDef.GetDefinition() for messageDef in messageDefs])
+    compression: str # Compression.Gzip or Compression.Zstd, plain file if None
+
+    def __init__(self, compression: str = None):
+        self.compression = compression
+
+    def SaveActivity(self, fileFit: str, activity: Activity):
+        if os.path.isfile(fileFit):
+            os.remove(fileFit)
+        logger.info("Saving %s", fileFit)
+
+        with Compression.OpenWrite(fileFit, self.compression) as outfile:
+            self.WriteFile(outfile, activity)
+        if metrics.enabled:
+            metrics.Count("bytesWritten", os.path.getsize(fileFit))
+
+    # writes the activity to a binary stream, like a file or a member of an archive, and leaves it open
+    def WriteFile(self, outfile: BinaryIO, activity: Activity):
+        with metrics.Stage("writefit"):
+            self.WriteActivity(outfile, activity)
+
+    # size of the data is known from the number of messages, so the file is written in one pass
+    def WriteActivity(self, outfile: BinaryIO, activity: Activity):
+        rowsByLap = activity.track.SortedRowsByLap(len(activity.laps))
+        rowCount = sum([len(lapRows) for lapRows in rowsByLap])
+        dataSize = len(self.definitions) + fileIdDef.size + rowCount * recordDef.size \
+            + len(activity.laps) * lapDef.size + sessionDef.size + activityDef.size
+
+        header = struct.pack("<BBHI4s", FitConstant.HeaderSize, FitConstant.ProtocolVersion,
+                             FitConstant.ProfileVersion, dataSize, FitConstant.DataType)
+        header = header + struct.pack("<H", FitTools.Crc(0, header))
+        outfile.write(header)
+        crc = FitTools.Crc(0, header)
+
+        startTime = FitTools.ToFitTime(activity.startTime)
+        data = self.definitions + fileIdDef.Pack(FitConstant.FileTypeActivity, FitConstant.ManufacturerTomTom, startTime)
+        outfile.write(data)
+        crc = FitTools.Crc(crc, data)
+
+        endTime = activity.startTime + activity.totalElapsedSeconds
+        for index, (lap, lapRows) in enumerate(zip(activity.laps, rowsByLap)):
+            data = self.GetRecords(lapRows, activity) + self.GetLap(index, lap, lapRows, activity)
+            outfile.write(data)
+            crc = FitTools.Crc(crc, data)
+            if len(lapRows) > 0:
+                endTime = max(endTime, activity.track.time[lapRows[-1]])
+
+        data = self.GetSession(activity, endTime) + self.GetActivity(activity, endTime)
+        outfile.write(data)
+        crc = FitTools.Crc(crc, data)
+        outfile.write(struct.pack("<H", crc))
+
+    # one record message per trackpoint, values missing in TCX output are invalid here
+    def GetRecords(self, lapRows: list, activity: Activity):
+        track = activity.track
+        pack = recordDef.record.pack
+        localType = recordDef.localType
+        epoch = FitConstant.Epoch
+        semicircles = 2147483648.0 / 180.0
+        writeSpeed = activity.writeTrackSpeed
+        invalidPosition = 0x7FFFFFFF
+        metrics.Count("trackPointsEmitted", len(lapRows))
+        records = list()
+        for row in lapRows:
+            latitudeDegrees = track.latitudeDegrees[row]
+            longitudeDegrees = track.longitudeDegrees[row]
+            altitudeMeters = track.altitudeMeters[row]
+            heartRate = track.heartRate[row]
+            speed = track.speed[row]
+            cadence = track.cadence[row]
+
+            if longitudeDegrees != 0 or latitudeDegrees != 0:
+                latitude = round(latitudeDegrees * semicircles)
+                longitude = round(longitudeDegrees * semicircles)
+            else:
+                latitude = longitude = invalidPosition
+            records.append(pack(localType,
+                                max(0, track.time[row] - epoch),
+                                latitude,
+                                longitude,
+                                min(max(0, (altitudeMeters + 500) * 5), 0xFFFE) if altitudeMeters != 0 else 0xFFFF,
+                                heartRate if heartRate > 0 else 0xFF,
+                                min(round(cadence), 0xFE) if cadence > 0 else 0xFF,
+                                min(max(0, round(track.distanceMeters[row] * 100)), 0xFFFFFFFE),
+                                min(round(speed * 1000), 0xFFFE) if speed > 0 and writeSpeed else 0xFFFF))
+        return b"".join(records)
+
+    def GetLap(self, index: int, lap: Lap, lapRows: list, activity: Activity):
+        track = activity.track
+        heartRates = [track.heartRate[row] for row in lapRows if track.heartRate[row] > 0]
+        avgHeartRate = round(sum(heartRates) / len(heartRates)) if len(heartRates) > 0 else 0xFF
+        maxHeartRate = max(heartRates) if len(heartRates) > 0 else 0xFF
+        maxSpeed = 0xFFFF
+        if activity.writeTrackSpeed and len(lapRows) > 0:
+            maxSpeed = FitTools.ToUInt(max([track.speed[row] for row in lapRows]), 1000, FitBaseType.UInt16)
+        avgSpeed = FitTools.ToUInt(lap.distance / lap.seconds, 1000, FitBaseType.UInt16) if lap.seconds > 0 else 0xFFFF
+        return lapDef.Pack(
+            FitTools.ToFitTime(lap.startTime + lap.seconds),
+            FitTools.ToFitTime(lap.startTime),
+            FitTools.ToUInt(lap.seconds, 1000, FitBaseType.UInt32),
+            FitTools.ToUInt(lap.seconds, 1000, FitBaseType.UInt32),
+            FitTools.ToUInt(lap.distance, 100, FitBaseType.UInt32),
+            FitTools.ToUInt(lap.calories, 1, FitBaseType.UInt16),
+            avgSpeed,
+            maxSpeed,
+            avgHeartRate,
+            maxHeartRate,
+            FitConstant.EventLap,
+            FitConstant.EventTypeStop,
+            index)
+
+    def GetSession(self, activity: Activity, endTime: int):
+        sport, subSport = FitTools.GetSport(activity.activityType)
+        return sessionDef.Pack(
+            FitTools.ToFitTime(endTime),
+            FitTools.ToFitTime(activity.startTime),
+            FitTools.ToUInt(activity.totalElapsedSeconds, 1000, FitBaseType.UInt32),
+            FitTools.ToUInt(activity.totalActiveSeconds, 1000, FitBaseType.UInt32),
+            FitTools.ToUInt(activity.totalDistanceMeters, 100, FitBaseType.UInt32),
+            FitTools.ToUInt(activity.totalCalories, 1, FitBaseType.UInt16),
+            FitTools.ToUInt(activity.avgSpeed, 1000, FitBaseType.UInt16),
+            FitTools.ToUInt(activity.maxSpeed, 1000, FitBaseType.UInt16),
+            FitTools.ToUInt(activity.avgHeartRate, 1, FitBaseType.UInt8) if activity.avgHeartRate > 0 else 0xFF,
+            FitTools.ToUInt(activity.maxHeartRate, 1, FitBaseType.UInt8) if activity.maxHeartRate > 0 else 0xFF,
+            FitTools.ToUInt(activity.totalAscendMeters, 1, FitBaseType.UInt16),
+            FitTools.ToUInt(activity.totalDescendMeters, 1, FitBaseType.UInt16),
+            sport,
+            subSport,
+            FitConstant.EventSession,
+            FitConstant.EventTypeStop,
+            0,
+            len(activity.laps))
+
+    def GetActivity(self, activity: Activity, endTime: int):
+        return activityDef.Pack(
+            FitTools.ToFitTime(endTime),
+            FitTools.ToUInt(activity.totalActiveSeconds, 1000, FitBaseType.UInt32),
+            1,
+            FitConstant.ActivityTypeManual,
+            FitConstant.EventActivity,
+            FitConstant.EventTypeStop)
@@ -0,0 +1,162 @@
+import os
+import json
+import time
+import pstats
+import cProfile
+import contextlib
+
+
+# wall and cpu time of a stage, optionally profiled
+class StageTimer:
+    def __init__(self, metrics, name: str):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.profile = self.metrics.GetProfile(self.name)
+        if self.profile is not None:
+            self.profile.enable()
+        self.wallStart = time.perf_counter()
+        self.cpuStart = time.process_time()
+        return self
+
+    def __exit__(self, excType, excValue, tb):
+        wall = time.perf_counter() - self.wallStart
+        cpu = time.process_time() - self.cpuStart
+        if self.profile is not None:
+            self.profile.disable()
+        self.metrics.AddStage(self.name, wall, cpu)
+        return False
+
+
+# holds collected profile statistics in the form pstats.Stats loads them
+class ProfileStats:
+    def __init__(self, stats: dict):
+        self.stats = stats
+
+    def create_stats(self):
+        return
+
+
+# counters and timers per stage and per record tag
+# disabled by default, then stages and counting cost nothing but a flag check
+# one instance per process, it isn't thread safe: enabled metrics need conversions to run in one thread
+class Metrics:
+    enabled: bool
+    profiling: bool
+    stages: dict # key = stage name, value = dict with calls, wallSeconds, cpuSeconds
+    counters: dict # key = counter name, value = number
+    recordsByTag: dict # key = tag, value = number of records
+    profiles: dict # key = stage name, value = cProfile.Profile or ProfileStats
+
+    def __init__(self):
+        self.enabled = False
+        self.profiling = False
+        self.Reset()
+
+    def Reset(self):
+        self.stages = dict()
+        self.counters = dict()
+        self.recordsByTag = dict()
+        self.profiles = dict()
+
+    def Enable(self, profiling: bool = False):
+        self.enabled = True
+        self.profiling = profiling
+
+    def Disable(self):
+        self.enabled = False
+        self.profiling = False
+
+    def Stage(self, name: str):
+        if not self.enabled:
+            return noStage
+        return StageTimer(self, name)
+
+    def Count(self, name: str, value: int = 1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def CountTag(self, tag: int, value: int = 1):
+        self.recordsByTag[tag] = self.recordsByTag.get(tag, 0) + value
+
+    def AddStage(self, name: str, wall: float, cpu: float, calls: int = 1):
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = {"calls": 0, "wallSeconds": 0.0, "cpuSeconds": 0.0}
+            self.stages[name] = stage
+        stage["calls"] = stage["calls"] + calls
+        stage["wallSeconds"] = stage["wallSeconds"] + wall
+        stage["cpuSeconds"] = stage["cpuSeconds"] + cpu
+
+    def GetProfile(self, name: str):
+        if not self.profiling:
+            return None
+        profile = self.profiles.get(name)
+        if profile is None:
+            profile = cProfile.Profile()
+            self.profiles[name] = profile
+        return profile
+
+    # picklable snapshot, to be merged into metrics of another process
+    def ToDict(self):
+        profiles = dict()
+        for name, profile in self.profiles.items():
+            profile.create_stats()
+            profiles[name] = profile.stats
+        return {
+            "stages": self.stages,
+            "counters": self.counters,
+            "recordsByTag": self.recordsByTag,
+            "profiles": profiles,
+        }
+
+    def Merge(self, snapshot: dict):
+        for name, stage in snapshot["stages"].items():
+            self.AddStage(name, stage["wallSeconds"], stage["cpuSeconds"], stage["calls"])
+        for name, value in snapshot["counters"].items():
+            self.counters[name] = self.counters.get(name, 0) + value
+        for tag, value in snapshot["recordsByTag"].items():
+            self.CountTag(tag, value)
+        for name, stats in snapshot["profiles"].items():
+            profile = self.profiles.get(name)
+            if profile is None:
+                self.profiles[name] = ProfileStats(dict(stats))
+            else:
+                merged = pstats.Stats(profile)
+                merged.add(ProfileStats(stats))
+                self.profiles[name] = ProfileStats(merged.stats)
+
+    def Save(self, fileJson: str):
+        data = {
+            "stages": self.stages,
+            "counters": self.counters,
+            "recordsByTag": dict([("0x%02x" % tag, value) for tag, value in sorted(self.recordsByTag.items())]),
+        }
+        with open(fileJson, "w", encoding="utf-8") as outfile:
+            json.dump(data, outfile, indent=1)
+
+    # writes one pstats file per stage: prefix-stage.pstats
+    def SaveProfiles(self, prefix: str):
+        files = list()
+        for name, profile in self.profiles.items():
+            fileStats = "%s-%s.pstats" % (prefix, name)
+            pstats.Stats(profile).dump_stats(fileStats)
+            files.append(fileStats)
+        return files
+
+    # saves metrics if a file is given and profiles next to it
+    def SaveReport(self, fileJson: str = None):
+        if fileJson is not None:
+            print("Saving %s" % fileJson)
+            self.Save(fileJson)
+        if len(self.profiles) > 0:
+            prefix = os.path.splitext(fileJson)[0] if fileJson is not None else "profile"
+            for fileStats in self.SaveProfiles(prefix):
+                print("Saving %s" % fileStats)
+
+
+noStage = contextlib.nullcontext()
+
+# metrics of this process
+metrics = Metrics()
@@ -0,0 +1,177 @@
+import os
+import sys
+import struct
+from array import array
+from .activity import Activity, ActivityType, Lap
+from .version import ConverterVersion
+from .metrics import metrics
+from .console import GetLogger
+
+logger = GetLogger(__name__)
+
+# changes whenever the layout changes, snapshots of another version or converter version are decoded again
+SnapshotVersion: int = 1
+
+# magic, snapshot version, converter version, byte order of arrays, content hash of the TTBIN file
+headerDef = struct.Struct("<8sH16s1s32s")
+countsDef = struct.Struct("<II") # laps, track rows
+# scalars keep their type, as output is formatted from them: tag "i" or "f" and 8 bytes
+intDef = struct.Struct("<cq")
+floatDef = struct.Struct("<cd")
+
+activityFields: tuple = ("startTime", "totalActiveSeconds", "totalElapsedSeconds", "totalDistanceMeters", "totalCalories",
+                         "totalSteps", "totalAscendMeters", "totalDescendMeters", "avgSpeed", "maxSpeed",
+                         "batteryLevelMin", "batteryLevelMax", "avgHeartRate", "maxHeartRate",
+                         "currentLapIndex", "firstRowWaitingAltitude")
+lapFields: tuple = ("seconds", "distance", "calories", "startTime")
+trackColumns: tuple = ("time", "heartRate", "distanceMeters", "speed", "latitudeDegrees", "longitudeDegrees",
+                       "altitudeMeters", "steps", "cadence", "lapIndex")
+
+
+# decoded activities after PostLoad and before edits, in files named by the content hash of their TTBIN file
+# a snapshot is the activity's values and its track columns as they are in memory, so loading it is copying bytes
+# files are removed least recently used first when the folder gets larger than maxBytes
+class SnapshotCache:
+    dir: str
+    maxBytes: int
+    magic: bytes = b"TTBINSNP"
+    extension: str = ".snapshot"
+
+    def __init__(self, dir: str, maxBytes: int = 512 * 1048576):
+        self.dir = dir
+        self.maxBytes = maxBytes
+
+    def GetFileName(self, hash: str):
+        return os.path.join(self.dir, hash + self.extension)
+
+    # activity of the content, like TtbinFileReader.LoadActivity prints it, None if there is no valid snapshot
+    # returns (activity, local time offset)
+    def Load(self, name: str, hash: str, args: list[str]):
+        fileSnapshot = self.GetFileName(hash)
+        try:
+            with open(fileSnapshot, "rb") as infile:
+                data = infile.read()
+        except OSError:
+            return None
+
+        with metrics.Stage("snapshot"):
+            try:
+                activity, localTimeOffset = self.Decode(data, hash)
+            except (struct.error, ValueError, IndexError):
+                activity = None
+            if activity is None:
+                return None
+            # modification time tells when the snapshot was used last
+            os.utime(fileSnapshot)
+            metrics.Count("bytesRead", len(data))
+
+        logger.info("Loading %s from snapshot", name)
+        activity.BuildHRZones(args)
+        activity.CountHRZones()
+        activity.LogSummary()
+        return activity, localTimeOffset
+
+    # saves the activity loaded by PostLoad, written to a temporary file first, as other processes may read it
+    def Save(self, hash: str, activity: Activity, localTimeOffset: int):
+        os.makedirs(self.dir, exist_ok=True)
+        fileSnapshot = self.GetFileName(hash)
+        fileTemp = "%s.%s.tmp" % (fileSnapshot, os.getpid())
+        with open(fileTemp, "wb") as outfile:
+            outfile.write(self.Encode(activity, localTimeOffset, hash))
+        os.replace(fileTemp, fileSnapshot)
+
+    def Encode(self, activity: Activity, localTimeOffset: int, hash: str):
+        track = activity.track
+        parts = [headerDef.pack(self.magic, SnapshotVersion, ConverterVersion.encode(), sys.byteorder[0].encode(), bytes.fromhex(hash)),
+                 countsDef.pack(len(activity.laps), len(track)),
+                 EncodeScalar(activity.activityType.value),
+                 EncodeScalar(localTimeOffset)]
+        parts.extend([EncodeScalar(getattr(activity, field)) for field in activityFields])
+        for lap in activity.laps:
+            parts.extend([EncodeScalar(getattr(lap, field)) for field in lapFields])
+        parts.append(array("I", activity.heartRateCounts).tobytes())
+        parts.extend([getattr(track, column).tobytes() for column in trackColumns])
+        return b"".join(parts)
+
+    # None if the snapshot is of another version, content or platform
+    def Decode(self, data: bytes, hash: str):
+        magic, version, converterVersion, byteOrder, snapshotHash = headerDef.unpack_from(data, 0)
+        if magic != self.magic or version != SnapshotVersion or converterVersion.rstrip(b"\0").decode() != ConverterVersion \
+                or byteOrder.decode() != sys.byteorder[0] or snapshotHash.hex() != hash:
+            return None, 0
+        lapCount, rowCount = countsDef.unpack_from(data, headerDef.size)
+        pos = headerDef.size + countsDef.size
+
+        activity = Activity()
+        value, pos = DecodeScalar(data, pos)
+        activity.activityType = ActivityType(value)
+        localTimeOffset, pos = DecodeScalar(data, pos)
+        for field in activityFields:
+            value, pos = DecodeScalar(data, pos)
+            setattr(activity, field, value)
+        for idx in range(lapCount):
+            lap = Lap(0, 0, 0)
+            for field in lapFields:
+                value, pos = DecodeScalar(data, pos)
+                setattr(lap, field, value)
+            activity.laps.append(lap)
+
+        counts = array("I")
+        counts.frombytes(data[pos:pos + 256 * counts.itemsize])
+        activity.heartRateCounts = counts.tolist()
+        pos = pos + 256 * counts.itemsize
+
+        track = activity.track
+        for column in trackColumns:
+            values = array(getattr(track, column).typecode)
+            size = rowCount * values.itemsize
+            values.frombytes(data[pos:pos + size])
+            pos = pos + size
+            setattr(track, column, values)
+        if pos != len(data):
+            raise ValueError("snapshot size doesn't match its content")
+        track.rows = dict(zip(track.time, range(rowCount)))
+        return activity, localTimeOffset
+
+    # removes least recently used snapshots until the folder fits into maxBytes
+    # returns (removed files, removed bytes)
+    def Evict(self):
+        snapshots = list()
+        try:
+            with os.scandir(self.dir) as entries:
+                for entry in entries:
+                    if entry.name.endswith(self.extension) and entry.is_file():
+                        stat = entry.stat()
+                        snapshots.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        except OSError:
+            return 0, 0
+
+        totalBytes = sum([size for mtime, size, path in snapshots])
+        removed = 0
+        removedBytes = 0
+        for mtime, size, path in sorted(snapshots):
+            if totalBytes <= self.maxBytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            totalBytes = totalBytes - size
+            removed = removed + 1
+            removedBytes = removedBytes + size
+        return removed, removedBytes
+
+
+def EncodeScalar(value):
+    if isinstance(value, float):
+        return floatDef.pack(b"f", value)
+    return intDef.pack(b"i", value)
+
+
+def DecodeScalar(data: bytes, pos: int):
+    tag = data[pos:pos + 1]
+    if tag == b"f":
+        return floatDef.unpack_from(data, pos)[1], pos + floatDef.size
+    if tag == b"i":
+        return intDef.unpack_from(data, pos)[1], pos + intDef.size
+    raise ValueError("wrong scalar tag %s" % tag)
@@ -75,6 +75,8 @@ class XmlConstant:
 
 
 class XmlTools:
+    timePrefix: tuple = (None, "") # last formatted minute and its "YYYY-MM-DDTHH:MM:" text
+
     def AddNamespace(namespace: str, attribute: str):
         ret = format("%s:%s" % (namespace, attribute))
         return ret
@@ -82,6 +84,15 @@ class XmlTools:
     def FormatDate(dt: datetime):
         return  dt.isoformat("T", "seconds").replace("+00:00", "Z")
 
+    # formats UTC seconds since 1970, consecutive times share the formatted minute
+    def FormatTime(seconds: int):
+        minute, second = divmod(seconds, 60)
+        cachedMinute, prefix = XmlTools.timePrefix
+        if cachedMinute != minute:
+            prefix = datetime.datetime.fromtimestamp(minute * 60, datetime.timezone.utc).isoformat("T", "seconds")[:-8]
+            XmlTools.timePrefix = (minute, prefix)
+        return "%s%02dZ" % (prefix, second)
+
     def ISOStrToDate(s: str):
         return datetime.datetime.fromisoformat(s)
 
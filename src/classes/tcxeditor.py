@@ -1,158 +1,139 @@
 import os
-import re
 import datetime
 import xml.dom.minidom
-from enum import Enum, auto
 from xml.dom.minidom import Element
 from .tcxdef import XmlTools, XmlElement, XmlAttribute, XmlNamespace
+from .trackedit import EditOperation, TrackEdit
+from .compression import Compression
+from .metrics import metrics
+from .console import GetLogger
 
-
-class IntervalDef(Enum):
-    l = auto()
-    m = auto()
-    s = auto()
+logger = GetLogger(__name__)
 
 
+# child elements of a track point (or a lap) found in one scan, edits change their text in place
 class TrackPointWrapper:
+    distanceName: str = XmlElement.DistanceMeters.name
+    timeName: str = XmlElement.Time.name
+    cadenceName: str = XmlElement.Cadence.name
+    extensionsName: str = XmlElement.Extensions.name
+    tpxName: str = XmlTools.AddNamespace(XmlNamespace.x.name, XmlElement.TPX.name)
+    speedName: str = XmlTools.AddNamespace(XmlNamespace.x.name, XmlElement.Speed.name)
+
     def __init__(self, element: Element):
         self.trackPointElement = element
         self.distanceElement = None
         self.distanceMeters = 0
         self.timeElement = None
         self.time = datetime.datetime.now(datetime.timezone.utc)
+        self.cadenceElement = None
+        self.extensionsElement = None
+        self.tpxElement = None
+        self.speedElement = None
+
+        for childNode in element.childNodes:
+            nodeName = childNode.nodeName
+            if nodeName == self.distanceName:
+                if self.distanceElement is None:
+                    self.distanceElement = childNode
+                    text = self.GetText(childNode)
+                    if text is not None:
+                        self.distanceMeters = float(text)
+            elif nodeName == self.timeName:
+                if self.timeElement is None:
+                    self.timeElement = childNode
+                    text = self.GetText(childNode)
+                    if text is not None:
+                        self.time = XmlTools.ISOStrToDate(text)
+            elif nodeName == self.cadenceName:
+                if self.cadenceElement is None:
+                    self.cadenceElement = childNode
+            elif nodeName == self.extensionsName:
+                if self.extensionsElement is None:
+                    self.extensionsElement = childNode
+                    self.tpxElement = self.GetChild(childNode, self.tpxName)
+                    if self.tpxElement is not None:
+                        self.speedElement = self.GetChild(self.tpxElement, self.speedName)
+        return
 
+    # data of the first text node
+    def GetText(self, element: Element):
         for childNode in element.childNodes:
-            if childNode.nodeName == XmlElement.DistanceMeters.name:
-                self.distanceElement = childNode
-                for childNode2 in childNode.childNodes:
-                    if childNode2.nodeType == Element.TEXT_NODE:
-                        self.distanceMeters = float(childNode2.data)
-                        break
-                break
+            if childNode.nodeType == Element.TEXT_NODE:
+                return childNode.data
+        return None
 
+    def GetChild(self, element: Element, name: str):
         for childNode in element.childNodes:
-            if childNode.nodeName == XmlElement.Time.name:
-                self.timeElement = childNode
-                for childNode2 in childNode.childNodes:
-                    if childNode2.nodeType == Element.TEXT_NODE:
-                        self.time = XmlTools.ISOStrToDate(childNode2.data)
-                        break
-                break
+            if childNode.nodeName == name:
+                return childNode
+        return None
+
+    # replaces the element's text, the text node is kept if it is the only child
+    def SetText(self, element: Element, text: str):
+        childNodes = element.childNodes
+        if len(childNodes) == 1 and childNodes[0].nodeType == Element.TEXT_NODE:
+            childNodes[0].data = text
+            return
+        for childNode in childNodes:
+            element.removeChild(childNode)
+        element.appendChild(element.ownerDocument.createTextNode(text))
         return
 
     def CorrectDistance(self, factor: float):
         self.distanceMeters = round(self.distanceMeters * factor, 2)
-        for childNode in self.distanceElement.childNodes:
-            self.distanceElement.removeChild(childNode)
-        self.distanceElement.appendChild(
-            self.distanceElement.ownerDocument.createTextNode(XmlTools.FormatFloat(self.distanceMeters)))
+        self.SetText(self.distanceElement, XmlTools.FormatFloat(self.distanceMeters))
         self.RemoveSpeedNode()
         return
 
     def SetDistance(self, distance: float):
-        self.distanceMeters = round(distance, 4)
+        self.SetDistanceValue(distance)
         self.CorrectDistance(1.0)
         return
 
+    # same value as SetDistance, the element is changed by the next CorrectDistance
+    def SetDistanceValue(self, distance: float):
+        self.distanceMeters = round(round(distance, 4), 2)
+        return
+
     def RemoveSpeedNode(self):
-        for childNode in self.trackPointElement.childNodes:
-            if childNode.nodeName == XmlElement.Extensions.name:
-                for childNode2 in childNode.childNodes:
-                    if childNode2.nodeName == XmlTools.AddNamespace(XmlNamespace.x.name, XmlElement.TPX.name):
-                        for childNode3 in childNode2.childNodes:
-                            if childNode3.nodeName == XmlTools.AddNamespace(XmlNamespace.x.name, XmlElement.Speed.name):
-                                childNode2.removeChild(childNode3)
-                                break
-                        break
-                break
+        if self.speedElement is not None:
+            self.tpxElement.removeChild(self.speedElement)
+            self.speedElement = None
         return
 
     def AddSpeedNode(self, speed: float):
-        extensionNode = None
-        tpxNode = None
-        speedNode = None
-        for childNode in self.trackPointElement.childNodes:
-            if childNode.nodeName == XmlElement.Extensions.name:
-                extensionNode = childNode
-                for childNode2 in childNode.childNodes:
-                    if childNode2.nodeName == XmlTools.AddNamespace(XmlNamespace.x.name, XmlElement.TPX.name):
-                        tpxNode = childNode2
-                        for childNode3 in childNode2.childNodes:
-                            if childNode3.nodeName == XmlTools.AddNamespace(XmlNamespace.x.name, XmlElement.Speed.name):
-                                speedNode = childNode3
-                                break
-                        break
-                break
-
-        if extensionNode is None:
-            extensionNode = self.trackPointElement.ownerDocument.createElement(XmlElement.Extensions.name)
-            self.trackPointElement.appendChild(extensionNode)
-        if tpxNode is None:
-            tpxNode = self.trackPointElement.ownerDocument.createElement(
-                XmlTools.AddNamespace(XmlNamespace.x.name, XmlElement.TPX.name))
-            extensionNode.appendChild(tpxNode)
-        if speedNode is None:
-            speedNode = self.trackPointElement.ownerDocument.createElement(
-                XmlTools.AddNamespace(XmlNamespace.x.name, XmlElement.Speed.name))
-            tpxNode.appendChild(speedNode)
-
-        for childNode in speedNode.childNodes:
-            speedNode.removeChild(childNode)
-        speedNode.appendChild(
-            self.trackPointElement.ownerDocument.createTextNode(XmlTools.FormatFloat(speed / 3.6)))
-
+        document = self.trackPointElement.ownerDocument
+        if self.extensionsElement is None:
+            self.extensionsElement = document.createElement(self.extensionsName)
+            self.trackPointElement.appendChild(self.extensionsElement)
+        if self.tpxElement is None:
+            self.tpxElement = document.createElement(self.tpxName)
+            self.extensionsElement.appendChild(self.tpxElement)
+        if self.speedElement is None:
+            self.speedElement = document.createElement(self.speedName)
+            self.tpxElement.appendChild(self.speedElement)
+
+        self.SetText(self.speedElement, XmlTools.FormatFloat(speed / 3.6))
         return
 
     def GetLapElement(self):
         return self.trackPointElement.parentNode.parentNode
 
 
-class Interval:
-    def __init__(self, interval: str, startTime: datetime):
-        self.seconds = 0.0
-        self.speed = 0.0
-        self.meters = 0.0
-        self.interval = interval
-        self.hasData = False
-
-        matches = re.findall(r"([\d.]+)([ms])([\d.]+)", interval.strip())
-        if len(matches) == 0:
-            return
-        match = matches[0]
-        if len(match) != 3:
-            return
-
-        self.speed = float(match[2])
-        if match[1] == IntervalDef.m.name:
-            self.meters = float(match[0])
-            if self.speed != 0:
-                self.seconds = self.meters * 3.6 / self.speed
-        else:
-            self.seconds = float(match[0])
-            self.meters = self.seconds * self.speed / 3.6
-
-        if self.speed == 0:
-            self.meters = 0.0  # can't make a distance by standing
-        if self.meters == 0:
-            self.speed = 0.0   # no distance => no speed
-
-        self.startTime = startTime
-        self.endTime = startTime + datetime.timedelta(seconds=self.seconds)
-        self.hasData = True
-        return
-
-    def WithinInterval(self, time: datetime):
-        return time >= self.startTime and time <= self.endTime
-
 class TcxFileEditor:
     def __init__(self):
         self.doc = None
         return
 
     def LoadXml(self, fileTcx):
-        print("Loading %s" % fileTcx)
-        self.doc = xml.dom.minidom.parse(fileTcx)
-        self.CleanEmptyTextNodes(self.doc.childNodes[0])
+        logger.info("Loading %s", fileTcx)
+        with metrics.Stage("loadxml"):
+            with Compression.OpenRead(fileTcx) as infile:
+                self.doc = xml.dom.minidom.parse(infile)
+            self.CleanEmptyTextNodes(self.doc.childNodes[0])
+        if metrics.enabled:
+            metrics.Count("bytesRead", os.path.getsize(fileTcx))
         return
 
     def CleanEmptyTextNodes(self, node: Element):
@@ -166,88 +147,99 @@ class TcxFileEditor:
             node.parentNode.removeChild(node)
         return
 
-    def SaveXml(self, fileTcx):
+    def SaveXml(self, fileTcx, compression: str = None):
         if os.path.isfile(fileTcx):
             os.remove(fileTcx)
-        print("Saving %s" % fileTcx)
+        logger.info("Saving %s", fileTcx)
 
-        with open(fileTcx, 'wb') as outfile:
+        with metrics.Stage("savexml"), Compression.OpenWrite(fileTcx, compression) as outfile:
             outfile.write(self.doc.toprettyxml(encoding="utf-8", indent=" "))
             outfile.flush()
+        if metrics.enabled:
+            metrics.Count("bytesWritten", os.path.getsize(fileTcx))
         return
 
+    # applies (EditOperation, value) edits in order to the loaded document, stops at the first failing one
+    def ApplyEdits(self, edits: list):
+        for operation, value in edits:
+            if operation == EditOperation.ChangeLength:
+                done = self.ChangeLength(value)
+            else:
+                done = self.ChangeSpeed(value)
+            if not done:
+                return False
+        return True
+
     def ChangeLength(self, newLen: float):
         if newLen <= 0.0:
-            print("Error: new distance should be greater than zero")
+            logger.error("Error: new distance should be greater than zero")
             return False
 
+        with metrics.Stage("changelength"):
+            return self.ChangeTrackLength(newLen)
+
+    def ChangeTrackLength(self, newLen: float):
+        elements = self.FindElements((XmlElement.Trackpoint.name, XmlElement.DistanceMeters.name))
+
         # change in track points
-        trackPoints = self.ExtractTrackPoints()
-        oldLen = self.GetFullDistance(trackPoints)
+        trackPoints = self.ExtractTrackPoints(elements[XmlElement.Trackpoint.name])
+        oldLen = TrackEdit.GetFullDistance([trackPoint.distanceMeters for trackPoint in trackPoints])
 
-        print("Old distance: %s m" % oldLen)
-        print("New distance: %s m" % newLen)
+        logger.info("Old distance: %s m", oldLen)
+        logger.info("New distance: %s m", newLen)
+        if oldLen <= 0.0:
+            logger.error("Error: activity has no distance to change")
+            return False
 
         factor: float = newLen / oldLen
         for trackPoint in trackPoints:
             trackPoint.CorrectDistance(factor)
 
         # change in other places
-        for distanceElements in self.doc.getElementsByTagName(XmlElement.DistanceMeters.name):
+        for distanceElements in elements[XmlElement.DistanceMeters.name]:
             if distanceElements.parentNode.tagName != XmlElement.Trackpoint.name:
                 otherPoint = TrackPointWrapper(distanceElements.parentNode)
                 otherPoint.CorrectDistance(factor)
 
         return True
 
-    def ExtractTrackPoints(self):
-        trackPoints = list()
-        for trackPointElement in self.doc.getElementsByTagName(XmlElement.Trackpoint.name):
-            trackPoint = TrackPointWrapper(trackPointElement)
-            trackPoints.append(trackPoint)
+    def ExtractTrackPoints(self, trackPointElements: list = None):
+        if trackPointElements is None:
+            trackPointElements = self.FindElements((XmlElement.Trackpoint.name,))[XmlElement.Trackpoint.name]
+        trackPoints = [TrackPointWrapper(trackPointElement) for trackPointElement in trackPointElements]
+        metrics.Count("trackPointsEdited", len(trackPoints))
         return trackPoints
 
-    def ParseIntervals(self, intervals: str, startTime: datetime):
-        if len(intervals) == 0:
-            print("Wrong interval parameter %s" % intervals)
-            return list()
-        if intervals[0] == IntervalDef.l.name: # laps mode
-            return self.ParseLapIntervals(intervals);
-
-        intervalList = intervals.split(";")
-        intervalObjects = list()
-        intervalStartTime = startTime
-        for intervalStr in intervalList:
-            intervalObject = Interval(intervalStr, intervalStartTime)
-            if intervalObject.hasData == True:
-                intervalObjects.append(intervalObject)
-                intervalStartTime = intervalObject.endTime + datetime.timedelta(seconds=1)
-            else:
-                print("Can't parse interval %s" % intervalStr)
-        return intervalObjects
-
-    def ParseLapIntervals(self, intervals: str):
-        intervalList = intervals.removeprefix(IntervalDef.l.name).split(";")
-        intervalObjects = list()
-        i = 0
+    # elements of several names in document order, found in one walk over the document
+    def FindElements(self, names: tuple):
+        elements = dict([(name, list()) for name in names])
+        self.FindChildElements(self.doc, elements)
+        return elements
+
+    def FindChildElements(self, node, elements: dict):
+        for childNode in node.childNodes:
+            if childNode.nodeType == Element.ELEMENT_NODE:
+                found = elements.get(childNode.tagName)
+                if found is not None:
+                    found.append(childNode)
+                if childNode.childNodes:
+                    self.FindChildElements(childNode, elements)
+
+    # (start time, seconds text or None) of laps for laps mode intervals
+    def GetLaps(self):
+        laps = list()
         for lapElement in self.doc.getElementsByTagName(XmlElement.Lap.name):
             timeStr = lapElement.getAttribute(XmlAttribute.StartTime.name)
-            lapStartTime = XmlTools.ISOStrToDate(timeStr)
+            lapSeconds = None
             for childNode in lapElement.childNodes:
                 if childNode.nodeName == XmlElement.TotalTimeSeconds.name:
                     for childNode2 in childNode.childNodes:
                         if childNode2.nodeType == Element.TEXT_NODE:
-                            lapSeconds = int(childNode2.data)
-                            intervalStr = "%ss%s" % (lapSeconds, intervalList[i])
-                            intervalObject = Interval(intervalStr, lapStartTime)
-                            intervalObjects.append(intervalObject)
+                            lapSeconds = childNode2.data
                             break
                     break
-
-            i = i + 1
-            if i >= len(intervalList):
-                break
-        return intervalObjects
+            laps.append((XmlTools.ISOStrToDate(timeStr), lapSeconds))
+        return laps
 
     def GetActivityStartTime(self):
         startTime = None
@@ -258,83 +250,39 @@ class TcxFileEditor:
                 startTime = time
         return startTime
 
-    def GetIntervalForTime(self, intervalList: list, time: datetime):
-        for interval in intervalList:
-            if interval.WithinInterval(time):
-                return interval
-        return None
-
-    def GetFullDistance(self, trackPoints: list):
-        oldLen = 0.0
-        for trackPoint in trackPoints:
-            if trackPoint.distanceMeters > oldLen:
-                oldLen = trackPoint.distanceMeters
-        return oldLen
-
     def CalculateDistanceByLap(self, trackPoints: list):
         lapsElements = dict()
         for trackPoint in trackPoints:
             lapElement = trackPoint.GetLapElement()
             if lapElement not in lapsElements:
                 lapsElements[lapElement] = list()
-            lapsElements[lapElement].append(trackPoint)
-
-        for lapElement in lapsElements:
-            minDistance = None
-            maxDistance = None
-            for trackPoint in lapsElements[lapElement]:
-                if minDistance is None or trackPoint.distanceMeters < minDistance:
-                    minDistance = trackPoint.distanceMeters
-                if maxDistance is None or trackPoint.distanceMeters > maxDistance:
-                    maxDistance = trackPoint.distanceMeters
-            lapDistance = 0.0
-            if minDistance is not None and maxDistance is not None:
-                lapDistance = maxDistance - minDistance
+            lapsElements[lapElement].append(trackPoint.distanceMeters)
+
+        for lapElement, distances in lapsElements.items():
             lapPoint = TrackPointWrapper(lapElement) # to set DistanceMeters
-            lapPoint.SetDistance(lapDistance)
+            lapPoint.SetDistance(TrackEdit.GetLapDistance(distances))
 
         return
 
     def ChangeSpeed(self, intervals: str):
+        with metrics.Stage("changespeed"):
+            return self.ChangeTrackSpeed(intervals)
+
+    def ChangeTrackSpeed(self, intervals: str):
         startTime = self.GetActivityStartTime()
-        intervalList = self.ParseIntervals(intervals, startTime)
+        intervalList = TrackEdit.ParseIntervals(intervals, startTime, self.GetLaps())
         if len(intervalList) == 0:
-            print("Wrong interval definition")
+            logger.warning("Wrong interval definition")
             return False
 
         trackPoints = self.ExtractTrackPoints()
-        oldLen = self.GetFullDistance(trackPoints)
-        trackPointsByTime = dict() # key - time, value - trackPoint
-        for trackPoint in trackPoints:
-            trackPointsByTime[trackPoint.time] = trackPoint
-        trackPointsTime = sorted(trackPointsByTime)
-
-        currentDistance = 0.0
-        currentTime = startTime
-        currentSpeed = 0.0
-        smoothFirstPoints = smoothRest = 5
-        for trackPointTime in trackPointsTime:
-            trackPoint = trackPointsByTime[trackPointTime]
-            interval = self.GetIntervalForTime(intervalList, trackPointTime)
-            if interval is not None:
-                currentSpeed = interval.speed
-            timeFromPrev = (trackPointTime - currentTime).total_seconds()
-            if smoothRest > 0: # smooth start
-                currentSpeed = currentSpeed * (1 - smoothRest / smoothFirstPoints)
-                smoothRest = smoothRest - 1
-            currentDistance = currentDistance + timeFromPrev * currentSpeed / 3.6
-            currentTime = trackPointTime
-            trackPoint.SetDistance(currentDistance)
-            # doesn't make any difference # trackPoint.AddSpeedNode(currentSpeed)
-
-        newLen = self.GetFullDistance(trackPoints)
-
-        print("Original distance: %s m" % oldLen)
-        print("Calculated distance: %s m. Changing back" % newLen)
-
-        factor: float = oldLen / newLen
-        for trackPoint in trackPoints:
-            trackPoint.CorrectDistance(factor)
+        distances = TrackEdit.GetSpeedPlanDistances([trackPoint.time for trackPoint in trackPoints],
+                                                    [trackPoint.distanceMeters for trackPoint in trackPoints],
+                                                    intervalList, startTime)
+        if distances is None:
+            return False
+        for trackPoint, distance in zip(trackPoints, distances):
+            trackPoint.SetDistance(distance)
 
         self.CalculateDistanceByLap(trackPoints)
 
@@ -0,0 +1,236 @@
+import os
+import xml.parsers.expat
+from .tcxdef import XmlTools, XmlElement, XmlNamespace
+from .xmlstream import XmlStreamWriter
+from .compression import Compression
+from .metrics import metrics
+from .console import GetLogger
+
+logger = GetLogger(__name__)
+
+
+# element being read, its start tag is written when its first child node comes
+class StreamElement:
+    name: str
+    attributes: list # list of (name, value)
+    isFirst: bool # first child of its parent with this name
+    ordinal: int # of its start tag in the document
+    childNames: set
+    text: list # text since the previous child node
+    started: bool # start tag is written
+    distance: bool # rescaled DistanceMeters element
+
+    def __init__(self, name: str, attributes: list, isFirst: bool, ordinal: int = 0):
+        self.name = name
+        self.attributes = attributes
+        self.isFirst = isFirst
+        self.ordinal = ordinal
+        self.childNames = set()
+        self.text = list()
+        self.started = False
+        self.distance = False
+
+
+# changes TCX files while reading them, without building a document in memory
+# output is the same as TcxFileEditor's after saving, whitespace only text is dropped and the rest is pretty printed
+class TcxStreamEditor:
+    trackPointName: str = XmlElement.Trackpoint.name
+    distanceName: str = XmlElement.DistanceMeters.name
+    extensionsName: str = XmlElement.Extensions.name
+    tpxName: str = XmlTools.AddNamespace(XmlNamespace.x.name, XmlElement.TPX.name)
+    speedName: str = XmlTools.AddNamespace(XmlNamespace.x.name, XmlElement.Speed.name)
+    distanceOwners: set # ordinals of elements other than track points with DistanceMeters, found by the first pass
+
+    def __init__(self):
+        self.distanceOwners = set()
+
+    def ChangeLength(self, fileTcx: str, fileTcxOut: str, newLen: float, compression: str = None):
+        logger.info("Loading %s", fileTcx)
+        if newLen <= 0.0:
+            logger.error("Error: new distance should be greater than zero")
+            return False
+
+        with metrics.Stage("scanxml"):
+            oldLen = self.GetFullDistance(fileTcx)
+        if metrics.enabled:
+            metrics.Count("bytesRead", os.path.getsize(fileTcx))
+
+        logger.info("Old distance: %s m", oldLen)
+        logger.info("New distance: %s m", newLen)
+        if oldLen <= 0.0:
+            logger.error("Error: activity has no distance to change")
+            return False
+
+        factor: float = newLen / oldLen
+        if os.path.isfile(fileTcxOut):
+            os.remove(fileTcxOut)
+        logger.info("Saving %s", fileTcxOut)
+        with metrics.Stage("rewritexml"):
+            self.RewriteDistances(fileTcx, fileTcxOut, factor, compression)
+        if metrics.enabled:
+            metrics.Count("bytesWritten", os.path.getsize(fileTcxOut))
+        return True
+
+    # first pass, maximum distance of track points
+    # also finds the other elements with distance, their speed is dropped even if it comes before DistanceMeters
+    def GetFullDistance(self, fileTcx: str):
+        state = {"maxDistance": 0.0, "text": None, "trackPoints": 0, "ordinal": 0}
+        names = list()
+        ordinals = list()
+        trackPoints = list() # per open track point, whether its distance is read
+        self.distanceOwners = set()
+
+        def startElement(name: str, attributes: list):
+            state["ordinal"] = state["ordinal"] + 1
+            if name == self.distanceName and len(names) > 0 and names[-1] != self.trackPointName:
+                self.distanceOwners.add(ordinals[-1])
+            if name == self.trackPointName:
+                trackPoints.append(False)
+                state["trackPoints"] = state["trackPoints"] + 1
+            elif name == self.distanceName and len(names) > 0 and names[-1] == self.trackPointName and not trackPoints[-1]:
+                trackPoints[-1] = True
+                state["text"] = list()
+            names.append(name)
+            ordinals.append(state["ordinal"])
+
+        def endElement(name: str):
+            names.pop()
+            ordinals.pop()
+            if name == self.trackPointName:
+                trackPoints.pop()
+            elif state["text"] is not None:
+                distance = self.ParseDistance(state["text"])
+                state["text"] = None
+                if distance > state["maxDistance"]:
+                    state["maxDistance"] = distance
+
+        def characterData(data: str):
+            if state["text"] is not None:
+                state["text"].append(data)
+
+        parser = self.CreateParser()
+        parser.StartElementHandler = startElement
+        parser.EndElementHandler = endElement
+        parser.CharacterDataHandler = characterData
+        with Compression.OpenRead(fileTcx) as infile:
+            parser.ParseFile(infile)
+        metrics.Count("trackPointsEdited", state["trackPoints"])
+        return state["maxDistance"]
+
+    # second pass, multiplies the first distance of every element by factor and removes speed of elements with distance
+    # needs distanceOwners of the first pass
+    def RewriteDistances(self, fileTcx: str, fileTcxOut: str, factor: float, compression: str = None):
+        with Compression.OpenTextWrite(fileTcxOut, compression) as outfile:
+            xml = XmlStreamWriter(outfile)
+            xml.StartDocument()
+            stack = list()
+            skipDepth = [0] # nesting level inside a dropped element
+            ordinal = [0] # counted like in the first pass, dropped elements too
+
+            def startChild():
+                if len(stack) == 0:
+                    return
+                parent = stack[-1]
+                if not parent.started:
+                    xml.StartElement(parent.name, parent.attributes)
+                    parent.started = True
+                if parent.text:
+                    self.WriteText(xml, parent)
+
+            def startElement(name: str, attributes: list):
+                ordinal[0] = ordinal[0] + 1
+                if skipDepth[0] > 0:
+                    skipDepth[0] = skipDepth[0] + 1
+                    return
+                isFirst = True
+                if len(stack) > 0:
+                    isFirst = name not in stack[-1].childNames
+                    stack[-1].childNames.add(name)
+                element = StreamElement(name, self.OrderAttributes(attributes), isFirst, ordinal[0])
+                if self.IsDroppedSpeed(stack, element):
+                    skipDepth[0] = 1
+                    return
+                if name == self.distanceName and len(stack) > 0 and isFirst:
+                    element.distance = True
+                startChild()
+                stack.append(element)
+
+            def endElement(name: str):
+                if skipDepth[0] > 0:
+                    skipDepth[0] = skipDepth[0] - 1
+                    return
+                element = stack.pop()
+                if element.distance and not element.started:
+                    distance = round(self.ParseDistance(element.text) * factor, 2)
+                    xml.TextElement(element.name, XmlTools.FormatFloat(distance), element.attributes)
+                elif not element.started:
+                    text = "".join(element.text)
+                    if text.strip():
+                        xml.TextElement(element.name, text, element.attributes)
+                    else:
+                        xml.EmptyElement(element.name, element.attributes)
+                else:
+                    if element.text:
+                        self.WriteText(xml, element)
+                    xml.EndElement(element.name)
+
+            def characterData(data: str):
+                if skipDepth[0] == 0 and len(stack) > 0:
+                    stack[-1].text.append(data)
+
+            def comment(data: str):
+                if skipDepth[0] == 0:
+                    startChild()
+                    xml.Comment(data)
+
+            def processingInstruction(target: str, data: str):
+                if skipDepth[0] == 0:
+                    startChild()
+                    xml.ProcessingInstruction(target, data)
+
+            parser = self.CreateParser()
+            parser.StartElementHandler = startElement
+            parser.EndElementHandler = endElement
+            parser.CharacterDataHandler = characterData
+            parser.CommentHandler = comment
+            parser.ProcessingInstructionHandler = processingInstruction
+            with Compression.OpenRead(fileTcx) as infile:
+                parser.ParseFile(infile)
+
+    def CreateParser(self):
+        parser = xml.parsers.expat.ParserCreate()
+        parser.buffer_text = True
+        parser.ordered_attributes = True
+        return parser
+
+    # minidom keeps namespace declarations ahead of other attributes
+    def OrderAttributes(self, attributes: list):
+        if not attributes:
+            return None
+        pairs = list(zip(attributes[0::2], attributes[1::2]))
+        declarations = [pair for pair in pairs if pair[0] == "xmlns" or pair[0].startswith("xmlns:")]
+        if len(declarations) == 0:
+            return pairs
+        return declarations + [pair for pair in pairs if pair not in declarations]
+
+    # the first speed of the first extensions of a track point or of an element with distance
+    def IsDroppedSpeed(self, stack: list, element: StreamElement):
+        if element.name != self.speedName or not element.isFirst or len(stack) < 3:
+            return False
+        tpx, extensions, owner = stack[-1], stack[-2], stack[-3]
+        return tpx.name == self.tpxName and tpx.isFirst \
+            and extensions.name == self.extensionsName and extensions.isFirst \
+            and (owner.name == self.trackPointName or owner.ordinal in self.distanceOwners)
+
+    # writes text collected since the previous child node unless it is whitespace only, element has text
+    def WriteText(self, xml: XmlStreamWriter, element: StreamElement):
+        text = "".join(element.text)
+        element.text = list()
+        if text.strip():
+            xml.Text(text)
+
+    def ParseDistance(self, text: list):
+        value = "".join(text)
+        if not value.strip():
+            return 0.0
+        return float(value)
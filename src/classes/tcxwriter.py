@@ -1,23 +1,185 @@
+import io
 import os
+from typing import TextIO, BinaryIO
 from xml.dom.minidom import getDOMImplementation, Element, Document
-from .activity import Activity, TrackPoint, Lap
+from .activity import Activity, Lap
 from .tcxdef import XmlElement, XmlAttribute, XmlConstant, XmlNamespace, XmlTools
+from .xmlstream import XmlStreamWriter
+from .compression import Compression
+from .metrics import metrics
+from .console import GetLogger
+
+logger = GetLogger(__name__)
 
 
 class TcxFileWriter:
-    def __init__(self):
-        return
+    useDom: bool # build the whole minidom document before writing
+    pretty: bool # indented output, otherwise without whitespace
+    compression: str # Compression.Gzip or Compression.Zstd, plain file if None
+
+    def __init__(self, useDom: bool = False, pretty: bool = True, compression: str = None):
+        self.useDom = useDom
+        self.pretty = pretty
+        self.compression = compression
 
     def SaveActivity(self, fileTcx: str, activity: Activity):
         if os.path.isfile(fileTcx):
             os.remove(fileTcx)
-        print("Saving %s" % fileTcx)
+        logger.info("Saving %s", fileTcx)
+
+        with Compression.OpenWrite(fileTcx, self.compression) as outfile:
+            self.WriteFile(outfile, activity)
+        if metrics.enabled:
+            metrics.Count("bytesWritten", os.path.getsize(fileTcx))
+
+    # writes the activity to a binary stream, like a file or a member of an archive, and leaves it open
+    def WriteFile(self, outfile: BinaryIO, activity: Activity):
+        if self.useDom:
+            with metrics.Stage("createxml"):
+                doc = self.CreateXml(activity)
+            with metrics.Stage("writexml"):
+                if self.pretty:
+                    outfile.write(doc.toprettyxml(encoding="utf-8", indent=" "))
+                else:
+                    outfile.write(doc.toxml(encoding="utf-8"))
+                outfile.flush()
+        else:
+            with metrics.Stage("write"):
+                textfile = io.TextIOWrapper(outfile, encoding="utf-8", newline="\n")
+                self.WriteActivity(textfile, activity)
+                textfile.flush()
+                textfile.detach()
+
+    # streams the activity to a text file, trackpoint by trackpoint
+    def WriteActivity(self, outfile: TextIO, activity: Activity):
+        xml = XmlStreamWriter(outfile, self.pretty)
+        xml.StartDocument()
+        xml.StartElement(XmlElement.TrainingCenterDatabase.name, [
+            (XmlAttribute.xmlns.name, XmlConstant.xmlns),
+            (XmlTools.AddNamespace(XmlNamespace.xmlns.name, XmlAttribute.xsi.name), XmlConstant.xmlns_xsi),
+            (XmlTools.AddNamespace(XmlNamespace.xmlns.name, XmlAttribute.x.name), XmlConstant.xmlns_x),
+            (XmlTools.AddNamespace(XmlNamespace.xsi.name, XmlAttribute.schemaLocation.name), XmlConstant.xsi_schemaLocation)])
+        xml.StartElement(XmlElement.Activities.name)
+        xml.StartElement(XmlElement.Activity.name, [(XmlAttribute.Sport.name, XmlTools.FormatSport(activity.activityType))])
+        xml.TextElement(XmlElement.Id.name, XmlTools.FormatTime(activity.startTime))
+
+        isDefaultLap: bool = len(activity.laps) == 1
+        rowsByLap = activity.track.SortedRowsByLap(len(activity.laps))
+        for lap, lapRows in zip(activity.laps, rowsByLap):
+            self.WriteLap(xml, lap, isDefaultLap, activity)
+            if len(lapRows) > 0:
+                xml.StartElement(XmlElement.Track.name)
+                self.WriteTrackPoints(xml, lapRows, activity)
+                xml.EndElement(XmlElement.Track.name)
+            else:
+                xml.EmptyElement(XmlElement.Track.name)
+            xml.EndElement(XmlElement.Lap.name)
+
+        self.WriteSummary(xml, activity)
+        xml.EndElement(XmlElement.TrainingCenterDatabase.name)
+
+    def WriteLap(self, xml: XmlStreamWriter, lap: Lap, isDefaultLap: bool, activity: Activity):
+        xml.StartElement(XmlElement.Lap.name, [(XmlAttribute.StartTime.name, XmlTools.FormatTime(lap.startTime))])
+        xml.TextElement(XmlElement.TotalTimeSeconds.name, str(lap.seconds))
+        xml.TextElement(XmlElement.DistanceMeters.name, XmlTools.FormatFloat(lap.distance))
+        xml.TextElement(XmlElement.Calories.name, str(lap.calories))
+        xml.TextElement(XmlElement.Intensity.name, XmlConstant.Intensity)
+        xml.TextElement(XmlElement.TriggerMethod.name, XmlConstant.TriggerMethod)
 
-        doc = self.CreateXml(activity)
+        if isDefaultLap:
+            if activity.maxSpeed > 0:
+                xml.TextElement(XmlElement.MaximumSpeed.name, XmlTools.FormatFloat(activity.maxSpeed))
+
+            xml.StartElement(XmlElement.AverageHeartRateBpm.name)
+            xml.TextElement(XmlElement.Value.name, XmlTools.FormatFloat(activity.avgHeartRate))
+            xml.EndElement(XmlElement.AverageHeartRateBpm.name)
+
+            xml.StartElement(XmlElement.MaximumHeartRateBpm.name)
+            xml.TextElement(XmlElement.Value.name, str(activity.maxHeartRate))
+            xml.EndElement(XmlElement.MaximumHeartRateBpm.name)
+
+    # writes one text block per trackpoint, values are numbers and need no escaping
+    def WriteTrackPoints(self, xml: XmlStreamWriter, lapRows: list, activity: Activity):
+        nl = xml.newLine
+        i0, i1, i2, i3 = [xml.Indent(xml.depth + level) for level in range(4)]
+        x = XmlNamespace.x.name
+        pointStart = "%s<Trackpoint>%s%s<Time>" % (i0, nl, i1)
+        pointEnd = "%s</Trackpoint>%s" % (i0, nl)
+        timeEnd = "</Time>%s" % nl
+        positionFormat = "%s<Position>%s%s<LatitudeDegrees>%%s</LatitudeDegrees>%s%s<LongitudeDegrees>%%s</LongitudeDegrees>%s%s</Position>%s" \
+            % (i1, nl, i2, nl, i2, nl, i1, nl)
+        altitudeFormat = "%s<AltitudeMeters>%%.2f</AltitudeMeters>%s" % (i1, nl)
+        distanceFormat = "%s<DistanceMeters>%%.2f</DistanceMeters>%s" % (i1, nl)
+        heartRateFormat = "%s<HeartRateBpm>%s%s<Value>%%s</Value>%s%s</HeartRateBpm>%s" % (i1, nl, i2, nl, i1, nl)
+        extensionsStart = "%s<Extensions>%s%s<%s:TPX>%s" % (i1, nl, i2, x, nl)
+        extensionsEnd = "%s</%s:TPX>%s%s</Extensions>%s" % (i2, x, nl, i1, nl)
+        extensionsEmpty = "%s<Extensions>%s%s<%s:TPX/>%s%s</Extensions>%s" % (i1, nl, i2, x, nl, i1, nl)
+        speedFormat = "%s<%s:Speed>%%.2f</%s:Speed>%s" % (i3, x, x, nl)
+        runCadenceFormat = "%s<%s:RunCadence>%%s</%s:RunCadence>%s" % (i3, x, x, nl)
+        cadenceFormat = "%s<Cadence>%%s</Cadence>%s" % (i1, nl)
+
+        track = activity.track
+        formatTime = XmlTools.FormatTime
+        write = xml.Write
+        writeSpeed = activity.writeTrackSpeed
+        metrics.Count("trackPointsEmitted", len(lapRows))
+        for row in lapRows:
+            latitudeDegrees = track.latitudeDegrees[row]
+            longitudeDegrees = track.longitudeDegrees[row]
+            altitudeMeters = track.altitudeMeters[row]
+            heartRate = track.heartRate[row]
+            speed = track.speed[row]
+            cadence = track.cadence[row]
+
+            parts = [pointStart, formatTime(track.time[row]), timeEnd]
+            if longitudeDegrees != 0 or latitudeDegrees != 0:
+                parts.append(positionFormat % (latitudeDegrees, longitudeDegrees))
+            if altitudeMeters != 0:
+                parts.append(altitudeFormat % altitudeMeters)
+            parts.append(distanceFormat % track.distanceMeters[row])
+            if heartRate > 0:
+                parts.append(heartRateFormat % heartRate)
+            if speed > 0 or cadence > 0:
+                if (speed > 0 and writeSpeed) or cadence > 0:
+                    parts.append(extensionsStart)
+                    if speed > 0 and writeSpeed:
+                        parts.append(speedFormat % speed)
+                    if cadence > 0:
+                        parts.append(runCadenceFormat % cadence)
+                    parts.append(extensionsEnd)
+                else:
+                    parts.append(extensionsEmpty)
+            if cadence > 0:
+                parts.append(cadenceFormat % cadence)
+            parts.append(pointEnd)
+            write("".join(parts))
+
+    def WriteSummary(self, xml: XmlStreamWriter, activity: Activity):
+        xsiType = XmlTools.AddNamespace(XmlNamespace.xsi.name, XmlAttribute.type.name)
+        xml.StartElement(XmlElement.Creator.name, [(xsiType, XmlConstant.xsi_device_type)])
+        xml.TextElement(XmlElement.Name.name, XmlConstant.DeviceName)
+        xml.EndElement(XmlElement.Creator.name)
+
+        xml.StartElement(XmlElement.Extensions.name, [(xsiType, XmlConstant.xsi_extensions_type)])
+        xElement = XmlTools.AddNamespace(XmlNamespace.x.name, XmlElement.LX.name)
+        xml.StartElement(xElement)
+        xml.TextElement(XmlElement.ActiveSeconds.name, str(activity.totalActiveSeconds))
+        xml.TextElement(XmlElement.ElapsedSeconds.name, str(activity.totalElapsedSeconds))
+        xml.TextElement(XmlElement.DistanceMeters.name, XmlTools.FormatFloat(activity.totalDistanceMeters))
+        xml.TextElement(XmlElement.AvgSpeed.name, XmlTools.FormatFloat(activity.avgSpeed))
+        xml.TextElement(XmlElement.KiloCalories.name, str(activity.totalCalories))
+        xml.TextElement(XmlElement.StepCount.name, str(activity.totalSteps))
+        if activity.totalAscendMeters > 0:
+            xml.TextElement(XmlElement.ClimbMeters.name, str(activity.totalAscendMeters))
+        xml.EndElement(xElement)
+        xml.EndElement(XmlElement.Extensions.name)
+        xml.EndElement(XmlElement.Activity.name)
+        xml.EndElement(XmlElement.Activities.name)
 
-        with open(fileTcx, 'wb') as outfile:
-            outfile.write(doc.toprettyxml(encoding="utf-8", indent=" "))
-            outfile.flush()
+        xml.StartElement(XmlElement.Author.name, [(xsiType, XmlConstant.xsi_app_type)])
+        xml.TextElement(XmlElement.Name.name, XmlConstant.DeviceName)
+        xml.TextElement(XmlElement.LangID.name, XmlConstant.LangID)
+        xml.EndElement(XmlElement.Author.name)
 
     def CreateXml(self, activity: Activity):
         impl = getDOMImplementation()
@@ -38,15 +200,14 @@ class TcxFileWriter:
         activitiesElement.appendChild(activityElement)
 
         idElement = doc.createElement(XmlElement.Id.name)
-        idElement.appendChild(doc.createTextNode(XmlTools.FormatDate(activity.startTime)))
+        idElement.appendChild(doc.createTextNode(XmlTools.FormatTime(activity.startTime)))
         activityElement.appendChild(idElement)
 
-        currentLapIndex: int = 0
         isDefaultLap: bool = len(activity.laps) == 1
-        for lap in activity.laps:
+        rowsByLap = activity.track.SortedRowsByLap(len(activity.laps))
+        for lap, lapRows in zip(activity.laps, rowsByLap):
             trackElement = self.AddLap(doc, activityElement, lap, isDefaultLap, activity)
-            self.AddTrackPoints(doc, trackElement, currentLapIndex, activity)
-            currentLapIndex = currentLapIndex + 1
+            self.AddTrackPoints(doc, trackElement, lapRows, activity)
 
         self.AddSummary(doc, roolElement, activityElement, activity)
 
@@ -54,7 +215,7 @@ class TcxFileWriter:
 
     def AddLap(self, doc: Document, activityElement: Element, lap: Lap, isDefaultLap: bool, activity: Activity):
         lapElement = doc.createElement(XmlElement.Lap.name)
-        lapElement.setAttribute(XmlAttribute.StartTime.name, XmlTools.FormatDate(lap.startTime))
+        lapElement.setAttribute(XmlAttribute.StartTime.name, XmlTools.FormatTime(lap.startTime))
         activityElement.appendChild(lapElement)
 
         totalTimeElement = doc.createElement(XmlElement.TotalTimeSeconds.name)
@@ -102,74 +263,73 @@ class TcxFileWriter:
 
         return trackElement
 
-    def SortPointsFunc(self, point: TrackPoint):
-        return point.time
-
-    def AddTrackPoints(self, doc: Document, trackElement: Element, lapIndex: int, activity: Activity):
-        lapTrackPoints = list()
-        for time in activity.trackPoints:
-            point: TrackPoint = activity.trackPoints[time]
-            if point.lapIndex == lapIndex:
-                lapTrackPoints.append(point)
-        lapTrackPoints.sort(key=self.SortPointsFunc)
+    def AddTrackPoints(self, doc: Document, trackElement: Element, lapRows: list, activity: Activity):
+        track = activity.track
+        metrics.Count("trackPointsEmitted", len(lapRows))
+        for row in lapRows:
+            latitudeDegrees = track.latitudeDegrees[row]
+            longitudeDegrees = track.longitudeDegrees[row]
+            altitudeMeters = track.altitudeMeters[row]
+            heartRate = track.heartRate[row]
+            speed = track.speed[row]
+            cadence = track.cadence[row]
 
-        for point in lapTrackPoints:
             pointElement = doc.createElement(XmlElement.Trackpoint.name)
             trackElement.appendChild(pointElement)
 
             timeElement = doc.createElement(XmlElement.Time.name)
-            timeElement.appendChild(doc.createTextNode(XmlTools.FormatDate(point.time)))
+            timeElement.appendChild(doc.createTextNode(XmlTools.FormatTime(track.time[row])))
             pointElement.appendChild(timeElement)
 
-            if point.longitudeDegrees != 0 or point.latitudeDegrees != 0:
+            if longitudeDegrees != 0 or latitudeDegrees != 0:
                 positionElement = doc.createElement(XmlElement.Position.name)
                 pointElement.appendChild(positionElement)
 
                 latitudeElement = doc.createElement(XmlElement.LatitudeDegrees.name)
-                latitudeElement.appendChild(doc.createTextNode(str(point.latitudeDegrees)))
+                latitudeElement.appendChild(doc.createTextNode(str(latitudeDegrees)))
                 positionElement.appendChild(latitudeElement)
 
                 longitudeElement = doc.createElement(XmlElement.LongitudeDegrees.name)
-                longitudeElement.appendChild(doc.createTextNode(str(point.longitudeDegrees)))
+                longitudeElement.appendChild(doc.createTextNode(str(longitudeDegrees)))
                 positionElement.appendChild(longitudeElement)
 
-            if point.altitudeMeters != 0:
+            if altitudeMeters != 0:
                 altitudeElement = doc.createElement(XmlElement.AltitudeMeters.name)
-                altitudeElement.appendChild(doc.createTextNode(XmlTools.FormatFloat(point.altitudeMeters)))
+                altitudeElement.appendChild(doc.createTextNode(XmlTools.FormatFloat(altitudeMeters)))
                 pointElement.appendChild(altitudeElement)
 
             distanceElement = doc.createElement(XmlElement.DistanceMeters.name)
-            distanceElement.appendChild(doc.createTextNode(XmlTools.FormatFloat(point.distanceMeters)))
+            distanceElement.appendChild(doc.createTextNode(XmlTools.FormatFloat(track.distanceMeters[row])))
             pointElement.appendChild(distanceElement)
 
-            if point.heartRate > 0:
+            if heartRate > 0:
                 heartRateElement = doc.createElement(XmlElement.HeartRateBpm.name)
                 pointElement.appendChild(heartRateElement)
 
                 valueElement = doc.createElement(XmlElement.Value.name)
-                valueElement.appendChild(doc.createTextNode(str(point.heartRate)))
+                valueElement.appendChild(doc.createTextNode(str(heartRate)))
                 heartRateElement.appendChild(valueElement)
 
-            if point.speed > 0 or point.cadence > 0:
+            if speed > 0 or cadence > 0:
                 extensionsElement = doc.createElement(XmlElement.Extensions.name)
                 pointElement.appendChild(extensionsElement)
 
                 tpxElement = doc.createElement(XmlTools.AddNamespace(XmlNamespace.x.name, XmlElement.TPX.name))
                 extensionsElement.appendChild(tpxElement)
 
-                if point.speed > 0:
+                if speed > 0 and activity.writeTrackSpeed:
                     speedElement = doc.createElement(XmlTools.AddNamespace(XmlNamespace.x.name, XmlElement.Speed.name))
-                    speedElement.appendChild(doc.createTextNode(XmlTools.FormatFloat(point.speed)))
+                    speedElement.appendChild(doc.createTextNode(XmlTools.FormatFloat(speed)))
                     tpxElement.appendChild(speedElement)
 
-                if point.cadence > 0:
+                if cadence > 0:
                     cadenceElement = doc.createElement(XmlTools.AddNamespace(XmlNamespace.x.name, XmlElement.RunCadence.name))
-                    cadenceElement.appendChild(doc.createTextNode(str(point.cadence)))
+                    cadenceElement.appendChild(doc.createTextNode(str(cadence)))
                     tpxElement.appendChild(cadenceElement)
 
-            if point.cadence > 0:
+            if cadence > 0:
                 cadenceElement = doc.createElement(XmlElement.Cadence.name)
-                cadenceElement.appendChild(doc.createTextNode(str(point.cadence)))
+                cadenceElement.appendChild(doc.createTextNode(str(cadence)))
                 pointElement.appendChild(cadenceElement)
 
     def AddSummary(self, doc: Document, roolElement: Element, activityElement: Element, activity: Activity):
@@ -0,0 +1,167 @@
+import re
+import heapq
+import datetime
+from enum import Enum, auto
+from .console import GetLogger
+
+logger = GetLogger(__name__)
+
+
+class IntervalDef(Enum):
+    l = auto()
+    m = auto()
+    s = auto()
+
+
+# edits of distance and speed, with the prefix of their output file name
+class EditOperation(Enum):
+    ChangeLength = "d"
+    ChangeSpeed = "s"
+
+
+class Interval:
+    def __init__(self, interval: str, startTime: datetime):
+        self.seconds = 0.0
+        self.speed = 0.0
+        self.meters = 0.0
+        self.interval = interval
+        self.hasData = False
+
+        matches = re.findall(r"([\d.]+)([ms])([\d.]+)", interval.strip())
+        if len(matches) == 0:
+            return
+        match = matches[0]
+        if len(match) != 3:
+            return
+
+        self.speed = float(match[2])
+        if match[1] == IntervalDef.m.name:
+            self.meters = float(match[0])
+            if self.speed != 0:
+                self.seconds = self.meters * 3.6 / self.speed
+        else:
+            self.seconds = float(match[0])
+            self.meters = self.seconds * self.speed / 3.6
+
+        if self.speed == 0:
+            self.meters = 0.0  # can't make a distance by standing
+        if self.meters == 0:
+            self.speed = 0.0   # no distance => no speed
+
+        self.startTime = startTime
+        self.endTime = startTime + datetime.timedelta(seconds=self.seconds)
+        self.hasData = True
+        return
+
+    def WithinInterval(self, time: datetime):
+        return time >= self.startTime and time <= self.endTime
+
+
+# finds intervals for increasing times in one walk over intervals sorted by start time
+# when intervals overlap, the one coming first in the list wins, intervals without data are left out
+class IntervalIndex:
+    def __init__(self, intervalList: list):
+        self.intervals = sorted([item for item in enumerate(intervalList) if item[1].hasData], key=lambda item: item[1].startTime)
+        self.nextInterval = 0
+        self.started = list() # heap of (position in list, interval) started before the last time
+
+    def GetIntervalForTime(self, time: datetime):
+        while self.nextInterval < len(self.intervals) and self.intervals[self.nextInterval][1].startTime <= time:
+            heapq.heappush(self.started, self.intervals[self.nextInterval])
+            self.nextInterval = self.nextInterval + 1
+        while len(self.started) > 0 and self.started[0][1].endTime < time:
+            heapq.heappop(self.started)
+        if len(self.started) == 0:
+            return None
+        return self.started[0][1]
+
+
+# distance and speed edits shared by the TCX editor and the conversion
+# distances are the values written to TCX files, rounded to 2 decimals
+class TrackEdit:
+    # output file name prefix of edits, like "s-d-" for changing length then speed
+    def GetEditsPrefix(edits: list):
+        return "".join(["%s-" % operation.value for operation, value in reversed(edits)])
+
+    # laps is a list of (start time, whole seconds or None) used in laps mode
+    def ParseIntervals(intervals: str, startTime: datetime, laps: list):
+        if len(intervals) == 0:
+            logger.warning("Wrong interval parameter %s", intervals)
+            return list()
+        if intervals[0] == IntervalDef.l.name: # laps mode
+            return TrackEdit.ParseLapIntervals(intervals, laps)
+
+        intervalList = intervals.split(";")
+        intervalObjects = list()
+        intervalStartTime = startTime
+        for intervalStr in intervalList:
+            intervalObject = Interval(intervalStr, intervalStartTime)
+            if intervalObject.hasData == True:
+                intervalObjects.append(intervalObject)
+                intervalStartTime = intervalObject.endTime + datetime.timedelta(seconds=1)
+            else:
+                logger.warning("Can't parse interval %s", intervalStr)
+        return intervalObjects
+
+    def ParseLapIntervals(intervals: str, laps: list):
+        intervalList = intervals.removeprefix(IntervalDef.l.name).split(";")
+        intervalObjects = list()
+        for i, (lapStartTime, lapSeconds) in enumerate(laps[:len(intervalList)]):
+            if lapSeconds is not None:
+                intervalStr = "%ss%s" % (int(lapSeconds), intervalList[i])
+                intervalObjects.append(Interval(intervalStr, lapStartTime))
+        return intervalObjects
+
+    def GetFullDistance(distances: list):
+        oldLen = 0.0
+        for distance in distances:
+            if distance > oldLen:
+                oldLen = distance
+        return oldLen
+
+    # distances of track points following the speed of intervals, scaled back to the original full distance
+    # when track points share a time, the last one gets the calculated distance
+    # returns None if the intervals cover no distance, as it can't be scaled back
+    def GetSpeedPlanDistances(times: list, distances: list, intervalList: list, startTime: datetime):
+        oldLen = TrackEdit.GetFullDistance(distances)
+        pointsByTime = dict() # key - time, value - index of track point
+        for idx, time in enumerate(times):
+            pointsByTime[time] = idx
+        newDistances = list(distances)
+
+        intervalIndex = IntervalIndex(intervalList)
+        currentDistance = 0.0
+        currentTime = startTime
+        currentSpeed = 0.0
+        smoothFirstPoints = smoothRest = 5
+        for pointTime in sorted(pointsByTime):
+            interval = intervalIndex.GetIntervalForTime(pointTime)
+            if interval is not None:
+                currentSpeed = interval.speed
+            timeFromPrev = (pointTime - currentTime).total_seconds()
+            if smoothRest > 0: # smooth start
+                currentSpeed = currentSpeed * (1 - smoothRest / smoothFirstPoints)
+                smoothRest = smoothRest - 1
+            currentDistance = currentDistance + timeFromPrev * currentSpeed / 3.6
+            currentTime = pointTime
+            newDistances[pointsByTime[pointTime]] = TrackEdit.RoundDistance(currentDistance)
+
+        newLen = TrackEdit.GetFullDistance(newDistances)
+
+        logger.info("Original distance: %s m", oldLen)
+        logger.info("Calculated distance: %s m. Changing back", newLen)
+        if newLen <= 0.0:
+            logger.error("Error: speed plan covers no distance")
+            return None
+
+        factor: float = oldLen / newLen
+        return [round(distance * factor, 2) for distance in newDistances]
+
+    # distance of a lap from distances of its track points
+    def GetLapDistance(distances: list):
+        if len(distances) == 0:
+            return 0.0
+        return TrackEdit.RoundDistance(max(distances) - min(distances))
+
+    def RoundDistance(distance: float):
+        return round(round(distance, 4), 2)
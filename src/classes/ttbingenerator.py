@@ -0,0 +1,104 @@
+import random
+from .activity import ActivityType
+from .ttbinreader import TtbinFileRecordTag, recordDefs, recordLengthDef, variableRecordDef, variableRecordLength
+
+
+# writes synthetic but valid TTBIN files for benchmarks
+class TtbinFileGenerator:
+    startTime: int # UTC seconds since 1970
+    localTimeOffset: int
+    lapMeters: float # a lap record after each lap distance, 0 = single lap
+    seed: int
+
+    def __init__(self, startTime: int = 1700000000, localTimeOffset: int = 3600, lapMeters: float = 1000.0, seed: int = 1):
+        self.startTime = startTime
+        self.localTimeOffset = localTimeOffset
+        self.lapMeters = lapMeters
+        self.seed = seed
+
+    def SaveFile(self, fileTtbin: str, activityType: ActivityType, seconds: int):
+        data = self.Generate(activityType, seconds)
+        with open(fileTtbin, "wb") as outfile:
+            outfile.write(data)
+        return len(data)
+
+    # returns file content with a record per second for supported activity types
+    def Generate(self, activityType: ActivityType, seconds: int):
+        rnd = random.Random(self.seed)
+        localStart = self.startTime + self.localTimeOffset
+        records = [self.Header(localStart)]
+        records.append(self.Record(TtbinFileRecordTag.x48, bytes(14)))
+        records.append(self.Record(TtbinFileRecordTag.Battery, 95, b"\0\0\0"))
+        records.append(self.Record(TtbinFileRecordTag.WaitGps, 1))
+        records.append(self.Record(TtbinFileRecordTag.Status, b"\0", bytes([activityType.value]), localStart))
+        records.append(self.Record(TtbinFileRecordTag.TrainingSetup, b"\0", 0.0, 0.0))
+
+        distance = 0.0
+        steps = 0
+        calories = 0
+        ascend = 0
+        descend = 0
+        altitude = 10
+        latitude = 52.0
+        longitude = 4.0
+        nextLap = self.lapMeters
+        for second in range(seconds):
+            localTime = localStart + second
+            calories = min(second // 10, 32767)
+            records.append(self.Record(TtbinFileRecordTag.HeartRate, rnd.randint(90, 185), b"\0", localTime))
+
+            if activityType == ActivityType.Treadmill:
+                distance = distance + 2.6 + rnd.random() * 0.4
+                steps = steps + rnd.randint(2, 3)
+                records.append(self.Record(TtbinFileRecordTag.Treadmill, localTime, distance, calories, steps, 80))
+            elif activityType == ActivityType.Gym:
+                steps = steps + rnd.randint(0, 2)
+                if second % 2 == 0:
+                    records.append(self.Record(TtbinFileRecordTag.Gym, localTime, calories, steps))
+            else:
+                speed = 2.5 + rnd.random()
+                distance = distance + speed
+                latitude = latitude + 0.00001
+                longitude = longitude + 0.00001 * rnd.random()
+                records.append(self.Record(TtbinFileRecordTag.Gps, round(latitude * 10000000), round(longitude * 10000000),
+                                           0, round(speed * 100), localTime - self.localTimeOffset, calories,
+                                           speed, distance, rnd.randint(2, 3)))
+                records.append(self.Record(TtbinFileRecordTag.ExtendedGps, bytes(23)))
+                records.append(self.Record(TtbinFileRecordTag.x37, bytes(1)))
+                records.append(self.Record(TtbinFileRecordTag.Movement, b"\0"))
+                if second % 5 == 0:
+                    change = rnd.randint(-2, 2)
+                    altitude = altitude + change
+                    ascend = ascend + max(0, change)
+                    descend = descend + max(0, -change)
+                    records.append(self.Record(TtbinFileRecordTag.Elevation, b"\0", altitude, altitude, ascend, descend, 0))
+
+            if second % 60 == 0:
+                records.append(self.Record(TtbinFileRecordTag.FitnessPoints, localTime, 1, 2))
+                records.append(self.VariableRecord(TtbinFileRecordTag.x4b, bytes(rnd.randint(5, 30))))
+                records.append(self.Record(TtbinFileRecordTag.Battery, 95 - second // 600, b"\0\0\0"))
+                records.append(self.Record(TtbinFileRecordTag.GoalProgress, bytes(5)))
+            if self.lapMeters > 0 and distance >= nextLap:
+                records.append(self.Record(TtbinFileRecordTag.Lap, second, distance, calories))
+                nextLap = nextLap + self.lapMeters
+
+        records.append(self.Record(TtbinFileRecordTag.HeartRateRecovery, 1, 2))
+        records.append(self.Record(TtbinFileRecordTag.Summary, activityType.value, distance, seconds, calories, 0, seconds))
+        return b"".join(records)
+
+    def Header(self, localStart: int):
+        lengths = [(tag, recordDef.size + 1) for tag, recordDef in recordDefs.items()]
+        lengths.append((TtbinFileRecordTag.x4b.value, variableRecordLength))
+        header = recordDefs[TtbinFileRecordTag.FileHeader.value].pack(
+            b"\x07", bytes(7), 0, localStart, bytes(16), bytes(80), localStart, self.localTimeOffset, b"\0", len(lengths))
+        table = b"".join([recordLengthDef.pack(tag, length) for tag, length in lengths])
+        return bytes([TtbinFileRecordTag.FileHeader.value]) + header + table
+
+    def Record(self, tag: TtbinFileRecordTag, *fields):
+        recordDef = recordDefs[tag.value]
+        if recordDef.format.endswith("x"): # padding only layouts get raw bytes
+            return bytes([tag.value]) + fields[0]
+        return bytes([tag.value]) + recordDef.pack(*fields)
+
+    def VariableRecord(self, tag: TtbinFileRecordTag, data: bytes):
+        return bytes([tag.value]) + variableRecordDef.pack(len(data)) + data
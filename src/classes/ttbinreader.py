@@ -1,8 +1,12 @@
-import datetime
+import os
+import mmap
 from enum import Enum
 from struct import Struct
-from typing import BinaryIO
-from .activity import Activity, ActivityType
+from .activity import Activity, ActivitySummary, ActivityType
+from .metrics import metrics
+from .console import GetLogger
+
+logger = GetLogger(__name__)
 
 
 class TtbinFileRecordTag(Enum):
@@ -42,284 +46,329 @@ class TtbinFileRecordTag(Enum):
     # Workout = 0x4c
 
 
+# record layouts, without the leading tag byte
+recordDefs: dict = {
+    TtbinFileRecordTag.FileHeader.value: Struct("<s7shl16s80sllsB"),
+    TtbinFileRecordTag.Status.value: Struct("<ssl"),
+    TtbinFileRecordTag.Gps.value: Struct("<llhhlhffB"),
+    TtbinFileRecordTag.ExtendedGps.value: Struct("<23x"),
+    TtbinFileRecordTag.HeartRate.value: Struct("<Bsl"),
+    TtbinFileRecordTag.Summary.value: Struct("<Bflhhl"),
+    TtbinFileRecordTag.TrainingSetup.value: Struct("<sff"),
+    TtbinFileRecordTag.Lap.value: Struct("<lfh"),
+    TtbinFileRecordTag.WaitGps.value: Struct("<h"),
+    TtbinFileRecordTag.Treadmill.value: Struct("<lfhlh"),
+    TtbinFileRecordTag.GoalProgress.value: Struct("<5x"),
+    TtbinFileRecordTag.x37.value: Struct("<1x"),
+    TtbinFileRecordTag.HeartRateRecovery.value: Struct("<ll"),
+    TtbinFileRecordTag.Gym.value: Struct("<lhl"),
+    TtbinFileRecordTag.Movement.value: Struct("<s"),
+    TtbinFileRecordTag.RouteDescription1.value: Struct("<14x"),
+    TtbinFileRecordTag.RouteDescription2.value: Struct("<100x"),
+    TtbinFileRecordTag.Elevation.value: Struct("<shhhhh"),
+    TtbinFileRecordTag.x48.value: Struct("<14x"),
+    TtbinFileRecordTag.Battery.value: Struct("<B3s"),
+    TtbinFileRecordTag.FitnessPoints.value: Struct("<lhh"),
+}
+
+
+# length in the header's record length table for records with a 16 bit length prefix
+variableRecordLength: int = 0xFFFF
+variableRecordDef = Struct("<H")
+recordLengthDef = Struct("<BH")
+
+activityCodes: set = set([activityType.value for activityType in ActivityType])
+
+# bytes read for the header with its record length table and for looking for the summary at the end
+scanHeadSize: int = 2048
+scanTailSize: int = 4096
+scanTailSizeMax: int = 65536 # larger files are walked record by record from the start
+
+
 class TtbinFileReader:
     localTimeOffset: int
+    recordLengths: dict # key = tag, value = record length including tag, from the file header
+    handlers: dict # key = tag, value = handler getting unpacked fields
+    decodedTags: set # tags passed to handlers, the rest is skipped
+    useMmap: bool # decode from memory mapped file instead of a copy read into memory
 
-    def __init__(self):
+    def __init__(self, useMmap: bool = False):
         self.localTimeOffset = 0
-
-    def LoadActivity(self, fileTtbin: str, args: list[str]):
-        print("Loading %s" % fileTtbin)
+        self.useMmap = useMmap
+        self.recordLengths = dict()
+        self.handlers = {
+            TtbinFileRecordTag.Gps.value: self.ReadGpsx22,
+            TtbinFileRecordTag.HeartRate.value: self.ReadHeartRatex25,
+            TtbinFileRecordTag.Summary.value: self.ReadSummaryx27,
+            TtbinFileRecordTag.Lap.value: self.ReadLapx2f,
+            TtbinFileRecordTag.Treadmill.value: self.ReadTreadmillx32,
+            TtbinFileRecordTag.Gym.value: self.ReadGymx41,
+            TtbinFileRecordTag.Elevation.value: self.ReadElevationx47,
+            TtbinFileRecordTag.Battery.value: self.ReadBatteryLevelx49,
+        }
+        self.decodedTags = set(self.handlers)
+
+    def LoadActivity(self, fileTtbin: str, args: list[str], tags: set = None):
+        logger.info("Loading %s", fileTtbin)
         activity = Activity()
         activity.BuildHRZones(args)
 
-        with open(fileTtbin, "rb") as ttbinfile:
-            while True:
-                pos: int = ttbinfile.tell()
-                tg = ttbinfile.read(1)
-                if len(tg) == 0:
-                    #print("   EOF")
-                    break
+        with metrics.Stage("read"), open(fileTtbin, "rb") as ttbinfile:
+            if self.useMmap and self.IsMappable(ttbinfile):
+                with mmap.mmap(ttbinfile.fileno(), 0, access=mmap.ACCESS_READ) as mapped, \
+                        memoryview(mapped) as data:
+                    self.DecodeRecords(activity, data, tags)
+            else:
+                data = ttbinfile.read()
+                self.DecodeRecords(activity, data, tags)
+
+        with metrics.Stage("postload"):
+            activity.PostLoad()
+        return activity
 
-                #if tg[0] in TtbinFileRecordTag._value2member_map_:
-                #    print("   Tag: 0x%s %s Pos: 0x%s" \
-                #          % (format(tg[0], '02x'), TtbinFileRecordTag(tg[0]), format(pos, '02x')))
+    # the same as LoadActivity for file content already in memory, like a member of an archive
+    def LoadActivityData(self, name: str, data, args: list[str], tags: set = None):
+        logger.info("Loading %s", name)
+        activity = Activity()
+        activity.BuildHRZones(args)
 
-                if not self.ExtractRecord(activity, tg[0], ttbinfile):
-                    print("   Tag: 0x%s Pos: 0x%s is not implemented. Exiting" \
-                          % (format(tg[0], '02x'), format(pos, '02x')))
-                    break
+        with metrics.Stage("read"):
+            self.DecodeRecords(activity, data, tags)
 
-        activity.PostLoad()
+        with metrics.Stage("postload"):
+            activity.PostLoad()
         return activity
 
-    # reads single record
-    def ExtractRecord(self, activity: Activity, tag: int, file: BinaryIO):
-        if tag == TtbinFileRecordTag.FileHeader.value:
-            return self.ReadHeaderx20(activity, file)
-        elif tag == TtbinFileRecordTag.Status.value:
-            return self.ReadStatusx21(activity, file)
-        elif tag == TtbinFileRecordTag.Gps.value:
-            return self.ReadGpsx22(activity, file)
-        elif tag == TtbinFileRecordTag.ExtendedGps.value:
-            return self.ReadExtendedGpsx23(activity, file)
-        elif tag == TtbinFileRecordTag.HeartRate.value:
-            return self.ReadHeartRatex25(activity, file)
-        elif tag == TtbinFileRecordTag.Summary.value:
-            return self.ReadSummaryx27(activity, file)
-        elif tag == TtbinFileRecordTag.TrainingSetup.value:
-            return self.ReadTrainingSetupx2d(activity, file)
-        elif tag == TtbinFileRecordTag.Lap.value:
-            return self.ReadLapx2f(activity, file)
-        elif tag == TtbinFileRecordTag.WaitGps.value:
-            return self.ReadWaitGpsx30(activity, file)
-        elif tag == TtbinFileRecordTag.Treadmill.value:
-            return self.ReadTreadmillx32(activity, file)
-        elif tag == TtbinFileRecordTag.GoalProgress.value:
-            return self.ReadGoalProgressx35(activity, file)
-        elif tag == TtbinFileRecordTag.x37.value:
-            return self.Readx37(activity, file)
-        elif tag == TtbinFileRecordTag.HeartRateRecovery.value:
-            return self.ReadHeartRateRecoveryx3f(activity, file)
-        elif tag == TtbinFileRecordTag.Gym.value:
-            return self.ReadGymx41(activity, file)
-        elif tag == TtbinFileRecordTag.Movement.value:
-            return self.ReadMovementx42(activity, file)
-        elif tag == TtbinFileRecordTag.RouteDescription1.value:
-            return self.ReadRouteDescriptionx43(activity, file)
-        elif tag == TtbinFileRecordTag.RouteDescription2.value:
-            return self.ReadRouteDescriptionx44(activity, file)
-        elif tag == TtbinFileRecordTag.Elevation.value:
-            return self.ReadElevationx47(activity, file)
-        elif tag == TtbinFileRecordTag.x48.value:
-            return self.Readx48(activity, file)
-        elif tag == TtbinFileRecordTag.Battery.value:
-            return self.ReadBatteryLevelx49(activity, file)
-        elif tag == TtbinFileRecordTag.FitnessPoints.value:
-            return self.ReadFitnessPointsx4a(activity, file)
-        elif tag == TtbinFileRecordTag.x4b.value:
-            return self.Readx4b(activity, file)
-        return False
+    # reads the header and the summary record only, the summary is looked for at the end of the file
+    # returns None if the file has no header, with readSummary False only the header is read
+    def ScanFile(self, fileTtbin: str, readSummary: bool = True):
+        with open(fileTtbin, "rb") as ttbinfile:
+            size = os.fstat(ttbinfile.fileno()).st_size
+            summary = ActivitySummary(fileTtbin, size)
+            data = ttbinfile.read(scanHeadSize)
+            pos = self.ReadHeaderx20(summary, data)
+            if pos < 0:
+                return None
+            summary.localTimeOffset = self.localTimeOffset
+            if not readSummary:
+                return summary
+            recordTable = self.BuildRecordTable(set())
+
+            tailSize = scanTailSize
+            while pos < size - tailSize and tailSize <= scanTailSizeMax:
+                ttbinfile.seek(size - tailSize)
+                fields = self.FindSummary(ttbinfile.read(tailSize), recordTable)
+                if fields is not None:
+                    self.ReadSummaryx27(summary, fields)
+                    return summary
+                tailSize = tailSize * 4
+
+            ttbinfile.seek(pos)
+            fields = self.WalkSummary(ttbinfile.read(), 0, recordTable)[1]
+        if fields is not None:
+            self.ReadSummaryx27(summary, fields)
+        return summary
+
+    # the same as ScanFile for file content already in memory
+    def ScanData(self, name: str, data, readSummary: bool = True):
+        summary = ActivitySummary(name, len(data))
+        pos = self.ReadHeaderx20(summary, data)
+        if pos < 0:
+            return None
+        summary.localTimeOffset = self.localTimeOffset
+        if not readSummary:
+            return summary
+        recordTable = self.BuildRecordTable(set())
+        fields = None
+        if len(data) - pos > scanTailSize:
+            fields = self.FindSummary(bytes(data[-scanTailSize:]), recordTable)
+        if fields is None:
+            fields = self.WalkSummary(data, pos, recordTable)[1]
+        if fields is not None:
+            self.ReadSummaryx27(summary, fields)
+        return summary
+
+    # the tail starts somewhere inside a record: a summary tag is taken as a record start
+    # if the records from it reach the end of the file exactly, then the last summary on that way is returned
+    def FindSummary(self, data: bytes, recordTable: dict):
+        tag = bytes([TtbinFileRecordTag.Summary.value])
+        candidate = data.find(tag)
+        while candidate >= 0:
+            reachedEnd, fields = self.WalkSummary(data, candidate, recordTable)
+            if reachedEnd and fields is not None and self.IsValidSummary(fields):
+                return fields
+            candidate = data.find(tag, candidate + 1)
+        return None
+
+    # bytes inside other records can look like a summary too, its values have to make sense
+    def IsValidSummary(self, fields: tuple):
+        fActivityCode, fDistance, fDuration, fCalories, fUnknown, fDuration2 = fields
+        return fActivityCode in activityCodes and 0 <= fDistance < 1e7 and fDuration >= 0 and fCalories >= 0 and fDuration2 >= 0
+
+    # skips records by length from pos, returns (whether the end of data is reached exactly, fields of the last summary or None)
+    def WalkSummary(self, data, pos: int, recordTable: dict):
+        summaryTag = TtbinFileRecordTag.Summary.value
+        summaryDef = recordDefs[summaryTag]
+        dataLen = len(data)
+        fields = None
+        while pos < dataLen:
+            tag = data[pos]
+            entry = recordTable.get(tag)
+            if entry is None:
+                return (False, fields)
+            recordSize = entry[0]
+            start = pos + 1
+            if recordSize < 0:
+                if start + 2 > dataLen:
+                    return (False, fields)
+                recordSize = variableRecordDef.unpack_from(data, start)[0]
+                start = start + 2
+            pos = start + recordSize
+            if pos > dataLen:
+                return (False, fields)
+            if tag == summaryTag and recordSize >= summaryDef.size:
+                fields = summaryDef.unpack_from(data, start)
+        return (True, fields)
+
+    # mmap needs a regular non-empty file, pipes and devices are read as a stream
+    def IsMappable(self, ttbinfile):
+        try:
+            return ttbinfile.seekable() and os.fstat(ttbinfile.fileno()).st_size > 0
+        except (OSError, ValueError):
+            return False
 
+    # builds dispatch table for the file: key = tag, value = (size after tag or -1 if variable, layout, handler)
+    # records are skipped by length unless their tag is requested
+    def BuildRecordTable(self, tags: set = None):
+        if tags is None:
+            tags = self.decodedTags
+        table = dict()
+        for tag, recordDef in recordDefs.items():
+            table[tag] = (recordDef.size, None, None)
+        for tag, length in self.recordLengths.items():
+            table[tag] = (-1 if length == variableRecordLength else length - 1, None, None)
+        table[TtbinFileRecordTag.x4b.value] = (-1, None, None) # always has a length prefix
+
+        for tag in tags:
+            handler = self.handlers.get(tag)
+            if handler is not None and table[tag][0] >= recordDefs[tag].size:
+                table[tag] = (table[tag][0], recordDefs[tag], handler)
+        return table
+
+    # decodes header and records from the buffer, returns number of records
+    # content without a valid header raises ValueError, so it is reported as failed instead of written as an empty activity
+    def DecodeRecords(self, activity: Activity, data, tags: set = None):
+        dataLen = len(data)
+        pos = self.ReadHeaderx20(activity, data)
+        if pos < 0:
+            raise ValueError("TTBIN file header is not found")
+
+        recordTable = self.BuildRecordTable(tags)
+        countTags = metrics.enabled
+        if countTags:
+            metrics.CountTag(TtbinFileRecordTag.FileHeader.value)
+        count = 1
+        while pos < dataLen:
+            tag = data[pos]
+            if countTags:
+                metrics.CountTag(tag)
+            entry = recordTable.get(tag)
+            if entry is None:
+                logger.warning("   Tag: 0x%s Pos: 0x%s is not implemented. Exiting",
+                               format(tag, '02x'), format(pos, '02x'))
+                break
+
+            recordSize, recordDef, handler = entry
+            start = pos + 1
+            if recordSize < 0:
+                if start + 2 > dataLen:
+                    logger.warning("   Tag: 0x%s Pos: 0x%s is truncated. Exiting",
+                                   format(tag, '02x'), format(pos, '02x'))
+                    break
+                recordSize = variableRecordDef.unpack_from(data, start)[0]
+                start = start + 2
+            pos = start + recordSize
+            if pos > dataLen:
+                logger.warning("   Tag: 0x%s Pos: 0x%s is truncated. Exiting",
+                               format(tag, '02x'), format(start - 1, '02x'))
+                break
+
+            if handler is not None:
+                handler(activity, recordDef.unpack_from(data, start))
+            count = count + 1
+        metrics.Count("recordsDecoded", count)
+        metrics.Count("bytesRead", min(pos, dataLen))
+        return count
+
+    # returns UTC seconds since 1970
     def ParseDate(self, secondsSince1970: int, includeOffset: int):
-        sec = secondsSince1970
         if includeOffset:
-            sec = sec - self.localTimeOffset
-        date = datetime.datetime(year=1970, month=1, day=1, tzinfo=datetime.timezone.utc) + datetime.timedelta(days=0, seconds=sec)
-        return date
-
-    def ReadHeaderx20(self, activity: Activity, file: BinaryIO):
-        headerDef = Struct("<s7shl16s80sllss")
-        data = file.read(headerDef.size)
-        if len(data) != headerDef.size:
-            return False
+            return secondsSince1970 - self.localTimeOffset
+        return secondsSince1970
+
+    # reads file header and its record length table, returns position of the first record or -1
+    def ReadHeaderx20(self, activity: Activity, data):
+        headerDef = recordDefs[TtbinFileRecordTag.FileHeader.value]
+        if len(data) < 1 + headerDef.size or data[0] != TtbinFileRecordTag.FileHeader.value:
+            return -1
 
         fVersion, fFirmwareVersion, fProductId, fStartTime, fSoftwareVersion, \
             fGpsFirmwareVersion, fWatchTime, fLocalTimeOffset, fReserved, fArrayLen \
-            = headerDef.unpack(data)
-        file.read(fArrayLen[0] * 3)
+            = headerDef.unpack_from(data, 1)
+        pos = 1 + headerDef.size
+        if len(data) < pos + fArrayLen * recordLengthDef.size:
+            return -1
+
+        self.recordLengths.clear()
+        for fTag, fLength in recordLengthDef.iter_unpack(data[pos:pos + fArrayLen * recordLengthDef.size]):
+            self.recordLengths[fTag] = fLength
+        pos = pos + fArrayLen * recordLengthDef.size
 
         self.localTimeOffset = fLocalTimeOffset
         activity.startTime = self.ParseDate(fStartTime, includeOffset=True)
-        return True
-
-    def ReadSomething(self, file: BinaryIO, dataLen: int):
-        data = file.read(dataLen)
-        return len(data) == dataLen
-
-    def Readx48(self, activity: Activity, file: BinaryIO):
-        return self.ReadSomething(file, dataLen=14)
-
-    def ReadBatteryLevelx49(self, activity: Activity, file: BinaryIO):
-        batteryDef = Struct("<s3s")
-        data = file.read(batteryDef.size)
-        if len(data) != batteryDef.size:
-            return False
-
-        fLevel, fUnknown = batteryDef.unpack(data)
-        activity.LogBatteryLevel(fLevel[0])
-        #print("      Battery level: %s %%" % fLevel[0])
-        return True
+        return pos
 
-    def ReadStatusx21(self, activity: Activity, file: BinaryIO):
-        statusDef = Struct("<ssl")
-        data = file.read(statusDef.size)
-        if len(data) != statusDef.size:
-            return False
-
-        #fStatus, fActivityCode, fTime = statusDef.unpack(data)
-        #print("      Status: %s" % fStatus[0])
-        return True
-
-    def ReadFitnessPointsx4a(self, activity: Activity, file: BinaryIO):
-        pointsDef = Struct("<lhh")
-        data = file.read(pointsDef.size)
-        if len(data) != pointsDef.size:
-            return False
-
-        #fTime, fPoints1, fPoints2 = pointsDef.unpack(data)
-        #print("      Fitness points: %s" % fPoints1)
-        return True
-
-    def Readx4b(self, activity: Activity, file: BinaryIO):
-        x4bDef = Struct("<h")
-        data = file.read(x4bDef.size)
-        if len(data) != x4bDef.size:
-            return False
+    def ReadBatteryLevelx49(self, activity: Activity, fields: tuple):
+        fLevel, fUnknown = fields
+        activity.LogBatteryLevel(fLevel)
+        #print("      Battery level: %s %%" % fLevel)
 
-        fTuple = x4bDef.unpack(data)
-        return self.ReadSomething(file, fTuple[0])
-
-    def ReadGymx41(self, activity: Activity, file: BinaryIO):
-        gymDef = Struct("<lhl")
-        data = file.read(gymDef.size)
-        if len(data) != gymDef.size:
-            return False
-
-        fTime, fCalories, fSteps = gymDef.unpack(data)
+    def ReadGymx41(self, activity: Activity, fields: tuple):
+        fTime, fCalories, fSteps = fields
         time = self.ParseDate(fTime, includeOffset=True)
         #print("      Calories: %s" % fCalories)
         activity.LogSteps(time, fSteps, distance=0)
-        return True
-
-    def ReadMovementx42(self, activity: Activity, file: BinaryIO):
-        movementDef = Struct("<s")
-        data = file.read(movementDef.size)
-        if len(data) != movementDef.size:
-            return False
-
-        #fTuple = movementDef.unpack(data)
-        #print("      Movement status: %s" % fTuple[0][0])
-        return True
-
-    def ReadHeartRatex25(self, activity: Activity, file: BinaryIO):
-        heartRateDef = Struct("<ssl")
-        data = file.read(heartRateDef.size)
-        if len(data) != heartRateDef.size:
-            return False
 
-        fHeartRate, fExternal, fTime = heartRateDef.unpack(data)
+    def ReadHeartRatex25(self, activity: Activity, fields: tuple):
+        fHeartRate, fExternal, fTime = fields
         time = self.ParseDate(fTime, includeOffset=True)
-        activity.LogHeartRate(time, fHeartRate[0])
-        return True
-
-    def ReadSummaryx27(self, activity: Activity, file: BinaryIO):
-        summaryDef = Struct("<sflhhl")
-        data = file.read(summaryDef.size)
-        if len(data) != summaryDef.size:
-            return False
+        activity.LogHeartRate(time, fHeartRate)
 
-        fActivityCode, fDistance, fDuration, fCalories, fUnknown, fDuration2 = summaryDef.unpack(data)
-        activity.activityType = ActivityType(fActivityCode[0])
+    def ReadSummaryx27(self, activity: Activity, fields: tuple):
+        fActivityCode, fDistance, fDuration, fCalories, fUnknown, fDuration2 = fields
+        activity.activityType = ActivityType(fActivityCode)
         activity.totalActiveSeconds = fDuration
         activity.totalElapsedSeconds = fDuration2
         activity.totalDistanceMeters = fDistance
         activity.totalCalories = fCalories
-        return True
 
-    def ReadTreadmillx32(self, activity: Activity, file: BinaryIO):
-        treadmillDef = Struct("<lfhlh")
-        data = file.read(treadmillDef.size)
-        if len(data) != treadmillDef.size:
-            return False
-
-        fTime, fDistance, fCalories, fSteps, fStepLen = treadmillDef.unpack(data)
+    def ReadTreadmillx32(self, activity: Activity, fields: tuple):
+        fTime, fDistance, fCalories, fSteps, fStepLen = fields
         time = self.ParseDate(fTime, includeOffset=True)
         activity.LogSteps(time, fSteps, fDistance)
-        return True
-
-    def ReadGoalProgressx35(self, activity: Activity, file: BinaryIO):
-        return self.ReadSomething(file, dataLen=5)
-
-    def ReadWaitGpsx30(self, activity: Activity, file: BinaryIO):
-        waitGpsDef = Struct("<h")
-        data = file.read(waitGpsDef.size)
-        if len(data) != waitGpsDef.size:
-            return False
-
-        #fTuple = waitGpsDef.unpack(data)
-        return True
-
-    def ReadGpsx22(self, activity: Activity, file: BinaryIO):
-        gpsDef = Struct("<llhhlhffs")
-        data = file.read(gpsDef.size)
-        if len(data) != gpsDef.size:
-            return False
 
+    def ReadGpsx22(self, activity: Activity, fields: tuple):
         fLatitude, fLongitude, fHeading, fSpeed, fTime, fCalories, \
-            fFilteredSpeed, fDistance, fCycles = gpsDef.unpack(data)
+            fFilteredSpeed, fDistance, fCycles = fields
         time = self.ParseDate(fTime, includeOffset=False)
-        activity.LogGps(time, fLatitude / 10000000.0, fLongitude / 10000000.0, fFilteredSpeed, fCycles[0], fDistance)
-        return True
+        activity.LogGps(time, fLatitude / 10000000.0, fLongitude / 10000000.0, fFilteredSpeed, fCycles, fDistance)
 
-    def ReadExtendedGpsx23(self, activity: Activity, file: BinaryIO):
-        return self.ReadSomething(file, dataLen=23)
-
-    def Readx37(self, activity: Activity, file: BinaryIO):
-        return self.ReadSomething(file, dataLen=1)
-
-    def ReadElevationx47(self, activity: Activity, file: BinaryIO):
-        elevationDef = Struct("<shhhhh")
-        data = file.read(elevationDef.size)
-        if len(data) != elevationDef.size:
-            return False
-
-        fStatus, fAltitude, fElevation2, fAscend, fDescend, fUnknown = elevationDef.unpack(data)
+    def ReadElevationx47(self, activity: Activity, fields: tuple):
+        fStatus, fAltitude, fElevation2, fAscend, fDescend, fUnknown = fields
         #print("      Elevation status: %s Elevation: %s" % (fStatus[0], fElevation1))
         if fAltitude != fUnknown:
             activity.LogElevation(fAltitude, fAscend, fDescend)
-        return True
-
-    def ReadRouteDescriptionx43(self, activity: Activity, file: BinaryIO):
-        return self.ReadSomething(file, dataLen=14)
-
-    def ReadRouteDescriptionx44(self, activity: Activity, file: BinaryIO):
-        return self.ReadSomething(file, dataLen=100)
-        
-    def ReadHeartRateRecoveryx3f(self, activity: Activity, file: BinaryIO):
-        recoveryDef = Struct("<ll")
-        data = file.read(recoveryDef.size)
-        if len(data) != recoveryDef.size:
-            return False
-        
-        #fScore, fHeartRate = recoveryDef.unpack(data)
-        return True
-
-    def ReadTrainingSetupx2d(self, activity: Activity, file: BinaryIO):
-        setupDef = Struct("<sff")
-        data = file.read(setupDef.size)
-        if len(data) != setupDef.size:
-            return False
-
-        fGoal, fMinimum, fMaximum = setupDef.unpack(data)
-        return True
-
-    def ReadLapx2f(self, activity: Activity, file: BinaryIO):
-        lapDef = Struct("<lfh")
-        data = file.read(lapDef.size)
-        if len(data) != lapDef.size:
-            return False
 
-        fSeconds, fDistance, fCalories = lapDef.unpack(data)
+    def ReadLapx2f(self, activity: Activity, fields: tuple):
+        fSeconds, fDistance, fCalories = fields
         activity.LogLap(fSeconds, fDistance, fCalories)
-        return True
@@ -0,0 +1,2 @@
+# changes whenever converted output may change, invalidates conversion caches
+ConverterVersion: str = "1.1.0"
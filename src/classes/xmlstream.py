@@ -0,0 +1,62 @@
+from typing import TextIO
+from xml.sax.saxutils import escape
+
+
+# writes xml elements straight to a text stream
+# pretty output is the same as minidom's toprettyxml, compact output the same as toxml
+class XmlStreamWriter:
+    stream: TextIO
+    pretty: bool
+    indent: str
+    newLine: str
+    depth: int
+
+    def __init__(self, stream: TextIO, pretty: bool = True, indent: str = " "):
+        self.stream = stream
+        self.pretty = pretty
+        self.indent = indent if pretty else ""
+        self.newLine = "\n" if pretty else ""
+        self.depth = 0
+
+    def Indent(self, depth: int):
+        return self.indent * depth
+
+    def Write(self, text: str):
+        self.stream.write(text)
+
+    def StartDocument(self):
+        self.stream.write('<?xml version="1.0" encoding="utf-8"?>%s' % self.newLine)
+
+    def StartElement(self, name: str, attributes: list = None):
+        self.stream.write("%s<%s%s>%s" % (self.indent * self.depth, name, self.FormatAttributes(attributes), self.newLine))
+        self.depth = self.depth + 1
+
+    def EndElement(self, name: str):
+        self.depth = self.depth - 1
+        self.stream.write("%s</%s>%s" % (self.indent * self.depth, name, self.newLine))
+
+    def EmptyElement(self, name: str, attributes: list = None):
+        self.stream.write("%s<%s%s/>%s" % (self.indent * self.depth, name, self.FormatAttributes(attributes), self.newLine))
+
+    def TextElement(self, name: str, text: str, attributes: list = None):
+        self.stream.write("%s<%s%s>%s</%s>%s" % (self.indent * self.depth, name, self.FormatAttributes(attributes),
+                                                  self.EscapeText(text), name, self.newLine))
+
+    # text next to other child nodes, on its own line
+    def Text(self, text: str):
+        self.stream.write(self.EscapeText("%s%s%s" % (self.indent * self.depth, text, self.newLine)))
+
+    def Comment(self, text: str):
+        self.stream.write("%s<!--%s-->%s" % (self.indent * self.depth, text, self.newLine))
+
+    def ProcessingInstruction(self, target: str, data: str):
+        self.stream.write("%s<?%s %s?>%s" % (self.indent * self.depth, target, data, self.newLine))
+
+    def EscapeText(self, text: str):
+        return escape(text, {'"': "&quot;"})
+
+    # attributes is a list of (name, value)
+    def FormatAttributes(self, attributes: list):
+        if not attributes:
+            return ""
+        return "".join([' %s="%s"' % (name, self.EscapeText(value)) for name, value in attributes])
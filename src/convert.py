@@ -1,48 +1,324 @@
+import io
 import os
 import sys
+import time
+import hashlib
 import datetime
-from classes.tcxwriter import TcxFileWriter
 from classes.ttbinreader import TtbinFileReader
+from classes.activity import ArgConstant, ArgTools
+from classes.batchrunner import BatchRunner, BatchResult
+from classes.convcache import ConversionCache
+from classes.compression import Compression
+from classes.archive import ArchiveReader, ArchiveWriter, GetMemberName
+from classes.filefinder import FileFinder, ActivityFilter
+from classes.activityindex import ActivityIndex, IndexRecord
+from classes.snapshot import SnapshotCache
+from classes.conversion import TtbinConverter, outputFormats
+from classes.metrics import Metrics, metrics
+from classes.console import EnableConsole
 
+# options changing the output, with number of values following them
+outputOptions: list = [
+    (ArgConstant.HRZones, 1),
+    (ArgConstant.Compact, 0),
+    (ArgConstant.Dom, 0),
+    (ArgConstant.Distance, 1),
+    (ArgConstant.Speed, 1),
+    (ArgConstant.Format, 1),
+    (ArgConstant.Compress, 1),
+]
 
 def main():
+    EnableConsole()
     argcnt = len(sys.argv)
     if argcnt < 2:
         print("Wrong arguments")
         exit()
 
+    fileFormat = ArgTools.GetValue(sys.argv, ArgConstant.Format, "tcx").lower()
+    if fileFormat not in outputFormats:
+        print("Wrong format %s" % fileFormat)
+        exit()
+    compression = ArgTools.GetValue(sys.argv, ArgConstant.Compress)
+    if compression is not None and not Compression.IsSupported(compression):
+        print("Compression %s is not supported" % compression)
+        exit()
+
+    fileArchiveOut = ArgTools.GetValue(sys.argv, ArgConstant.Archive)
+    if fileArchiveOut is not None and not ArchiveWriter.IsArchive(fileArchiveOut):
+        print("Wrong archive %s" % fileArchiveOut)
+        exit()
+    toArchive = fileArchiveOut is not None
+
+    try:
+        activityFilter = getActivityFilter(sys.argv)
+    except ValueError as e:
+        print("Wrong filter: %s" % e)
+        exit()
+    finder = FileFinder(".ttbin", recursive=ArgConstant.Recursive in sys.argv,
+                        includes=ArgTools.GetValues(sys.argv, ArgConstant.Include),
+                        excludes=ArgTools.GetValues(sys.argv, ArgConstant.Exclude))
+
     fileOrDir = sys.argv[1]
+    files = list()
+    archive = None
 
-    if os.path.isfile(fileOrDir):
+    # members of an archive are read into memory, the archive is not extracted
+    if ArchiveReader.IsArchive(fileOrDir):
+        archive = ArchiveReader.Open(fileOrDir)
+        files = finder.FindMembers(archive.names)
+    elif os.path.isfile(fileOrDir):
         f_name, f_ext = os.path.splitext(fileOrDir)
         if f_ext.lower() == ".ttbin":
-            process(fileOrDir, sys.argv)
+            files.append(fileOrDir)
         else:
             print("Skipped %s" % fileOrDir)
 
     if os.path.isdir(fileOrDir):
-        files = [f for f in os.listdir(fileOrDir) if os.path.isfile(os.path.join(fileOrDir, f))]
-        for f in files:
-            f_name, f_ext = os.path.splitext(f)
-            if f_ext.lower() == ".ttbin":
-                fileTtbin = os.path.join(fileOrDir, f)
-                process(fileTtbin, sys.argv)
+        files = finder.Find(fileOrDir)
+
+    if ArgConstant.List in sys.argv:
+        listActivities(files, archive, activityFilter)
+        return 0
+    if not activityFilter.IsEmpty():
+        files = filterActivities(files, archive, activityFilter)
+
+    start = time.perf_counter()
+    options = getOutputOptions(sys.argv)
+    fileIndex = ArgTools.GetValue(sys.argv, ArgConstant.Index)
+    try:
+        index = ActivityIndex(fileIndex) if fileIndex is not None else None
+    except ValueError as e:
+        print("Wrong index: %s" % e)
+        exit()
+    caches = dict() # key = folder, value = ConversionCache
+    outdated = list()
+    for fileTtbin in files:
+        # archive members and output archives are not tracked by the cache
+        if archive is not None or toArchive:
+            outdated.append(fileTtbin)
+            continue
+        dir = os.path.dirname(fileTtbin)
+        if dir not in caches:
+            caches[dir] = ConversionCache(dir)
+        # up to date files missing in the index are converted again to get into it
+        if ArgConstant.Force not in sys.argv and caches[dir].IsUpToDate(fileTtbin, options) \
+                and (index is None or index.Contains(caches[dir].GetHash(fileTtbin))):
+            print("Up to date %s" % fileTtbin)
+        else:
+            outdated.append(fileTtbin)
+
+    fileMetrics = ArgTools.GetValue(sys.argv, ArgConstant.Metrics)
+    profiling = ArgConstant.Profile in sys.argv
+    allMetrics = Metrics()
+
+    writer = ArchiveWriter(fileArchiveOut) if toArchive else None
+
+    def onResult(result: BatchResult):
+        printResult(result)
+        value = result.value
+        hash = None
+        if result.ok and index is not None:
+            value, record = result.value
+            hash = record.values["hash"]
+            index.Add(record, value[0] if toArchive else value)
+        if result.ok and toArchive:
+            writer.Add(*value)
+        elif result.ok and archive is None:
+            caches[os.path.dirname(result.item)].Update(result.item, value, options, hash)
+        if result.metrics is not None:
+            allMetrics.Merge(result.metrics)
+            allMetrics.Count("filesConverted" if result.ok else "filesFailed")
+
+    jobs = int(ArgTools.GetValue(sys.argv, ArgConstant.Jobs, "1"))
+    timeout = ArgTools.GetValue(sys.argv, ArgConstant.Timeout)
+    runner = BatchRunner(jobs, float(timeout) if timeout is not None else None,
+                         collectMetrics=fileMetrics is not None, profiling=profiling)
+    allMetrics.enabled = runner.collectMetrics
+    try:
+        if archive is not None:
+            results = runner.Run(processMember, outdated, (fileOrDir, sys.argv, toArchive), onResult=onResult)
+        else:
+            results = runner.Run(process, outdated, (sys.argv, toArchive), onResult=onResult)
+    finally:
+        for cache in caches.values():
+            cache.Save()
+        if writer is not None:
+            print("Saving %s" % fileArchiveOut)
+            writer.Close()
+        if index is not None:
+            index.Close()
+    dirSnapshots = ArgTools.GetValue(sys.argv, ArgConstant.Snapshots)
+    if dirSnapshots is not None:
+        removed, removedBytes = SnapshotCache(dirSnapshots, getSnapshotsSize(sys.argv)).Evict()
+        if removed > 0:
+            print("Removed %s snapshots, %.1f MB" % (removed, removedBytes / 1048576))
+    seconds = time.perf_counter() - start
+
+    if os.path.isdir(fileOrDir) or archive is not None:
+        failed = len([result for result in results if not result.ok])
+        if archive is not None:
+            totalBytes = sum([archive.sizes[f] for f in outdated])
+            archive.Close()
+        else:
+            totalBytes = sum([os.path.getsize(f) for f in outdated])
+        print("Converted %s files, %s failed, %s up to date in %.1f s: %.1f files/s, %.2f MB/s" \
+              % (len(outdated) - failed, failed, len(files) - len(outdated), seconds,
+                 len(outdated) / seconds if seconds > 0 else 0,
+                 totalBytes / 1048576 / seconds if seconds > 0 else 0))
+    if runner.collectMetrics:
+        allMetrics.SaveReport(fileMetrics)
     return 0
 
 
-def process(fileTtbin: str, args: list[str]):
+# type and date filter from the options
+def getActivityFilter(args: list[str]):
+    activityTypes = ArgTools.GetValue(args, ArgConstant.Type)
+    dateFrom = ArgTools.GetValue(args, ArgConstant.From)
+    dateTo = ArgTools.GetValue(args, ArgConstant.To)
+    return ActivityFilter(ActivityFilter.ParseTypes(activityTypes) if activityTypes is not None else None,
+                          ActivityFilter.ParseDate(dateFrom) if dateFrom is not None else None,
+                          ActivityFilter.ParseDate(dateTo) if dateTo is not None else None)
+
+
+# summary of a file or an archive member from its header and, if readSummary, its summary record
+def scanActivity(fileTtbin: str, archive: ArchiveReader = None, readSummary: bool = True):
     reader = TtbinFileReader()
-    activity = reader.LoadActivity(fileTtbin, args)
+    if archive is not None:
+        return reader.ScanData(os.path.join(archive.fileArchive, fileTtbin), archive.Read(fileTtbin), readSummary)
+    return reader.ScanFile(fileTtbin, readSummary)
+
+
+# files matching the filter, files which can't be scanned are kept for the conversion to report them
+def filterActivities(files: list, archive: ArchiveReader, activityFilter: ActivityFilter):
+    start = time.perf_counter()
+    selected = list()
+    for fileTtbin in files:
+        try:
+            summary = scanActivity(fileTtbin, archive, activityFilter.NeedsSummary())
+        except (OSError, ValueError, KeyError):
+            summary = None
+        if summary is None or activityFilter.Matches(summary):
+            selected.append(fileTtbin)
+    print("Selected %s of %s files in %.2f s" % (len(selected), len(files), time.perf_counter() - start))
+    return selected
+
+
+# prints a line per file from its header and summary record ordered by start time, tracks are not read
+def listActivities(files: list, archive: ArchiveReader = None, activityFilter: ActivityFilter = None):
+    start = time.perf_counter()
+    summaries = list()
+    failed = 0
+    for fileTtbin in files:
+        try:
+            summary = scanActivity(fileTtbin, archive)
+        except (OSError, ValueError, KeyError) as e:
+            print("Failed %s: %s" % (fileTtbin, e))
+            failed = failed + 1
+            continue
+        if summary is None:
+            print("File header is not found in %s" % fileTtbin)
+            failed = failed + 1
+            continue
+        if activityFilter is None or activityFilter.Matches(summary):
+            summaries.append(summary)
+    seconds = time.perf_counter() - start
+
+    summaries.sort(key=lambda summary: (summary.startTime, summary.file))
+    for summary in summaries:
+        print("%s  %-13s %8.2f km %9s  %s" % (summary.GetLocalStartTime().strftime("%Y-%m-%d %H:%M:%S"),
+              summary.activityType.name.lower() if summary.activityType is not None else "unknown",
+              summary.totalDistanceMeters / 1000.0, datetime.timedelta(seconds=summary.totalActiveSeconds), summary.file))
+    print("Listed %s files, %s failed in %.2f s: %.0f files/s" \
+          % (len(summaries), failed, seconds, len(files) / seconds if seconds > 0 else 0))
+
+
+def printResult(result: BatchResult):
+    print(result.output, end="")
+    if not result.ok:
+        print("Failed %s: %s" % (result.item, result.error))
+
+
+# options and their values, which the output depends on
+def getOutputOptions(args: list[str]):
+    options = list()
+    for option, valueCount in outputOptions:
+        for idx, arg in enumerate(args):
+            if arg == option:
+                options.extend(args[idx:idx + 1 + valueCount])
+    return " ".join(options)
+
+
+def process(fileTtbin: str, args: list[str], toArchive: bool = False):
+    reader = TtbinFileReader(useMmap=ArgConstant.Mmap in args)
+    hash = None
+    if ArgConstant.Index in args or ArgConstant.Snapshots in args:
+        hash = ConversionCache.FileHash(fileTtbin)
+    activity = loadActivity(reader, fileTtbin, hash, args, lambda: reader.LoadActivity(fileTtbin, args))
+    value = saveActivity(activity, reader, args, os.path.dirname(fileTtbin),
+                         os.path.basename(fileTtbin) if toArchive else None)
+    if ArgConstant.Index in args:
+        return (value, getIndexRecord(activity, reader, fileTtbin, hash, args))
+    return value
+
+
+# converts a member of a TTBIN archive, output files are created in the archive's folder
+def processMember(name: str, fileArchive: str, args: list[str], toArchive: bool = False):
+    data = ArchiveReader.Open(fileArchive).Read(name)
+    reader = TtbinFileReader()
+    fileTtbin = os.path.join(fileArchive, name)
+    hash = hashlib.sha256(data).hexdigest()
+    activity = loadActivity(reader, fileTtbin, hash, args, lambda: reader.LoadActivityData(fileTtbin, data, args))
+    value = saveActivity(activity, reader, args, os.path.dirname(fileArchive), name if toArchive else None)
+    if ArgConstant.Index in args:
+        return (value, getIndexRecord(activity, reader, fileTtbin, hash, args))
+    return value
+
+
+# loads the snapshot of the content with --snapshots, otherwise decodes it with load and saves its snapshot
+# edits are applied later, so one snapshot serves conversions with any edits, formats and heart rate zones
+def loadActivity(reader: TtbinFileReader, fileTtbin: str, hash: str, args: list[str], load):
+    dirSnapshots = ArgTools.GetValue(args, ArgConstant.Snapshots)
+    if dirSnapshots is None:
+        return load()
+    snapshots = SnapshotCache(dirSnapshots, getSnapshotsSize(args))
+    loaded = snapshots.Load(fileTtbin, hash, args)
+    if loaded is not None:
+        activity, reader.localTimeOffset = loaded
+        return activity
+    activity = load()
+    snapshots.Save(hash, activity, reader.localTimeOffset)
+    return activity
+
+
+def getSnapshotsSize(args: list[str]):
+    return int(float(ArgTools.GetValue(args, ArgConstant.SnapshotsSize, "512")) * 1048576)
+
+
+# what the index keeps about the converted activity, with the edits applied like in the output file
+def getIndexRecord(activity, reader: TtbinFileReader, fileTtbin: str, hash: str, args: list[str]):
+    return IndexRecord(hash, fileTtbin, activity, reader.localTimeOffset, int(ArgTools.GetValue(args, ArgConstant.IndexTrack, "0")))
+
 
-    #f_name, f_ext = os.path.splitext(fileTtbin)
-    #fileTcx = f_name + ".tcx"
+# writes the output file into dir and returns its path
+# or, given the source member name, returns (output member name, content) to put into the output archive
+def saveActivity(activity, reader: TtbinFileReader, args: list[str], dir: str, memberName: str = None):
+    converter = TtbinConverter(args)
+    converter.ApplyEdits(activity)
 
-    dir = os.path.dirname(fileTtbin)
-    dt = activity.startTime + datetime.timedelta(days=0, seconds=reader.localTimeOffset)
-    fileNameTcx = "%s-%s.tcx" % (activity.activityType.name.lower(), dt.strftime("%Y%m%d%H%M%S"))
-    fileTcx = os.path.join(dir, fileNameTcx)
-    writer = TcxFileWriter()
-    writer.SaveActivity(fileTcx, activity)
+    compression = ArgTools.GetValue(args, ArgConstant.Compress) if memberName is None else None
+    fileNameOut = converter.GetFileName(activity, reader.localTimeOffset)
+    fileOut = os.path.join(dir, Compression.GetFileName(fileNameOut, compression))
+    writer = converter.GetWriter(compression)
+    if memberName is not None:
+        memberName = GetMemberName(memberName, fileNameOut)
+        print("Saving %s" % memberName)
+        outfile = io.BytesIO()
+        writer.WriteFile(outfile, activity)
+        metrics.Count("bytesWritten", outfile.tell())
+        return (memberName, outfile.getvalue())
+    writer.SaveActivity(fileOut, activity)
+    return fileOut
 
 
 if __name__ == "__main__":
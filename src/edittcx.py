@@ -0,0 +1,66 @@
+import os
+import sys
+from classes.tcxeditor import TcxFileEditor
+from classes.trackedit import EditOperation, TrackEdit
+from classes.tcxstreameditor import TcxStreamEditor
+from classes.activity import ArgConstant, ArgTools
+from classes.metrics import metrics
+from classes.compression import Compression
+from classes.console import EnableConsole
+
+# edits are applied in the order they are given, the file is loaded and saved once
+# usage:
+#   edittcx.py (tcx file) [-distance (meters)] [-speed (intervals)] ...
+# example, the same as setdistance.py and then setspeed.py on its output:
+#   edittcx.py running.tcx -distance 5000 -speed l10;11;12
+# output file gets prefixes of all edits, like s-d-running.tcx
+
+
+def main():
+    EnableConsole()
+    argcnt = len(sys.argv)
+    if argcnt < 2:
+        print("Wrong arguments")
+        exit()
+    compression = ArgTools.GetValue(sys.argv, ArgConstant.Compress)
+    if compression is not None and not Compression.IsSupported(compression):
+        print("Compression %s is not supported" % compression)
+        exit()
+
+    fileTcx = sys.argv[1]
+    edits = ArgTools.GetEdits(sys.argv)
+    if len(edits) == 0:
+        print("No edits given")
+        exit()
+
+    fileMetrics = ArgTools.GetValue(sys.argv, ArgConstant.Metrics)
+    if fileMetrics is not None or ArgConstant.Profile in sys.argv:
+        metrics.Enable(profiling=ArgConstant.Profile in sys.argv)
+    process(fileTcx, edits, useDom=ArgConstant.Dom in sys.argv, compression=compression)
+    if metrics.enabled:
+        metrics.SaveReport(fileMetrics)
+
+    return 0
+
+
+# output is compressed like the source file unless compression is given
+def process(fileTcx: str, edits: list, useDom: bool = False, compression: str = None):
+    dir, f_name = os.path.split(fileTcx)
+    compression = Compression.GetOutputCompression(fileTcx, compression)
+    f_name = Compression.GetFileName("%s%s" % (TrackEdit.GetEditsPrefix(edits), f_name), compression)
+    fileTcxOut = os.path.join(dir, f_name)
+
+    # a single distance change doesn't need the document in memory
+    if not useDom and len(edits) == 1 and edits[0][0] == EditOperation.ChangeLength:
+        return TcxStreamEditor().ChangeLength(fileTcx, fileTcxOut, edits[0][1], compression)
+
+    editor = TcxFileEditor()
+    editor.LoadXml(fileTcx)
+    if not editor.ApplyEdits(edits):
+        return False
+    editor.SaveXml(fileTcxOut, compression)
+    return True
+
+
+if __name__ == "__main__":
+    main()
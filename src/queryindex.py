@@ -0,0 +1,101 @@
+import os
+import sys
+import sqlite3
+import time
+import datetime
+from classes.activity import ArgConstant, ArgTools
+from classes.activityindex import ActivityIndex
+from classes.filefinder import ActivityFilter
+
+# queries the index convert.py --index builds, nothing is parsed again and the index is opened read only
+# usage:
+#   queryindex.py (index file) (query) [value] [--type (types)] [--from (date)] [--to (date)]
+# queries:
+#   activities              activities ordered by start time
+#   weekly, monthly, yearly totals: activities, distance, active time, calories, steps, battery drain
+#   zones (hr zones)        time in heart rate zones per month, zones like -hrzones: 120;140;160;180
+#   maxspeed                the fastest activity of each year
+#   sql (statement)         any SQL statement over tables activities, laps, heart_rates and track
+# example:
+#   queryindex.py activities.db weekly --type running --from 2025-01-01
+
+periods: dict = {"weekly": "%Y-%W", "monthly": "%Y-%m", "yearly": "%Y"}
+
+
+def main():
+    argcnt = len(sys.argv)
+    if argcnt < 3:
+        print("Wrong arguments")
+        exit()
+
+    fileIndex = sys.argv[1]
+    query = sys.argv[2].lower()
+    if not os.path.isfile(fileIndex):
+        print("Index %s is not found" % fileIndex)
+        exit()
+    try:
+        activityTypes = ArgTools.GetValue(sys.argv, ArgConstant.Type)
+        activityTypes = ActivityFilter.ParseTypes(activityTypes) if activityTypes is not None else None
+        dateFrom = ArgTools.GetValue(sys.argv, ArgConstant.From)
+        dateFrom = ActivityFilter.ParseDate(dateFrom) if dateFrom is not None else None
+        dateTo = ArgTools.GetValue(sys.argv, ArgConstant.To)
+        dateTo = ActivityFilter.ParseDate(dateTo) if dateTo is not None else None
+    except ValueError as e:
+        print("Wrong filter: %s" % e)
+        exit()
+
+    try:
+        index = ActivityIndex(fileIndex, readOnly=True)
+    except ValueError as e:
+        print("Wrong index: %s" % e)
+        exit()
+    start = time.perf_counter()
+    timeColumns = ["seconds"]
+    if query == "activities":
+        columns, rows = index.GetActivities(activityTypes, dateFrom, dateTo)
+    elif query in periods:
+        columns, rows = index.GetTotals(periods[query], activityTypes, dateFrom, dateTo)
+    elif query == "zones" and argcnt > 3:
+        columns, rows = index.GetZoneSeconds([int(zone) for zone in sys.argv[3].split(";") if len(zone) > 0],
+                                             activityTypes, dateFrom, dateTo)
+        timeColumns = columns[1:]
+    elif query == "maxspeed":
+        columns, rows = index.GetMaxSpeeds(activityTypes, dateFrom, dateTo)
+    elif query == "sql" and argcnt > 3:
+        try:
+            columns, rows = index.Query(sys.argv[3])
+        except sqlite3.Error as e:
+            print("Wrong statement: %s" % e)
+            exit()
+    else:
+        print("Wrong query %s" % query)
+        exit()
+    seconds = time.perf_counter() - start
+    index.Close()
+
+    printTable(columns, rows, timeColumns)
+    print("%s rows in %.1f ms" % (len(rows), seconds * 1000))
+    return 0
+
+
+# columns aligned by their widest value, seconds in time columns are printed as h:mm:ss
+def printTable(columns: list, rows: list, timeColumns: list):
+    timeIndexes = [idx for idx, column in enumerate(columns) if column in timeColumns]
+    lines = [list(columns)]
+    for row in rows:
+        line = list()
+        for idx, value in enumerate(row):
+            if value is None:
+                line.append("")
+            elif idx in timeIndexes:
+                line.append(str(datetime.timedelta(seconds=round(value))))
+            else:
+                line.append(str(value))
+        lines.append(line)
+    widths = [max([len(line[idx]) for line in lines]) for idx in range(len(columns))]
+    for line in lines:
+        print("  ".join([value.ljust(width) for value, width in zip(line, widths)]).rstrip())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,63 @@
 import os
 import sys
 from classes.tcxeditor import TcxFileEditor
+from classes.tcxstreameditor import TcxStreamEditor
+from classes.activity import ArgConstant, ArgTools
+from classes.metrics import metrics
+from classes.editbatch import TcxEditBatch
+from classes.compression import Compression
+from classes.console import EnableConsole
 
 
 def main():
+    EnableConsole()
     argcnt = len(sys.argv)
-    if argcnt != 3:
+    if argcnt < 2 or (argcnt < 3 and not TcxEditBatch.IsManifest(sys.argv[1])):
         print("Wrong arguments")
         exit()
+    compression = ArgTools.GetValue(sys.argv, ArgConstant.Compress)
+    if compression is not None and not Compression.IsSupported(compression):
+        print("Compression %s is not supported" % compression)
+        exit()
+
+    # batch mode: a csv manifest of (tcx file, new distance) or a folder with the same new distance for all files
+    if TcxEditBatch.IsManifest(sys.argv[1]) or os.path.isdir(sys.argv[1]):
+        batch = TcxEditBatch("d-")
+        if os.path.isdir(sys.argv[1]):
+            batch.ReadFolder(sys.argv[1], float(sys.argv[2]))
+        else:
+            batch.ReadManifest(sys.argv[1], float)
+        batch.Run(process, sys.argv, (ArgConstant.Dom in sys.argv, compression))
+        return 0
 
     fileTcx = sys.argv[1]
     newLen = float(sys.argv[2])
-    process(fileTcx, newLen)
+    fileMetrics = ArgTools.GetValue(sys.argv, ArgConstant.Metrics)
+    if fileMetrics is not None or ArgConstant.Profile in sys.argv:
+        metrics.Enable(profiling=ArgConstant.Profile in sys.argv)
+    process(fileTcx, newLen, useDom=ArgConstant.Dom in sys.argv, compression=compression)
+    if metrics.enabled:
+        metrics.SaveReport(fileMetrics)
 
     return 0
 
 
-def process(fileTcx: str, newLen: float):
+# output is compressed like the source file unless compression is given
+def process(fileTcx: str, newLen: float, useDom: bool = False, compression: str = None):
     dir, f_name = os.path.split(fileTcx)
-    f_name = "d-%s" % f_name
+    compression = Compression.GetOutputCompression(fileTcx, compression)
+    f_name = Compression.GetFileName("d-%s" % f_name, compression)
     fileTcxOut = os.path.join(dir, f_name)
 
+    if not useDom:
+        return TcxStreamEditor().ChangeLength(fileTcx, fileTcxOut, newLen, compression)
+
     editor = TcxFileEditor()
     editor.LoadXml(fileTcx)
-    if editor.ChangeLength(newLen):
-        editor.SaveXml(fileTcxOut)
+    if not editor.ChangeLength(newLen):
+        return False
+    editor.SaveXml(fileTcxOut, compression)
+    return True
 
 
 if __name__ == "__main__":
@@ -1,16 +1,39 @@
 import os
 import sys
 from classes.tcxeditor import TcxFileEditor
+from classes.activity import ArgConstant, ArgTools
+from classes.metrics import metrics
+from classes.editbatch import TcxEditBatch
+from classes.compression import Compression
+from classes.console import EnableConsole
 
 
 def main():
+    EnableConsole()
     argcnt = len(sys.argv)
-    if argcnt != 3:
+    if argcnt < 2 or (argcnt < 3 and not TcxEditBatch.IsManifest(sys.argv[1])):
         print("Wrong arguments")
         exit()
+    compression = ArgTools.GetValue(sys.argv, ArgConstant.Compress)
+    if compression is not None and not Compression.IsSupported(compression):
+        print("Compression %s is not supported" % compression)
+        exit()
+
+    # batch mode: a csv manifest of (tcx file, intervals) or a folder with the same intervals for all files
+    if TcxEditBatch.IsManifest(sys.argv[1]) or os.path.isdir(sys.argv[1]):
+        batch = TcxEditBatch("s-")
+        if os.path.isdir(sys.argv[1]):
+            batch.ReadFolder(sys.argv[1], parseIntervals(sys.argv[2]))
+        else:
+            batch.ReadManifest(sys.argv[1], parseIntervals)
+        batch.Run(process, sys.argv, (compression,))
+        return 0
 
     fileTcx = sys.argv[1]
-    intervals = sys.argv[2].strip().lower()
+    intervals = parseIntervals(sys.argv[2])
+    fileMetrics = ArgTools.GetValue(sys.argv, ArgConstant.Metrics)
+    if fileMetrics is not None or ArgConstant.Profile in sys.argv:
+        metrics.Enable(profiling=ArgConstant.Profile in sys.argv)
     # intervals mode definition:
     #   interval1;interval2;...
     # where interval is:
@@ -24,20 +47,30 @@ def main():
     #  l"speed for lap 1 km/h";"speed for lap2 km/h"; ...
     # example:
     #   l9;12;9;12;10
-    process(fileTcx, intervals)
+    process(fileTcx, intervals, compression)
+    if metrics.enabled:
+        metrics.SaveReport(fileMetrics)
 
     return 0
 
 
-def process(fileTcx: str, intervals: str):
+def parseIntervals(intervals: str):
+    return intervals.strip().lower()
+
+
+# output is compressed like the source file unless compression is given
+def process(fileTcx: str, intervals: str, compression: str = None):
     dir, f_name = os.path.split(fileTcx)
-    f_name = "s-%s" % f_name
+    compression = Compression.GetOutputCompression(fileTcx, compression)
+    f_name = Compression.GetFileName("s-%s" % f_name, compression)
     fileTcxOut = os.path.join(dir, f_name)
 
     editor = TcxFileEditor()
     editor.LoadXml(fileTcx)
-    if editor.ChangeSpeed(intervals):
-        editor.SaveXml(fileTcxOut)
+    if not editor.ChangeSpeed(intervals):
+        return False
+    editor.SaveXml(fileTcxOut, compression)
+    return True
 
 
 if __name__ == "__main__":
@@ -0,0 +1,70 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from classes.activityindex import ActivityIndex, IndexVersion
+
+
+class ActivityIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.fileIndex = os.path.join(self.dir.name, "activities.db")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def GetTables(self):
+        connection = sqlite3.connect(self.fileIndex)
+        tables = sorted([row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")])
+        connection.close()
+        return tables
+
+    def testUnrelatedDatabaseIsLeftUntouched(self):
+        connection = sqlite3.connect(self.fileIndex)
+        connection.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+        connection.execute("INSERT INTO meta VALUES ('version', '7')")
+        connection.execute("CREATE TABLE notes (text TEXT)")
+        connection.execute("INSERT INTO notes VALUES ('keep me')")
+        connection.commit()
+        connection.close()
+        with open(self.fileIndex, "rb") as infile:
+            content = infile.read()
+
+        with self.assertRaises(ValueError):
+            ActivityIndex(self.fileIndex)
+        with self.assertRaises(ValueError):
+            ActivityIndex(self.fileIndex, readOnly=True)
+        with open(self.fileIndex, "rb") as infile:
+            self.assertEqual(infile.read(), content)
+        self.assertEqual(self.GetTables(), ["meta", "notes"])
+
+    def testNewIndexIsCreated(self):
+        index = ActivityIndex(self.fileIndex)
+        index.Close()
+        self.assertIn("activities", self.GetTables())
+        index = ActivityIndex(self.fileIndex, readOnly=True)
+        self.assertEqual(index.Query("SELECT COUNT(*) FROM activities")[1], [(0,)])
+        index.Close()
+
+    def testReadOnlyDoesNotCreate(self):
+        with self.assertRaises(ValueError):
+            ActivityIndex(self.fileIndex, readOnly=True)
+        self.assertFalse(os.path.exists(self.fileIndex))
+
+    def testReadOnlyReportsOtherVersion(self):
+        index = ActivityIndex(self.fileIndex)
+        index.connection.execute("UPDATE meta SET value = ? WHERE key = 'version'", (str(IndexVersion + 1),))
+        index.connection.execute("INSERT INTO activities (hash, file, activity_type, start_time, local_time_offset, distance, "
+                                 "active_seconds, elapsed_seconds, calories, steps, ascent, descent, avg_speed, max_speed, "
+                                 "avg_heart_rate, max_heart_rate, battery_start, battery_end) "
+                                 "VALUES ('a', 'a.ttbin', 'running', 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0)")
+        index.Close()
+        with self.assertRaises(ValueError):
+            ActivityIndex(self.fileIndex, readOnly=True)
+        connection = sqlite3.connect(self.fileIndex)
+        self.assertEqual(connection.execute("SELECT COUNT(*) FROM activities").fetchone()[0], 1)
+        connection.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+from classes.activity import Activity, ActivityType
+from classes.snapshot import activityFields, lapFields, trackColumns
+from classes.ttbingenerator import TtbinFileGenerator
+from classes.ttbinreader import TtbinFileReader
+
+
+@unittest.skipUnless(Activity.vectorized, "numpy is not installed")
+class AnalyzeTrackTest(unittest.TestCase):
+    # the activity decoded and analyzed by PostLoad, over NumPy arrays or by the loops of AnalyzeTrack
+    def LoadActivity(self, data: bytes, vectorized: bool):
+        activity = Activity()
+        activity.vectorized = vectorized
+        TtbinFileReader().DecodeRecords(activity, data)
+        activity.PostLoad()
+        return activity
+
+    def CheckActivityType(self, activityType: ActivityType):
+        data = TtbinFileGenerator(seed=7).Generate(activityType, 1800)
+        expected = self.LoadActivity(data, False)
+        activity = self.LoadActivity(data, True)
+
+        for field in activityFields:
+            self.assertEqual(getattr(activity, field), getattr(expected, field), field)
+        self.assertEqual(len(activity.laps), len(expected.laps))
+        for lap, expectedLap in zip(activity.laps, expected.laps):
+            for field in lapFields:
+                self.assertEqual(getattr(lap, field), getattr(expectedLap, field), field)
+        self.assertEqual(activity.heartRateCounts, expected.heartRateCounts)
+        self.assertEqual(len(activity.track), len(expected.track))
+        for column in trackColumns:
+            self.assertEqual(getattr(activity.track, column).tolist(), getattr(expected.track, column).tolist(), column)
+
+    def testRunning(self):
+        self.CheckActivityType(ActivityType.Running)
+
+    def testTreadmill(self):
+        self.CheckActivityType(ActivityType.Treadmill)
+
+    def testGym(self):
+        self.CheckActivityType(ActivityType.Gym)
+
+
+if __name__ == "__main__":
+    unittest.main()
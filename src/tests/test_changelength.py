@@ -0,0 +1,66 @@
+import os
+import tempfile
+import unittest
+from classes.activity import ActivityType
+from classes.conversion import TtbinConverter
+from classes.tcxeditor import TcxFileEditor
+from classes.tcxstreameditor import TcxStreamEditor
+from classes.ttbingenerator import TtbinFileGenerator
+
+
+class ChangeLengthTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.generator = TtbinFileGenerator()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def LoadActivity(self, activityType: ActivityType):
+        return TtbinConverter().LoadActivity(self.generator.Generate(activityType, 300))[0]
+
+    # tcx file of a generated activity
+    def SaveTcx(self, activityType: ActivityType):
+        fileTcx = os.path.join(self.dir.name, activityType.name.lower() + ".tcx")
+        with open(fileTcx, "wb") as outfile:
+            TtbinConverter().ConvertTo(self.generator.Generate(activityType, 300), outfile)
+        return fileTcx
+
+    def testActivityWithoutDistance(self):
+        activity = self.LoadActivity(ActivityType.Gym)
+        self.assertEqual(activity.totalDistanceMeters, 0)
+        self.assertFalse(activity.ChangeLength(5000.0))
+
+    def testActivityWithDistance(self):
+        activity = self.LoadActivity(ActivityType.Running)
+        self.assertTrue(activity.ChangeLength(5000.0))
+        self.assertAlmostEqual(activity.totalDistanceMeters, 5000.0, delta=0.1)
+
+    def testStreamEditorWithoutDistance(self):
+        fileTcx = self.SaveTcx(ActivityType.Gym)
+        fileTcxOut = os.path.join(self.dir.name, "d-gym.tcx")
+        self.assertFalse(TcxStreamEditor().ChangeLength(fileTcx, fileTcxOut, 5000.0))
+        self.assertFalse(os.path.exists(fileTcxOut))
+
+    def testFileEditorWithoutDistance(self):
+        editor = TcxFileEditor()
+        editor.LoadXml(self.SaveTcx(ActivityType.Gym))
+        self.assertFalse(editor.ChangeLength(5000.0))
+
+    def testActivitySpeedPlanWithoutDistance(self):
+        activity = self.LoadActivity(ActivityType.Treadmill)
+        self.assertFalse(activity.ChangeSpeed("60s0"))
+        self.assertTrue(activity.ChangeSpeed("60s10"))
+
+    def testFileEditorSpeedPlanWithoutDistance(self):
+        editor = TcxFileEditor()
+        editor.LoadXml(self.SaveTcx(ActivityType.Treadmill))
+        self.assertFalse(editor.ChangeSpeed("60s0"))
+
+    def testConverterSpeedPlanWithoutDistance(self):
+        with self.assertRaises(ValueError):
+            TtbinConverter(["-speed", "60s0"]).Convert(self.generator.Generate(ActivityType.Running, 300))
+
+
+if __name__ == "__main__":
+    unittest.main()
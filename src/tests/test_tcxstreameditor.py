@@ -0,0 +1,68 @@
+import os
+import tempfile
+import unittest
+from classes.activity import ActivityType
+from classes.conversion import TtbinConverter
+from classes.tcxeditor import TcxFileEditor
+from classes.tcxstreameditor import TcxStreamEditor
+from classes.ttbingenerator import TtbinFileGenerator
+
+
+class TcxStreamEditorTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def ReadFile(self, fileName: str):
+        with open(fileName, "rb") as infile:
+            return infile.read()
+
+    # tcx file of a generated activity, edit changes its text before it is saved
+    def SaveTcx(self, activityType: ActivityType, edit=None):
+        fileTcx = os.path.join(self.dir.name, "activity.tcx")
+        content = TtbinConverter().Convert(TtbinFileGenerator(seed=5).Generate(activityType, 900))
+        if edit is not None:
+            content = edit(content.decode("utf-8")).encode("utf-8")
+        with open(fileTcx, "wb") as outfile:
+            outfile.write(content)
+        return fileTcx
+
+    # a distance change streamed has to give the file the minidom editor saves
+    def CheckActivityType(self, activityType: ActivityType, newLen: float, edit=None):
+        fileTcx = self.SaveTcx(activityType, edit)
+        fileStreamed = os.path.join(self.dir.name, "d-streamed.tcx")
+        self.assertTrue(TcxStreamEditor().ChangeLength(fileTcx, fileStreamed, newLen))
+        fileDom = os.path.join(self.dir.name, "d-dom.tcx")
+        editor = TcxFileEditor()
+        editor.LoadXml(fileTcx)
+        self.assertTrue(editor.ChangeLength(newLen))
+        editor.SaveXml(fileDom)
+
+        streamed = self.ReadFile(fileStreamed)
+        self.assertNotEqual(streamed, self.ReadFile(fileTcx))
+        self.assertEqual(streamed, self.ReadFile(fileDom))
+
+    def testRunning(self):
+        self.CheckActivityType(ActivityType.Running, 2500.0)
+
+    def testTreadmill(self):
+        self.CheckActivityType(ActivityType.Treadmill, 4000.0)
+
+    # speed in extensions of an element with distance is dropped wherever its DistanceMeters is
+    def testSpeedOfElementWithDistance(self):
+        extensions = "<Extensions><x:TPX><x:Speed>3.5</x:Speed></x:TPX></Extensions>"
+
+        def edit(content: str):
+            laps = content.split("<TotalTimeSeconds>")
+            laps[1] = laps[1].replace("<Track>", extensions + "<Track>", 1)
+            laps[2] = laps[2].replace("</DistanceMeters>", "</DistanceMeters>" + extensions, 1)
+            laps[0] = laps[0] + extensions
+            return "<TotalTimeSeconds>".join(laps)
+
+        self.CheckActivityType(ActivityType.Running, 2500.0, edit)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,33 @@
+import unittest
+from classes.activity import ActivityType
+from classes.conversion import TtbinConverter
+from classes.ttbingenerator import TtbinFileGenerator
+
+
+class TcxFileWriterTest(unittest.TestCase):
+    # streamed output has to be the bytes the minidom document is written as
+    def CheckActivityType(self, activityType: ActivityType, args: list):
+        data = TtbinFileGenerator(seed=3).Generate(activityType, 900)
+        for pretty in (True, False):
+            modeArgs = args if pretty else args + ["-compact"]
+            streamed = TtbinConverter(modeArgs).Convert(data)
+            dom = TtbinConverter(modeArgs + ["-dom"]).Convert(data)
+            self.assertGreater(len(streamed), 0)
+            self.assertEqual(streamed, dom, " ".join(modeArgs))
+
+    def testRunning(self):
+        self.CheckActivityType(ActivityType.Running, [])
+
+    def testTreadmill(self):
+        self.CheckActivityType(ActivityType.Treadmill, [])
+
+    def testGym(self):
+        self.CheckActivityType(ActivityType.Gym, [])
+
+    # track point speeds aren't written after a distance change
+    def testRunningWithDistance(self):
+        self.CheckActivityType(ActivityType.Running, ["-distance", "2500"])
+
+
+if __name__ == "__main__":
+    unittest.main()